@@ -25,6 +25,7 @@ CLASSIFIERS = [
 ]
 INSTALL_REQUIRES = [
     'pybel>=0.13.0,<0.14.0',
+    'bel_resources',
     'bio2bel>=0.2.0,<0.3.0',
     'sqlalchemy',
     'click',
@@ -40,7 +41,10 @@ EXTRAS_REQUIRE = {
     ],
     'owl': [
         'owlready',
-    ]
+    ],
+    'numpy': [
+        'numpy',
+    ],
 }
 ENTRY_POINTS = {
     'bio2bel': [
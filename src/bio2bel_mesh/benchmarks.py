@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmarks for Bio2BEL MeSH."""
+
+import json
+import logging
+import math
+import os
+import tempfile
+import time
+from typing import Any, Callable, Iterable, List, Mapping, Tuple
+
+from bio2bel.manager.namespace_manager import BELNamespaceManagerMixin
+from .parsers.cache import iter_records_cache, iter_write_records_cache
+
+__all__ = [
+    'benchmark_lookup',
+    'benchmark_namespace',
+    'benchmark_records_cache',
+    'benchmark_search',
+    'benchmark_similarity',
+]
+
+log = logging.getLogger(__name__)
+
+
+def benchmark_records_cache(records: List[Mapping], source_path: str) -> Mapping[str, Mapping[str, float]]:
+    """Compare the size and load time of the binary records cache to indented JSON.
+
+    :param records: Records from :func:`bio2bel_mesh.parsers.get_descriptor_records` or
+     :func:`bio2bel_mesh.parsers.get_supplementary_records`
+    :param source_path: Path to the GZIP file from which the records were parsed
+    :return: A dictionary from format name to its size in megabytes, dump time, and load time in seconds
+    """
+    rv = {}
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, 'records.json')
+        t = time.time()
+        with open(json_path, 'w') as file:
+            json.dump(records, file, indent=2)
+        dump_time = time.time() - t
+        t = time.time()
+        with open(json_path) as file:
+            json.load(file)
+        rv['json'] = dict(size=os.path.getsize(json_path) / 2 ** 20, dump=dump_time, load=time.time() - t)
+
+        binary_path = os.path.join(directory, 'records.records')
+        t = time.time()
+        for _ in iter_write_records_cache(binary_path, records, source_path=source_path):
+            pass
+        dump_time = time.time() - t
+        t = time.time()
+        for _ in iter_records_cache(binary_path):
+            pass
+        rv['binary'] = dict(size=os.path.getsize(binary_path) / 2 ** 20, dump=dump_time, load=time.time() - t)
+
+    return rv
+
+
+def benchmark_lookup(get_one: Callable[[str], Any], get_many: Callable[[Iterable[str]], Mapping],
+                     keys: List[str]) -> Mapping[str, float]:
+    """Compare looking up keys one at a time to looking them up in a batch.
+
+    :param get_one: A function that looks up a single key, like :meth:`bio2bel_mesh.Manager.get_descriptor_by_ui`
+    :param get_many: A function that looks up several keys, like :meth:`bio2bel_mesh.Manager.get_descriptors_by_uis`
+    :param keys: The keys to look up
+    :return: A dictionary with the number of seconds taken to look up the keys one at a time and in a batch
+    """
+    t = time.time()
+    for key in keys:
+        get_one(key)
+    one_time = time.time() - t
+
+    t = time.time()
+    get_many(keys)
+    return dict(one=one_time, many=time.time() - t)
+
+
+def benchmark_search(search: Callable[[str], Any], queries: List[str]) -> Mapping[str, float]:
+    """Measure the latency of searches.
+
+    :param search: A function that searches for a query, like :meth:`bio2bel_mesh.Manager.search_terms`
+    :param queries: The queries to search for
+    :return: A dictionary with the median, 95th percentile, and maximum number of seconds per query
+    """
+    latencies = []
+    for query in queries:
+        t = time.time()
+        search(query)
+        latencies.append(time.time() - t)
+
+    latencies.sort()
+    return dict(
+        p50=latencies[len(latencies) // 2],
+        p95=latencies[int(len(latencies) * 0.95)],
+        max=latencies[-1],
+    )
+
+
+def _get_naive_lin_similarity(ancestors: Mapping[str, Mapping[str, int]], descendant_counts: Mapping[str, int],
+                              a: str, b: str) -> float:
+    """Calculate Lin's similarity with dictionaries and sets, like ad hoc code would."""
+    n = len(ancestors)
+
+    def get_information_content(descriptor_ui: str) -> float:
+        return -math.log(descendant_counts[descriptor_ui] / n)
+
+    common = set(ancestors[a]) & set(ancestors[b])
+    resnik = max((get_information_content(ancestor) for ancestor in common), default=0.0)
+    total = get_information_content(a) + get_information_content(b)
+    return 2 * resnik / total if total else float(a == b)
+
+
+def benchmark_similarity(similarity, pairs: List[Tuple[str, str]]) -> Mapping[str, float]:
+    """Compare calculating Lin's similarity for pairs of descriptors with dictionaries to the vectorized version.
+
+    :param similarity: A :class:`bio2bel_mesh.similarity.SemanticSimilarity`
+    :param pairs: Pairs of UIs of descriptors with tree numbers
+    :return: A dictionary with the number of seconds taken naively and vectorized, and the largest difference
+    """
+    t = time.time()
+    ancestors = {
+        descriptor_ui: dict(similarity.get_ancestors(descriptor_ui))
+        for descriptor_ui in similarity.descriptor_uis
+    }
+    descendant_counts = dict.fromkeys(ancestors, 0)
+    for descriptor_ancestors in ancestors.values():
+        for ancestor in descriptor_ancestors:
+            descendant_counts[ancestor] += 1
+    naive = [_get_naive_lin_similarity(ancestors, descendant_counts, a, b) for a, b in pairs]
+    naive_time = time.time() - t
+
+    t = time.time()
+    vectorized = similarity.pairs(pairs, method='lin')
+    vectorized_time = time.time() - t
+
+    return dict(
+        naive=naive_time,
+        vectorized=vectorized_time,
+        difference=max((abs(x - y) for x, y in zip(naive, vectorized)), default=0.0),
+    )
+
+
+def benchmark_namespace(manager) -> Mapping[str, Mapping[str, float]]:
+    """Compare making and writing the namespace one model at a time like Bio2BEL does to doing it in bulk.
+
+    The namespace is dropped before each run and is made again in bulk at the end.
+
+    :param manager: A populated :class:`bio2bel_mesh.Manager`
+    :return: A dictionary from ``upload`` and ``write`` to the number of seconds taken one model at a time and
+     in bulk
+    """
+    rv = {}
+
+    manager.drop_bel_namespace()
+    t = time.time()
+    BELNamespaceManagerMixin._make_namespace(manager)
+    orm_time = time.time() - t
+    manager.drop_bel_namespace()
+    t = time.time()
+    manager.upload_bel_namespace()
+    rv['upload'] = dict(orm=orm_time, bulk=time.time() - t)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'mesh.belns')
+        t = time.time()
+        with open(path, 'w') as file:
+            BELNamespaceManagerMixin.write_bel_namespace(manager, file)
+        orm_time = time.time() - t
+        t = time.time()
+        with open(path, 'w') as file:
+            manager.write_bel_namespace(file)
+        rv['write'] = dict(orm=orm_time, bulk=time.time() - t)
+
+    return rv
@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+
+"""Bulk loading of MeSH records with Core-level inserts."""
+
+import hashlib
+import json
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, List, Mapping, MutableMapping, Optional, Set
+
+from sqlalchemy import Table, event, func
+from sqlalchemy.orm import Session
+from tqdm import tqdm
+
+from .categories import get_bel_encoding, get_category_mask
+from .models import Concept, Descriptor, Term, Tree
+from .utils import get_tree_depth, get_tree_key, iter_batches, normalize_name
+
+__all__ = [
+    'DEFAULT_BATCH_SIZE',
+    'BulkLoader',
+    'RecordPrefetcher',
+    'get_fingerprint',
+    'prefetch_records',
+    'sqlite_fast_load',
+]
+
+log = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 10_000
+
+#: Pragmas applied to SQLite connections while fast loading. These trade durability for speed, so a crash
+#: during population can corrupt the database, which then needs to be repopulated anyway.
+SQLITE_FAST_LOAD_PRAGMAS = {
+    'journal_mode': 'MEMORY',
+    'synchronous': 'OFF',
+    'cache_size': '-262144',  # 256 MB
+    'temp_store': 'MEMORY',
+}
+
+
+def get_fingerprint(record: Mapping) -> str:
+    """Hash the parts of a record that are stored in the database so changes between releases can be found."""
+    content = [
+        record['name'],
+        sorted(record.get('tree_numbers', [])),
+        sorted(
+            [
+                concept['concept_ui'],
+                concept['name'],
+                sorted([term['term_ui'], term['name']] for term in concept['terms']),
+            ]
+            for concept in record['concepts']
+        ),
+    ]
+    return hashlib.sha1(json.dumps(content).encode('utf-8')).hexdigest()
+
+
+class BulkLoader:
+    """Loads MeSH records with executemany-style inserts, committing after each batch.
+
+    Primary keys for descriptors and concepts are assigned here so foreign keys can be resolved through
+    UI to identifier dictionaries instead of relationships between ORM objects. On backends where primary keys come
+    from sequences, like PostgreSQL, the sequences are moved past the assigned keys after loading so later inserts
+    that let the database assign keys don't collide with them.
+    """
+
+    def __init__(self,
+                 session: Session,
+                 ui_descriptor_id: MutableMapping[str, int],
+                 ui_concept_id: MutableMapping[str, int],
+                 term_uis: Set[str],
+                 batch_size: Optional[int] = None,
+                 reuse_descriptor_ids: Optional[Mapping[str, int]] = None,
+                 ) -> None:
+        """Initialize the loader.
+
+        :param session: A SQLAlchemy session
+        :param ui_descriptor_id: A dictionary from UIs to identifiers of the descriptors already in the database
+        :param ui_concept_id: A dictionary from UIs to identifiers of the concepts already in the database
+        :param term_uis: The UIs of the terms already in the database
+        :param batch_size: The number of records to insert per transaction
+        :param reuse_descriptor_ids: A dictionary from UIs to the identifiers to give descriptors that were deleted
+         in order to be loaded again
+        """
+        self.session = session
+        self.ui_descriptor_id = ui_descriptor_id
+        self.ui_concept_id = ui_concept_id
+        self.term_uis = term_uis
+        self.batch_size = batch_size or DEFAULT_BATCH_SIZE
+        self.reuse_descriptor_ids = reuse_descriptor_ids or {}
+
+        self._next_descriptor_id = self._get_max_id(Descriptor) + 1
+        self._next_concept_id = self._get_max_id(Concept) + 1
+
+    def _get_max_id(self, model) -> int:
+        return self.session.query(func.max(model.id)).scalar() or 0
+
+    def _get_next_descriptor_id(self, descriptor_ui: str) -> int:
+        descriptor_id = self.reuse_descriptor_ids.get(descriptor_ui)
+        if descriptor_id is not None:
+            return descriptor_id
+
+        descriptor_id = self._next_descriptor_id
+        self._next_descriptor_id += 1
+        return descriptor_id
+
+    def load(self, records: Iterable[Mapping]) -> None:
+        """Insert the records in batches.
+
+        :param records: Records from :func:`bio2bel_mesh.parsers.get_descriptor_records` or
+         :func:`bio2bel_mesh.parsers.get_supplementary_records`
+        """
+        t = time.time()
+        for batch in iter_batches(tqdm(records, desc='Loading records'), self.batch_size):
+            self._load_batch(batch)
+        self._reset_sequences()
+        log.info('loaded records in %.2f seconds', time.time() - t)
+
+    def _reset_sequences(self) -> None:
+        if self.session.get_bind().dialect.name != 'postgresql':
+            return
+
+        for model in (Descriptor, Concept):
+            table_name = model.__tablename__
+            self.session.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table_name}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {table_name}), 0) + 1, false)"
+            )
+        self.session.commit()
+
+    def _load_batch(self, records: List[Mapping]) -> None:
+        descriptor_rows, tree_rows, concept_rows, term_rows = [], [], [], []
+
+        for descriptor_xml in records:
+            descriptor_ui = descriptor_xml['descriptor_ui']
+
+            descriptor_id = self.ui_descriptor_id.get(descriptor_ui)
+            if descriptor_id is None:
+                descriptor_id = self.ui_descriptor_id[descriptor_ui] = self._get_next_descriptor_id(descriptor_ui)
+
+                tree_names = descriptor_xml.get('tree_numbers', [])
+                category_mask = get_category_mask(tree_names)
+                descriptor_rows.append(dict(
+                    id=descriptor_id,
+                    descriptor_ui=descriptor_ui,
+                    name=descriptor_xml['name'],
+                    normalized_name=normalize_name(descriptor_xml['name']),
+                    fingerprint=get_fingerprint(descriptor_xml),
+                    category_mask=category_mask,
+                    bel_encoding=get_bel_encoding(category_mask),
+                ))
+                tree_rows.extend(
+                    dict(
+                        name=tree_name,
+                        tree_key=get_tree_key(tree_name),
+                        depth=get_tree_depth(tree_name),
+                        descriptor_id=descriptor_id,
+                    )
+                    for tree_name in tree_names
+                )
+
+            for concept_xml in descriptor_xml['concepts']:
+                concept_ui = concept_xml['concept_ui']
+
+                concept_id = self.ui_concept_id.get(concept_ui)
+                if concept_id is None:
+                    concept_id = self.ui_concept_id[concept_ui] = self._next_concept_id
+                    self._next_concept_id += 1
+                    concept_rows.append(dict(
+                        id=concept_id,
+                        concept_ui=concept_ui,
+                        name=concept_xml['name'],
+                        descriptor_id=descriptor_id,
+                    ))
+
+                # if term_xml['IsPermutedTermYN'] == 'Y':
+                #    continue  # FIXME need better solution for these
+
+                term_rows.extend(
+                    dict(
+                        term_ui=term_xml['term_ui'],
+                        name=term_xml['name'],
+                        normalized_name=normalize_name(term_xml['name']),
+                        concept_id=concept_id,
+                    )
+                    for term_xml in concept_xml['terms']
+                    if term_xml['term_ui'] not in self.term_uis
+                )
+
+        for model, rows in ((Descriptor, descriptor_rows), (Tree, tree_rows), (Concept, concept_rows),
+                            (Term, term_rows)):
+            if rows:
+                self.session.execute(model.__table__.insert(), rows)
+
+        self.session.commit()
+
+
+class RecordPrefetcher:
+    """Gets records in a background thread and passes them back in batches through a bounded queue.
+
+    Iterate over it to consume the records and call :meth:`close` when done, even if they weren't all consumed,
+    so the background thread stops.
+    """
+
+    _done = object()
+
+    def __init__(self, get_records: Callable[[], Iterable[Mapping]], batch_size: int, maxsize: int) -> None:
+        """Prepare the background thread without starting it.
+
+        :param get_records: A function that returns the records
+        :param batch_size: The number of records passed through the queue at once
+        :param maxsize: The number of batches that can wait in the queue
+        """
+        self.get_records = get_records
+        self.batch_size = batch_size
+        self.batches = queue.Queue(maxsize=maxsize)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._produce, daemon=True)
+
+    def start(self) -> None:
+        """Start getting records in the background thread."""
+        self.thread.start()
+
+    def close(self) -> None:
+        """Stop the background thread and drop the batches waiting in the queue."""
+        self.stopped.set()
+        while True:
+            try:
+                self.batches.get_nowait()
+            except queue.Empty:
+                return
+
+    def _put(self, item) -> bool:
+        """Put an item in the queue unless the consumer stopped. Return if it was put."""
+        while not self.stopped.is_set():
+            try:
+                self.batches.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            return True
+        return False
+
+    def _produce(self) -> None:
+        records = None
+        try:
+            records = self.get_records()
+            for batch in iter_batches(records, self.batch_size):
+                if not self._put(batch):
+                    return
+        except Exception as e:
+            self._put(e)
+        else:
+            self._put(self._done)
+        finally:
+            # closing a generator runs its clean up, like shutting down a process pool
+            if hasattr(records, 'close'):
+                records.close()
+
+    def __iter__(self) -> Iterable[Mapping]:
+        waited = 0.0
+        try:
+            while True:
+                t = time.time()
+                batch = self.batches.get()
+                waited += time.time() - t
+
+                if batch is self._done:
+                    return
+                if isinstance(batch, Exception):
+                    raise batch
+                yield from batch
+        finally:
+            self.close()
+            log.info('waited %.2f seconds for prefetched records', waited)
+
+
+def prefetch_records(get_records: Callable[[], Iterable[Mapping]], batch_size: Optional[int] = None,
+                     maxsize: int = 4) -> RecordPrefetcher:
+    """Start getting records in a background thread, passing them back in batches through a bounded queue.
+
+    The records start being produced as soon as this function is called, so producers for several files can
+    run while the records from an earlier one are still being inserted. Parsing only gets ``maxsize`` batches
+    ahead of the consumer, so memory stays bounded. Exceptions raised while getting the records are re-raised
+    in the consuming thread. Call :meth:`RecordPrefetcher.close` if the records might not all be consumed.
+
+    :param get_records: A function that returns the records, like :func:`bio2bel_mesh.parsers.get_descriptor_records`
+    :param batch_size: The number of records passed through the queue at once
+    :param maxsize: The number of batches that can wait in the queue
+    """
+    prefetcher = RecordPrefetcher(get_records, batch_size=batch_size or DEFAULT_BATCH_SIZE, maxsize=maxsize)
+    prefetcher.start()
+    return prefetcher
+
+
+def _set_pragmas(connection, pragmas: Mapping[str, str]) -> None:
+    cursor = connection.cursor()
+    for key, value in pragmas.items():
+        cursor.execute(f'PRAGMA {key} = {value}')
+    cursor.close()
+
+
+def _create_indexes(session: Session, indexes: Iterable) -> None:
+    connection = session.connection()
+    for index in indexes:
+        index.create(bind=connection)
+    session.commit()
+
+
+@contextmanager
+def sqlite_fast_load(session: Session, tables: Iterable[Table]):
+    """Apply load-time pragmas and defer the non-unique indexes on the given tables while loading into SQLite.
+
+    Unique indexes are kept so duplicates are still rejected as they're inserted. After a successful load, the
+    deferred indexes are rebuilt and ``ANALYZE`` is run. If loading fails, the current transaction is rolled back
+    and the indexes are rebuilt before the error is re-raised. The original pragmas are restored either way.
+
+    :param session: A SQLAlchemy session bound to a SQLite engine
+    :param tables: The tables whose indexes should be deferred
+    """
+    engine = session.get_bind()
+    indexes = [
+        index
+        for table in tables
+        for index in table.indexes
+        if not index.unique
+    ]
+
+    original_pragmas = {
+        key: str(session.execute(f'PRAGMA {key}').scalar())
+        for key in SQLITE_FAST_LOAD_PRAGMAS
+    }
+    session.commit()
+
+    # pragmas are set per connection, so they're applied to the current one and any opened during the load
+    def on_connect(dbapi_connection, _):
+        _set_pragmas(dbapi_connection, SQLITE_FAST_LOAD_PRAGMAS)
+
+    event.listen(engine, 'connect', on_connect)
+    try:
+        _set_pragmas(session.connection().connection, SQLITE_FAST_LOAD_PRAGMAS)
+        for index in indexes:
+            session.execute(f'DROP INDEX IF EXISTS {index.name}')
+        session.commit()
+
+        t = time.time()
+        try:
+            yield
+        except BaseException:
+            session.rollback()
+            try:
+                _create_indexes(session, indexes)
+            except Exception:
+                session.rollback()
+                log.exception('could not rebuild indexes after a failed load')
+            raise
+        log.info('loaded in %.2f seconds', time.time() - t)
+
+        t = time.time()
+        _create_indexes(session, indexes)
+        log.info('rebuilt %d indexes in %.2f seconds', len(indexes), time.time() - t)
+
+        t = time.time()
+        session.execute('ANALYZE')
+        session.commit()
+        log.info('analyzed in %.2f seconds', time.time() - t)
+    finally:
+        event.remove(engine, 'connect', on_connect)
+        session.rollback()
+        _set_pragmas(session.connection().connection, original_pragmas)
+        session.commit()
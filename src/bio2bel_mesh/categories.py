@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+"""Classification of MeSH descriptors into categories by the prefixes of their tree numbers.
+
+The rules are compiled once into a character trie. Each tree number is classified by the longest rule that is a
+prefix of it, so ``D12.776`` (proteins) takes precedence over ``D`` (chemicals). Some rules also veto a category
+for the whole descriptor, like ``G01`` for processes. The categories of a descriptor are stored as the bits of
+:data:`bio2bel_mesh.models.Descriptor.category_mask`, in the order of :data:`CATEGORIES`.
+"""
+
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from pybel.constants import belns_encodings
+
+__all__ = [
+    'CATEGORIES',
+    'CATEGORY_BITS',
+    'CategoryTrie',
+    'get_bel_encoding',
+    'get_categories',
+    'get_category_mask',
+    'get_mask',
+]
+
+#: The categories of descriptors, in the order of their bits
+CATEGORIES = (
+    'anatomy',
+    'organism',
+    'pathology',
+    'chemical',
+    'protein',
+    'complex',
+    'measurement',
+    'process',
+)
+
+CATEGORY_BITS = {
+    category: 1 << i
+    for i, category in enumerate(CATEGORIES)
+}
+
+#: The categories given to tree numbers starting with each prefix, where the longest prefix wins
+PREFIX_CATEGORIES = {
+    'A': ('anatomy',),
+    'B': ('organism',),
+    'C': ('pathology',),
+    'F': ('pathology',),
+    'D': ('chemical',),
+    'D05.500': ('complex',),  # multiprotein complexes
+    'D12.776': ('protein',),  # protein
+    'D08.811': ('protein',),  # enzymes
+    'D08.244': ('protein',),  # cytochromes
+    'D08.622': ('protein',),  # enzyme precursors
+    'E': ('measurement',),
+    'G': ('process',),
+}
+
+#: The categories a descriptor loses if any of its tree numbers starts with each prefix
+PREFIX_VETOES = {
+    'G01': ('process',),
+    'G15': ('process',),
+    'G17': ('process',),
+}
+
+#: The categories of descriptors that give each letter of their BEL encoding
+ENCODING_CATEGORIES = {
+    'A': ('anatomy', 'chemical', 'organism'),
+    'B': ('process',),
+    'C': ('complex',),
+    'G': ('protein',),
+    'O': ('pathology', 'measurement'),
+    'P': ('protein',),
+    'R': ('protein',),
+}
+
+#: The encoding of descriptors in none of the categories
+DEFAULT_ENCODING = ''.join(sorted(belns_encodings))
+
+
+def get_mask(categories: Iterable[str]) -> int:
+    """Get the bitmask of the given categories.
+
+    >>> get_mask(['anatomy', 'pathology'])
+    5
+    """
+    rv = 0
+    for category in categories:
+        if category not in CATEGORY_BITS:
+            raise ValueError(f'invalid category: {category}. Use one of {CATEGORIES}')
+        rv |= CATEGORY_BITS[category]
+    return rv
+
+
+def get_categories(mask: int) -> List[str]:
+    """Get the categories in a bitmask.
+
+    >>> get_categories(5)
+    ['anatomy', 'pathology']
+    """
+    return [
+        category
+        for category in CATEGORIES
+        if mask & CATEGORY_BITS[category]
+    ]
+
+
+class CategoryTrie:
+    """A character trie over tree number prefixes, for classifying descriptors."""
+
+    def __init__(self, prefix_categories: Mapping[str, Iterable[str]],
+                 prefix_vetoes: Optional[Mapping[str, Iterable[str]]] = None) -> None:
+        """Compile the rules.
+
+        :param prefix_categories: A dictionary from tree number prefixes to the categories they give
+        :param prefix_vetoes: A dictionary from tree number prefixes to the categories they take away from the
+         whole descriptor
+        """
+        #: Each node is a dictionary from characters to child nodes. The rule ending at a node, if any, is stored
+        #: under ``None`` as a pair of the mask it gives and the mask it vetoes.
+        self.root: Dict = {}
+
+        for prefix, categories in prefix_categories.items():
+            node = self._get_node(prefix)
+            node[None] = get_mask(categories), node.get(None, (0, 0))[1]
+
+        for prefix, categories in (prefix_vetoes or {}).items():
+            node = self._get_node(prefix)
+            mask, veto = node.get(None, (None, 0))
+            if mask is None:
+                mask = self._get_tree_rule(prefix)[0]
+            node[None] = mask, veto | get_mask(categories)
+
+    def _get_node(self, prefix: str) -> Dict:
+        node = self.root
+        for character in prefix:
+            node = node.setdefault(character, {})
+        return node
+
+    def _get_tree_rule(self, tree_name: str) -> Tuple[int, int]:
+        """Get the masks given and vetoed by the longest rule that's a prefix of the tree number."""
+        rv = self.root.get(None, (0, 0))
+        node = self.root
+        for character in tree_name:
+            node = node.get(character)
+            if node is None:
+                break
+            rv = node.get(None, rv)
+        return rv
+
+    def get_mask(self, tree_names: Iterable[str]) -> int:
+        """Get the category bitmask of a descriptor from its tree numbers."""
+        rv = veto = 0
+        for tree_name in tree_names:
+            tree_mask, tree_veto = self._get_tree_rule(tree_name)
+            rv |= tree_mask
+            veto |= tree_veto
+        return rv & ~veto
+
+
+_trie = CategoryTrie(PREFIX_CATEGORIES, PREFIX_VETOES)
+
+
+def get_category_mask(tree_names: Iterable[str]) -> int:
+    """Get the category bitmask of a descriptor from its tree numbers with the default rules.
+
+    >>> get_categories(get_category_mask(['D12.776.157', 'G01.100']))
+    ['protein']
+    """
+    return _trie.get_mask(tree_names)
+
+
+def get_bel_encoding(mask: int) -> str:
+    """Get the BEL encoding of a descriptor from its category bitmask.
+
+    >>> get_bel_encoding(get_mask(['protein']))
+    'GPR'
+    """
+    rv = ''.join(
+        letter
+        for letter, categories in sorted(ENCODING_CATEGORIES.items())
+        if mask & get_mask(categories)
+    )
+    return rv or DEFAULT_ENCODING
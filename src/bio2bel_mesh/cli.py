@@ -2,9 +2,22 @@
 
 """Command line interface for Bio2BEL MeSH."""
 
+import json
+import random
+import time
+
 import click
 
-from .manager import Manager
+from .benchmarks import (
+    benchmark_lookup, benchmark_namespace, benchmark_records_cache, benchmark_search, benchmark_similarity,
+)
+from .categories import CATEGORIES
+from .export import BEL_CATEGORIES
+from .manager import HIERARCHY_WRITERS, Manager
+from .models import Descriptor, Term
+from .parsers import (
+    download_descriptors, download_supplement, get_descriptor_records, get_supplementary_records,
+)
 
 main = Manager.get_cli()
 
@@ -31,6 +44,36 @@ def get(manager, ui):
             click.echo(f'{k}: {v}')
 
 
+@descriptors.command()
+@click.argument('ui')
+@click.option('-d', '--max-depth', type=int, help='Maximum number of levels down')
+@click.pass_obj
+def descendants(manager, ui, max_depth):
+    """List the descendants of a descriptor, closest first."""
+    for model in manager.get_descendants(ui, max_depth=max_depth):
+        click.echo(f'{model.descriptor_ui}\t{model.name}')
+
+
+@descriptors.command()
+@click.argument('ui')
+@click.option('-d', '--max-depth', type=int, help='Maximum number of levels up')
+@click.pass_obj
+def ancestors(manager, ui, max_depth):
+    """List the ancestors of a descriptor, closest first."""
+    for model in manager.get_ancestors(ui, max_depth=max_depth):
+        click.echo(f'{model.descriptor_ui}\t{model.name}')
+
+
+@descriptors.command()
+@click.argument('categories', nargs=-1, required=True, type=click.Choice(CATEGORIES))
+@click.option('--match-all', is_flag=True, help='Only list descriptors in all of the categories')
+@click.pass_obj
+def category(manager, categories, match_all):
+    """List the descriptors in any of the given categories."""
+    for model in manager.get_descriptors_by_categories(categories, match_all=match_all):
+        click.echo(f'{model.descriptor_ui}\t{model.name}')
+
+
 @manage.group()
 def terms():
     """Manage terms."""
@@ -38,14 +81,157 @@ def terms():
 
 @terms.command()
 @click.argument('q')
+@click.option('-n', '--limit', type=int, default=10, show_default=True, help='Maximum number of terms to show')
 @click.pass_obj
-def search(manager, q):
-    """Search terms in the database."""
-    model = manager.get_term_by_name(q)
+def search(manager, q, limit):
+    """Search terms in the database. The last word can be partial."""
+    for model in manager.search_terms(q, limit=limit):
+        click.echo(f'{model.term_ui}\t{model.name}\t{model.concept.descriptor.descriptor_ui}')
 
-    if model is not None:
-        for k, v in model.to_json().items():
-            click.echo(f'{k}: {v}')
+
+@terms.command()
+@click.argument('q')
+@click.option('-k', type=int, default=5, show_default=True, help='Maximum number of descriptors to show')
+@click.option('-t', '--threshold', type=float, default=0.3, show_default=True, help='Minimum similarity')
+@click.pass_obj
+def fuzzy(manager, q, k, threshold):
+    """Find the descriptors with the most similar names to a possibly misspelled name."""
+    for model, score in manager.fuzzy_match(q, k=k, threshold=threshold):
+        click.echo(f'{model.descriptor_ui}\t{model.name}\t{score:.3f}')
+
+
+@main.command()
+@click.argument('paths', nargs=-1, type=click.Path(exists=True, dir_okay=False))
+@click.option('-d', '--directory', type=click.Path(file_okay=False), required=True,
+              help='Directory to write the normalized graphs to')
+@click.option('-w', '--workers', type=int, help='Number of processes for normalizing graphs')
+@click.pass_obj
+def normalize(manager, paths, directory, workers):
+    """Normalize the MeSH nodes in BEL graphs stored as pickles or Node-Link JSON."""
+    for path, counter in manager.normalize_graph_paths(paths, directory, workers=workers).items():
+        click.echo(f'{path}: {sum(counter.values())} nodes normalized')
+
+
+@main.command()
+@click.argument('tree_numbers', nargs=-1, required=True)
+@click.option('-c', '--category', 'categories', multiple=True, type=click.Choice(BEL_CATEGORIES),
+              help='Only export descriptors in this category. Can be given several times. Defaults to all.')
+@click.option('-f', '--fmt', type=click.Choice(sorted(HIERARCHY_WRITERS)), default='bel', show_default=True)
+@click.option('-o', '--output', type=click.File('w'), default='-', help='Where to write the relations')
+@click.pass_obj
+def export(manager, tree_numbers, categories, fmt, output):
+    """Export the is-a relations in the subtrees under tree numbers or category letters, like C or G."""
+    count = manager.export_hierarchy(output, tree_numbers, categories=categories or None, fmt=fmt)
+    click.echo(f'exported {count} relations', err=True)
+
+
+@main.command()
+@click.argument('file', type=click.File())
+@click.option('-o', '--output', type=click.File('w'), default='-', help='Where to write the mentions as JSON lines')
+@click.option('-w', '--workers', type=int, help='Number of processes for tagging documents')
+@click.option('-b', '--batch-size', type=int, default=500, show_default=True,
+              help='Number of documents sent to a process at once')
+@click.pass_obj
+def tag(manager, file, output, workers, batch_size):
+    """Tag MeSH terms in a file with one document per line."""
+    texts = (line.rstrip('\n') for line in file)
+    manager.get_tagger()
+
+    t = time.time()
+    count = 0
+    for mentions in manager.tag_documents(texts, workers=workers, batch_size=batch_size):
+        print(json.dumps([mention._asdict() for mention in mentions]), file=output)
+        count += 1
+
+    elapsed = time.time() - t
+    click.echo(f'tagged {count} documents in {elapsed:.2f}s ({count / elapsed if elapsed else 0.0:.1f} docs/s)',
+               err=True)
+
+
+@main.group()
+def belanno():
+    """Manage BEL annotation."""
+
+
+@belanno.command()
+@click.option('-f', '--file', type=click.File('w'), default='-')
+@click.pass_obj
+def write(manager, file):
+    """Write a BEL annotation from descriptor names to their UIs."""
+    manager.write_bel_annotation(file)
+
+
+@main.group()
+def benchmark():
+    """Run benchmarks."""
+
+
+@benchmark.command()
+@click.option('--supplement', is_flag=True, help='Benchmark the supplementary records instead of the descriptors')
+def cache(supplement):
+    """Compare the binary records cache to indented JSON."""
+    if supplement:
+        records, source_path = get_supplementary_records(cache=False), download_supplement()
+    else:
+        records, source_path = get_descriptor_records(cache=False), download_descriptors()
+
+    for name, stats in benchmark_records_cache(records, source_path=source_path).items():
+        click.echo(f'{name}: {stats["size"]:.1f} MB, dumped in {stats["dump"]:.2f}s, loaded in {stats["load"]:.2f}s')
+
+
+@benchmark.command()
+@click.option('-n', '--number', type=int, default=10_000, show_default=True, help='Number of keys to look up')
+@click.pass_obj
+def lookup(manager, number):
+    """Compare looking up descriptors and terms one at a time to in batches."""
+    descriptor_uis = [ui for ui, in manager.session.query(Descriptor.descriptor_ui).limit(number)]
+    term_names = [name for name, in manager.session.query(Term.name).limit(number)]
+
+    for name, get_one, get_many, keys in (
+            ('descriptor UIs', manager.get_descriptor_by_ui, manager.get_descriptors_by_uis, descriptor_uis),
+            ('term names', manager.get_term_by_name, manager.get_terms_by_names, term_names),
+    ):
+        stats = benchmark_lookup(get_one, get_many, keys)
+        click.echo(f'{len(keys)} {name}: {stats["one"]:.2f}s one at a time, {stats["many"]:.2f}s batched')
+
+
+@benchmark.command(name='search')
+@click.option('-n', '--number', type=int, default=1_000, show_default=True, help='Number of queries')
+@click.pass_obj
+def benchmark_search_latency(manager, number):
+    """Measure the latency of type-ahead searches built from prefixes of term names."""
+    names = [name for name, in manager.session.query(Term.name).limit(number)]
+    queries = [name[:max(2, len(name) // 2)] for name in names]
+
+    stats = benchmark_search(manager.search_terms, queries)
+    click.echo(f'{len(queries)} queries: {stats["p50"] * 1000:.2f}ms median, {stats["p95"] * 1000:.2f}ms 95th '
+               f'percentile, {stats["max"] * 1000:.2f}ms max')
+
+
+@benchmark.command()
+@click.option('-n', '--number', type=int, default=100_000, show_default=True, help='Number of pairs')
+@click.option('--seed', type=int, default=0, show_default=True, help='Seed for sampling pairs')
+@click.pass_obj
+def similarity(manager, number, seed):
+    """Compare calculating semantic similarity with dictionaries to the vectorized version."""
+    semantic_similarity = manager.get_semantic_similarity()
+    rng = random.Random(seed)
+    pairs = [
+        tuple(rng.choices(semantic_similarity.descriptor_uis, k=2))
+        for _ in range(number)
+    ]
+
+    stats = benchmark_similarity(semantic_similarity, pairs)
+    click.echo(f'{len(pairs)} pairs: {stats["naive"]:.2f}s naive, {stats["vectorized"]:.2f}s vectorized, '
+               f'largest difference {stats["difference"]:.2e}')
+
+
+@benchmark.command()
+@click.pass_obj
+def namespace(manager):
+    """Compare making and writing the BEL namespace one model at a time to in bulk."""
+    for name, stats in benchmark_namespace(manager).items():
+        click.echo(f'{name}: {stats["orm"]:.2f}s one model at a time, {stats["bulk"]:.2f}s in bulk')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+"""The transitive closure of the MeSH descriptor hierarchy.
+
+A descriptor is an ancestor of another if one of its tree numbers is a proper prefix of one of the other's, split
+on dots, so ``C10`` is an ancestor of ``C10.228.140``. Every ancestor and descendant pair is stored in
+:class:`bio2bel_mesh.models.DescriptorClosure` with the smallest number of levels between them, along with a pair
+for each descriptor with a tree number and itself at depth zero. This makes ancestor, descendant, and subtree
+questions single indexed queries.
+"""
+
+import logging
+import time
+from typing import Iterable, Mapping, Optional, Set, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from .models import DescriptorClosure, Tree
+from .utils import iter_batches
+
+__all__ = [
+    'build_closure',
+    'delete_closure',
+    'iter_closure',
+    'refresh_closure',
+]
+
+log = logging.getLogger(__name__)
+
+_INSERT_BATCH_SIZE = 10_000
+#: Each chunk is used twice in a query, so this stays under SQLite's default limit of 999 parameters
+_IN_CHUNK_SIZE = 450
+
+
+def iter_closure(tree_descriptor: Mapping[str, int], tree_names: Optional[Iterable[str]] = None,
+                 descriptor_ids: Optional[Set[int]] = None) -> Iterable[Tuple[int, int, int]]:
+    """Iterate over ancestor, descendant, and depth triples, with the smallest depth for each pair.
+
+    :param tree_descriptor: A dictionary from tree numbers to descriptor identifiers
+    :param tree_names: The tree numbers whose ancestors are walked. Defaults to all of them.
+    :param descriptor_ids: If given, only pairs where one of the descriptors is in this set are kept
+    """
+    pair_depth = {}
+    for tree_name in (tree_descriptor if tree_names is None else tree_names):
+        descendant_id = tree_descriptor[tree_name]
+        parts = tree_name.split('.')
+        for depth in range(len(parts)):
+            ancestor_id = tree_descriptor.get('.'.join(parts[:len(parts) - depth]))
+            if ancestor_id is None:
+                continue
+            if descriptor_ids is not None and ancestor_id not in descriptor_ids \
+                    and descendant_id not in descriptor_ids:
+                continue
+            key = ancestor_id, descendant_id
+            if depth < pair_depth.get(key, len(parts)):
+                pair_depth[key] = depth
+
+    for (ancestor_id, descendant_id), depth in pair_depth.items():
+        yield ancestor_id, descendant_id, depth
+
+
+def _insert_closure(session: Session, rows: Iterable[Tuple[int, int, int]]) -> int:
+    count = 0
+    for batch in iter_batches(rows, _INSERT_BATCH_SIZE):
+        session.execute(DescriptorClosure.__table__.insert(), [
+            dict(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=depth)
+            for ancestor_id, descendant_id, depth in batch
+        ])
+        count += len(batch)
+    session.commit()
+    return count
+
+
+def _get_tree_descriptor(session: Session) -> Mapping[str, int]:
+    return dict(session.query(Tree.name, Tree.descriptor_id))
+
+
+def delete_closure(session: Session, descriptor_ids: Iterable[int]) -> None:
+    """Delete the pairs in the closure that involve any of the given descriptors, without committing."""
+    descriptor_ids = sorted(descriptor_ids)
+    for i in range(0, len(descriptor_ids), _IN_CHUNK_SIZE):
+        chunk = descriptor_ids[i:i + _IN_CHUNK_SIZE]
+        session.execute(DescriptorClosure.__table__.delete().where(or_(
+            DescriptorClosure.ancestor_id.in_(chunk),
+            DescriptorClosure.descendant_id.in_(chunk),
+        )))
+
+
+def build_closure(session: Session) -> None:
+    """Rebuild the closure of the descriptor hierarchy from the tree numbers in the database."""
+    t = time.time()
+    session.execute(DescriptorClosure.__table__.delete())
+    count = _insert_closure(session, iter_closure(_get_tree_descriptor(session)))
+    log.info('built closure with %d pairs in %.2f seconds', count, time.time() - t)
+
+
+def refresh_closure(session: Session, descriptor_ids: Iterable[int]) -> None:
+    """Refresh the pairs in the closure that involve the given descriptors, after their trees changed.
+
+    Pairs of descriptors that are both unchanged can't be affected, since whether they're related only depends on
+    their own tree numbers. The others are deleted then found again by walking up from the changed descriptors'
+    tree numbers and from all tree numbers below them.
+
+    :param session: A SQLAlchemy session
+    :param descriptor_ids: The identifiers of the descriptors that were inserted, updated, or deleted
+    """
+    t = time.time()
+    descriptor_ids = set(descriptor_ids)
+    if not descriptor_ids:
+        return
+
+    delete_closure(session, descriptor_ids)
+
+    tree_descriptor = _get_tree_descriptor(session)
+    changed_trees = {
+        tree_name
+        for tree_name, descriptor_id in tree_descriptor.items()
+        if descriptor_id in descriptor_ids
+    }
+    tree_names = [
+        tree_name
+        for tree_name in tree_descriptor
+        if tree_name in changed_trees or any(
+            '.'.join(tree_name.split('.')[:i]) in changed_trees
+            for i in range(1, tree_name.count('.') + 1)
+        )
+    ]
+
+    count = _insert_closure(session, iter_closure(tree_descriptor, tree_names, descriptor_ids))
+    log.info('refreshed closure with %d pairs for %d descriptors in %.2f seconds', count, len(descriptor_ids),
+             time.time() - t)
@@ -13,10 +13,20 @@ DATA_DIR = get_data_dir(MODULE_NAME)
 
 YEAR = '2018'
 
-DESCRIPTOR_URL = f'ftp://nlmpubs.nlm.nih.gov/online/mesh/{YEAR}/xmlmesh/desc{YEAR}.gz'
-DESCRIPTOR_PATH = os.path.join(DATA_DIR, f'desc{YEAR}.gz')
-DESCRIPTOR_JSON_PATH = os.path.join(DATA_DIR, f'desc{YEAR}.json')
-
-SUPPLEMENT_URL = f'ftp://nlmpubs.nlm.nih.gov/online/mesh/{YEAR}/xmlmesh/supp{YEAR}.gz'
-SUPPLEMENT_PATH = os.path.join(DATA_DIR, f'supp{YEAR}.gz')
-SUPPLEMENT_JSON_PATH = os.path.join(DATA_DIR, f'supp{YEAR}.json')
+#: Increment when the records produced by :mod:`bio2bel_mesh.parsers` change to invalidate the records caches
+PARSER_VERSION = 2
+
+DESCRIPTOR_URL_FMT = 'ftp://nlmpubs.nlm.nih.gov/online/mesh/{year}/xmlmesh/desc{year}.gz'
+DESCRIPTOR_PATH_FMT = os.path.join(DATA_DIR, 'desc{year}.gz')
+DESCRIPTOR_URL = DESCRIPTOR_URL_FMT.format(year=YEAR)
+DESCRIPTOR_PATH = DESCRIPTOR_PATH_FMT.format(year=YEAR)
+DESCRIPTOR_CACHE_PATH = os.path.join(DATA_DIR, f'desc{YEAR}.records')
+
+SUPPLEMENT_URL_FMT = 'ftp://nlmpubs.nlm.nih.gov/online/mesh/{year}/xmlmesh/supp{year}.gz'
+SUPPLEMENT_PATH_FMT = os.path.join(DATA_DIR, 'supp{year}.gz')
+SUPPLEMENT_URL = SUPPLEMENT_URL_FMT.format(year=YEAR)
+SUPPLEMENT_PATH = SUPPLEMENT_PATH_FMT.format(year=YEAR)
+SUPPLEMENT_CACHE_PATH = os.path.join(DATA_DIR, f'supp{YEAR}.records')
+
+#: The path of the cached BEL graph of the hierarchy, by a hash of the connection string
+BEL_CACHE_PATH_FMT = os.path.join(DATA_DIR, 'hierarchy.{key}.bel.pickle')
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+
+"""Export of the MeSH hierarchy to BEL.
+
+The hierarchy is read in a single query over projected columns of :class:`bio2bel_mesh.models.Tree` and
+:class:`bio2bel_mesh.models.Descriptor`, so no ORM objects are built, and descriptors that don't convert to BEL are
+filtered out in SQL. Since the conversion takes a while for the whole of MeSH, the graph can be cached in a pickle
+file whose header holds the fingerprint of the database. The database gets a new random fingerprint whenever it's
+populated or updated, so checking the cache is a single lookup.
+
+When only some branches are needed, :func:`iter_hierarchy_edges` streams the is-a relations of the subtrees
+under some tree numbers instead, which :func:`write_hierarchy_bel` and :func:`write_hierarchy_jsonl` write out as
+they come. Only the tree numbers above the current one are held in memory, so memory use depends on the depth of
+the hierarchy rather than on the size of the subtrees.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import time
+import uuid
+from typing import Iterable, List, Optional, Sequence, TextIO, Tuple
+
+from bel_resources import make_knowledge_header
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from tqdm import tqdm
+
+from pybel import BELGraph
+from pybel.constants import IS_A, PYBEL_AUTOEVIDENCE
+from pybel.dsl import BaseEntity
+from .categories import get_mask
+from .constants import BEL_CACHE_PATH_FMT
+from .models import DatabaseInfo, Descriptor, Tree, get_descriptor_bel
+
+__all__ = [
+    'BEL_CATEGORIES',
+    'get_bel_cache_path',
+    'get_database_fingerprint',
+    'get_hierarchy_graph',
+    'iter_hierarchy_edges',
+    'iter_hierarchy_rows',
+    'set_database_fingerprint',
+    'write_hierarchy_bel',
+    'write_hierarchy_jsonl',
+]
+
+log = logging.getLogger(__name__)
+
+#: Increment when the graphs made by :func:`get_hierarchy_graph` change to invalidate cached ones
+EXPORT_VERSION = 2
+
+#: The categories of descriptors that convert to BEL
+BEL_CATEGORIES = ('pathology', 'process', 'chemical')
+
+#: The key of the database fingerprint in :class:`bio2bel_mesh.models.DatabaseInfo`
+FINGERPRINT_KEY = 'fingerprint'
+
+
+def get_database_fingerprint(session: Session) -> Optional[str]:
+    """Get the fingerprint the database got when it was last populated or updated, if it has one."""
+    return session.query(DatabaseInfo.value).filter(DatabaseInfo.key == FINGERPRINT_KEY).scalar()
+
+
+def set_database_fingerprint(session: Session) -> str:
+    """Give the database a new random fingerprint and commit it. Call this whenever its contents change."""
+    fingerprint = uuid.uuid4().hex
+    session.merge(DatabaseInfo(key=FINGERPRINT_KEY, value=fingerprint))
+    session.commit()
+    return fingerprint
+
+
+def get_bel_cache_path(connection: str) -> str:
+    """Get the default path of the cached hierarchy graph for a database, so databases don't share one."""
+    return BEL_CACHE_PATH_FMT.format(key=hashlib.sha1(connection.encode('utf-8')).hexdigest()[:16])
+
+
+def _has_any_category(categories: Iterable[str]):
+    return Descriptor.category_mask.op('&')(get_mask(categories)) != 0
+
+
+def iter_hierarchy_rows(session: Session) -> Iterable[Tuple[str, str, str, int]]:
+    """Iterate over the tree numbers of descriptors that convert to BEL with the columns needed to convert them.
+
+    :return: Tuples of the tree number, descriptor UI, descriptor name, and descriptor category bitmask
+    """
+    return (
+        session.query(
+            Tree.name,
+            Descriptor.descriptor_ui,
+            Descriptor.name,
+            Descriptor.category_mask,
+        )
+        .join(Descriptor, Tree.descriptor_id == Descriptor.id)
+        .filter(_has_any_category(BEL_CATEGORIES))
+        .yield_per(10_000)
+    )
+
+
+def _build_hierarchy_graph(session: Session) -> BELGraph:
+    graph = BELGraph(
+        name='MeSH Hierarchy',
+        version='0.0.0',
+    )
+
+    ui_bel = {}
+    tree_bel = {}
+    rows = tqdm(iter_hierarchy_rows(session), desc='Mapping MeSH hierarchy')
+    for tree_name, descriptor_ui, name, category_mask in rows:
+        bel = ui_bel.get(descriptor_ui)
+        if bel is None:
+            bel = ui_bel[descriptor_ui] = get_descriptor_bel(descriptor_ui, name, category_mask)
+        tree_bel[tree_name] = bel
+
+    for tree_name, child_bel in tree_bel.items():
+        # top-level tree numbers like C10 have no parents
+        if '.' not in tree_name:
+            continue
+        parent_bel = tree_bel.get(tree_name.rsplit('.', 1)[0])
+        if parent_bel is not None:
+            graph.add_is_a(child_bel, parent_bel)
+
+    return graph
+
+
+def _read_cache(path: str, header: Tuple[int, str]) -> Optional[BELGraph]:
+    if not os.path.exists(path):
+        return
+
+    # a truncated or foreign file can fail to unpickle in many ways, all of which mean the graph is rebuilt
+    try:
+        with open(path, 'rb') as file:
+            if pickle.load(file) != header:
+                log.info('%s is outdated', path)
+                return
+            graph = pickle.load(file)
+    except Exception:
+        log.warning('could not read %s. Rebuilding it', path, exc_info=True)
+        return
+
+    if not isinstance(graph, BELGraph):
+        log.warning('%s does not contain a BEL graph. Rebuilding it', path)
+        return
+
+    return graph
+
+
+def _write_cache(path: str, header: Tuple[int, str], graph: BELGraph) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(temporary_path, 'wb') as file:
+            pickle.dump(header, file, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(graph, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def get_hierarchy_graph(session: Session, cache_path: Optional[str] = None) -> BELGraph:
+    """Get the MeSH hierarchy as a BEL graph of is-a relations between pathologies, processes, and chemicals.
+
+    :param session: A SQLAlchemy session
+    :param cache_path: If given, the path of a pickle file to reuse the graph from if the database hasn't been
+     populated or updated since it was written, and to write the graph to otherwise. Ignored if the database has no
+     fingerprint, see :func:`set_database_fingerprint`.
+    """
+    t = time.time()
+    fingerprint = None if cache_path is None else get_database_fingerprint(session)
+    if fingerprint is None:
+        graph = _build_hierarchy_graph(session)
+        log.info('built hierarchy graph in %.2f seconds', time.time() - t)
+        return graph
+
+    header = EXPORT_VERSION, fingerprint
+    graph = _read_cache(cache_path, header)
+    if graph is not None:
+        log.info('loaded cached hierarchy graph from %s in %.2f seconds', cache_path, time.time() - t)
+        return graph
+
+    graph = _build_hierarchy_graph(session)
+    _write_cache(cache_path, header, graph)
+    log.info('built and cached hierarchy graph to %s in %.2f seconds', cache_path, time.time() - t)
+    return graph
+
+
+def iter_hierarchy_edges(session: Session, tree_numbers: Sequence[str],
+                         categories: Optional[Sequence[str]] = None) -> Iterable[Tuple[BaseEntity, BaseEntity]]:
+    """Iterate over the is-a relations between descriptors in the subtrees under the given tree numbers.
+
+    The tree numbers in the subtrees are read in hierarchical order with range scans over
+    :data:`bio2bel_mesh.models.Tree.tree_key`, so the parent of each tree number, if it was kept, is on a stack of
+    the ones above it. A relation is repeated if two descriptors are related through more than one pair of tree
+    numbers.
+
+    :param session: A SQLAlchemy session
+    :param tree_numbers: Tree numbers like ``C10.228`` or category letters like ``C`` whose subtrees are exported
+    :param categories: The categories of descriptors to keep. Defaults to all of :data:`BEL_CATEGORIES`.
+    :return: Pairs of child and parent BEL nodes
+    """
+    categories = BEL_CATEGORIES if categories is None else categories
+    invalid = set(categories).difference(BEL_CATEGORIES)
+    if invalid:
+        raise ValueError(f'invalid categories: {sorted(invalid)}. Use some of {BEL_CATEGORIES}')
+
+    query = (
+        session.query(
+            Tree.name,
+            Descriptor.descriptor_ui,
+            Descriptor.name,
+            Descriptor.category_mask,
+        )
+        .join(Descriptor, Tree.descriptor_id == Descriptor.id)
+        .filter(or_(*(
+            Tree.in_subtree(tree_number)
+            for tree_number in tree_numbers
+        )))
+        .filter(_has_any_category(categories))
+        .order_by(Tree.tree_key)
+        .yield_per(10_000)
+    )
+    return _iter_hierarchy_edges(query)
+
+
+def _iter_hierarchy_edges(rows: Iterable[Tuple]) -> Iterable[Tuple[BaseEntity, BaseEntity]]:
+    stack: List[Tuple[str, BaseEntity]] = []
+    for tree_name, descriptor_ui, name, category_mask in rows:
+        while stack and not tree_name.startswith(f'{stack[-1][0]}.'):
+            stack.pop()
+
+        bel = get_descriptor_bel(descriptor_ui, name, category_mask)
+        if stack and stack[-1][0] == tree_name.rsplit('.', 1)[0]:
+            yield bel, stack[-1][1]
+        stack.append((tree_name, bel))
+
+
+def write_hierarchy_bel(edges: Iterable[Tuple[BaseEntity, BaseEntity]], file: TextIO) -> int:
+    """Write is-a relations to a BEL script as they come.
+
+    :param edges: Pairs of child and parent BEL nodes, like from :func:`iter_hierarchy_edges`
+    :param file: A writable file-like object
+    :return: The number of relations written
+    """
+    for line in make_knowledge_header(name='MeSH Hierarchy', version='0.0.0', namespace_patterns={'mesh': '.*'}):
+        print(line, file=file)
+    print('SET Citation = {"PubMed","Added by PyBEL","29048466"}', file=file)
+    print(f'SET SupportingText = "{PYBEL_AUTOEVIDENCE}"', file=file)
+
+    count = 0
+    for child, parent in edges:
+        print(f'{child.as_bel()} {IS_A} {parent.as_bel()}', file=file)
+        count += 1
+
+    print('UNSET SupportingText', file=file)
+    print('UNSET Citation', file=file)
+    return count
+
+
+def write_hierarchy_jsonl(edges: Iterable[Tuple[BaseEntity, BaseEntity]], file: TextIO) -> int:
+    """Write is-a relations as JSON lines as they come, each with a source and target node like Node-Link JSON.
+
+    :param edges: Pairs of child and parent BEL nodes, like from :func:`iter_hierarchy_edges`
+    :param file: A writable file-like object
+    :return: The number of relations written
+    """
+    count = 0
+    for child, parent in edges:
+        print(json.dumps({'source': child, 'relation': IS_A, 'target': parent}), file=file)
+        count += 1
+    return count
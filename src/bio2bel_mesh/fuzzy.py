@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+"""Fuzzy matching of names to MeSH descriptors with a character trigram index.
+
+Names are compared by the Jaccard similarity of their sets of character trigrams, after
+:func:`bio2bel_mesh.utils.normalize_name`. To avoid comparing a query to every name, an inverted index from each
+trigram to the names containing it is searched with a prefix filter: a name with a similarity of at least the
+threshold has to share at least a given number of the query's trigrams, so it must contain one of the query's rarest
+trigrams. Only names in the postings of those rare trigrams are scored, and the number of trigrams in each name is
+stored when it's indexed, so candidates whose sizes alone rule them out are skipped without looking at them.
+"""
+
+import logging
+import math
+import time
+from array import array
+from collections import defaultdict
+from typing import FrozenSet, Iterable, List, Tuple
+
+from .utils import normalize_name
+
+__all__ = [
+    'TrigramIndex',
+    'get_trigrams',
+]
+
+log = logging.getLogger(__name__)
+
+
+def _pad(name: str) -> str:
+    return f'  {name} '
+
+
+def get_trigrams(name: str) -> FrozenSet[str]:
+    """Get the set of character trigrams in a normalized name, padded so short names and word starts count."""
+    padded = _pad(name)
+    return frozenset(
+        padded[i:i + 3]
+        for i in range(len(padded) - 2)
+    )
+
+
+class TrigramIndex:
+    """An inverted index from character trigrams to names, for finding the descriptors of misspelled names."""
+
+    def __init__(self, pairs: Iterable[Tuple[str, str]]) -> None:
+        """Build the index.
+
+        :param pairs: Pairs of names and the UIs of their descriptors, like from the terms in the database
+        """
+        t = time.time()
+        self.names: List[str] = []
+        self.descriptor_uis: List[str] = []
+        self._name_descriptor = array('I')
+        self._name_size = array('I')
+
+        descriptor_index, seen = {}, set()
+        postings = defaultdict(lambda: array('I'))
+
+        for name, descriptor_ui in pairs:
+            name = normalize_name(name)
+            if not name or (name, descriptor_ui) in seen:
+                continue
+            seen.add((name, descriptor_ui))
+
+            if descriptor_ui not in descriptor_index:
+                descriptor_index[descriptor_ui] = len(self.descriptor_uis)
+                self.descriptor_uis.append(descriptor_ui)
+
+            i = len(self.names)
+            self.names.append(name)
+            self._name_descriptor.append(descriptor_index[descriptor_ui])
+            trigrams = get_trigrams(name)
+            self._name_size.append(len(trigrams))
+            for trigram in trigrams:
+                postings[trigram].append(i)
+
+        self._postings = dict(postings)
+        log.info('indexed %d names in %.2f seconds', len(self.names), time.time() - t)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def search(self, name: str, k: int = 5, threshold: float = 0.3) -> List[Tuple[str, float]]:
+        """Find the descriptors whose names are most similar to the given name.
+
+        :param name: A name, possibly misspelled or written differently
+        :param k: The maximum number of descriptors to return
+        :param threshold: The minimum Jaccard similarity between trigram sets, greater than zero
+        :return: Pairs of descriptor UIs and the similarity of their best-matching name, most similar first
+        """
+        trigrams = get_trigrams(normalize_name(name))
+        if not trigrams:
+            return []
+
+        # sharing fewer than this many trigrams can't reach the threshold, since a name's similarity to the query
+        # is at most the number shared over the number in the query. So a match contains one of the rarest
+        # len(trigrams) - min_shared + 1 trigrams.
+        min_shared = max(1, math.ceil(threshold * len(trigrams)))
+        rare_trigrams = sorted(trigrams, key=lambda trigram: len(self._postings.get(trigram, ())))
+        candidates = {
+            i
+            for trigram in rare_trigrams[:len(trigrams) - min_shared + 1]
+            for i in self._postings.get(trigram, ())
+        }
+
+        descriptor_score = {}
+        for i in candidates:
+            size = self._name_size[i]
+            # the similarity is at most the smaller size over the larger one
+            if min(size, len(trigrams)) / max(size, len(trigrams)) < threshold:
+                continue
+            # the trigrams of a name are exactly the substrings of length three of its padded form
+            padded = _pad(self.names[i])
+            shared = sum(trigram in padded for trigram in trigrams)
+            score = shared / (len(trigrams) + size - shared)
+            if score < threshold:
+                continue
+            descriptor = self._name_descriptor[i]
+            if descriptor_score.get(descriptor, 0.0) < score:
+                descriptor_score[descriptor] = score
+
+        return sorted(
+            (
+                (self.descriptor_uis[descriptor], score)
+                for descriptor, score in descriptor_score.items()
+            ),
+            key=lambda item: (-item[1], item[0]),
+        )[:k]
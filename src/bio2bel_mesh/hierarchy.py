@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+
+"""A compact, array-backed snapshot of the MeSH hierarchy.
+
+Descriptors with tree numbers are numbered from zero. Their parents and children are stored in compressed sparse
+rows, so the parents of descriptor ``i`` are ``parent_indices[parent_indptr[i]:parent_indptr[i + 1]]``. Tree numbers
+are interned in one fixed-width array sorted by :func:`bio2bel_mesh.utils.get_tree_key`, so a subtree is a binary
+search, and the positions of each descriptor's tree numbers in it are stored in compressed sparse rows too. The
+category flags of each descriptor are packed into the bits of one byte.
+
+Every part is a NumPy array saved to its own ``.npy`` file, so a snapshot saved once can be memory-mapped by any
+number of worker processes, which then share the same pages instead of each querying the database and holding
+their own copy. Snapshots are written to a temporary directory that is renamed into place once complete, along
+with a fingerprint of the database they were built from, so outdated ones can be found.
+
+Requires ``numpy``, which can be installed with ``pip install bio2bel_mesh[numpy]``.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from .categories import CATEGORY_BITS, get_categories
+from .models import Descriptor, DescriptorClosure, Tree
+from .utils import get_tree_key_range
+
+__all__ = [
+    'Hierarchy',
+]
+
+log = logging.getLogger(__name__)
+
+_ARRAY_NAMES = (
+    'descriptor_uis',
+    'name_data',
+    'name_offsets',
+    'categories',
+    'parent_indptr',
+    'parent_indices',
+    'child_indptr',
+    'child_indices',
+    'tree_keys',
+    'tree_numbers',
+    'tree_descriptors',
+    'tree_indptr',
+    'tree_indices',
+)
+
+#: The name of the file holding the fingerprint of the database a snapshot was built from
+FINGERPRINT_FILE_NAME = 'fingerprint.txt'
+
+
+def _get_csr(sources: np.ndarray, targets: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Get the offsets and targets of each source in compressed sparse rows."""
+    order = np.argsort(sources, kind='stable')
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+    return indptr, targets[order].astype(np.int32)
+
+
+def _get_bytes_array(values: Iterable[str]) -> np.ndarray:
+    """Get a fixed-width byte string array, which can be memory-mapped unlike an array of Python objects."""
+    values = [value.encode('utf-8') for value in values]
+    return np.array(values, dtype=f'S{max(map(len, values), default=1)}')
+
+
+class Hierarchy:
+    """Integer-indexed descriptors with their parents, children, tree numbers, and categories."""
+
+    def __init__(self, arrays: Mapping[str, np.ndarray]) -> None:
+        """Wrap the arrays of a snapshot, like from :meth:`from_session` or :meth:`load`."""
+        for name in _ARRAY_NAMES:
+            setattr(self, name, arrays[name])
+        self._ui_index = None
+
+    def __len__(self) -> int:
+        return len(self.descriptor_uis)
+
+    @classmethod
+    def from_session(cls, session: Session) -> 'Hierarchy':
+        """Build a snapshot of the hierarchy in three queries."""
+        t = time.time()
+        descriptors = (
+            session.query(Descriptor.id, Descriptor.descriptor_ui, Descriptor.name, Descriptor.category_mask)
+            .filter(Descriptor.id.in_(session.query(Tree.descriptor_id)))
+            .order_by(Descriptor.id)
+            .all()
+        )
+        n = len(descriptors)
+        descriptor_ids = np.array([row[0] for row in descriptors], dtype=np.int64)
+
+        names = [row[2].encode('utf-8') for row in descriptors]
+        name_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum([len(name) for name in names], out=name_offsets[1:])
+
+        edges = np.array(
+            session.query(DescriptorClosure.descendant_id, DescriptorClosure.ancestor_id)
+            .filter(DescriptorClosure.depth == 1)
+            .all(),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        children = np.searchsorted(descriptor_ids, edges[:, 0])
+        parents = np.searchsorted(descriptor_ids, edges[:, 1])
+        parent_indptr, parent_indices = _get_csr(children, parents, n)
+        child_indptr, child_indices = _get_csr(parents, children, n)
+
+        trees = session.query(Tree.tree_key, Tree.name, Tree.descriptor_id).order_by(Tree.tree_key).all()
+        tree_descriptors = np.searchsorted(
+            descriptor_ids,
+            np.array([descriptor_id for _, _, descriptor_id in trees], dtype=np.int64),
+        )
+        # the sort is stable, so each descriptor's tree numbers stay in hierarchical order
+        tree_indptr, tree_indices = _get_csr(tree_descriptors, np.arange(len(trees)), n)
+
+        rv = cls(dict(
+            descriptor_uis=_get_bytes_array(row[1] for row in descriptors),
+            name_data=np.frombuffer(b''.join(names), dtype=np.uint8),
+            name_offsets=name_offsets,
+            categories=np.array([row[3] for row in descriptors], dtype=np.uint8),
+            parent_indptr=parent_indptr,
+            parent_indices=parent_indices,
+            child_indptr=child_indptr,
+            child_indices=child_indices,
+            tree_keys=_get_bytes_array(tree_key for tree_key, _, _ in trees),
+            tree_numbers=_get_bytes_array(name for _, name, _ in trees),
+            tree_descriptors=tree_descriptors.astype(np.int32),
+            tree_indptr=tree_indptr,
+            tree_indices=tree_indices,
+        ))
+        log.info('built hierarchy of %d descriptors in %.2f seconds', n, time.time() - t)
+        return rv
+
+    def save(self, directory: str, fingerprint: Optional[str] = None) -> None:
+        """Save the arrays of the snapshot to ``.npy`` files in the given directory, replacing what's there.
+
+        The files are written to a temporary directory next to the given one, which is then renamed, so a
+        partially written snapshot is never loaded.
+
+        :param directory: The directory to save the snapshot to
+        :param fingerprint: The fingerprint of the database the snapshot was built from, like from
+         :func:`bio2bel_mesh.export.get_database_fingerprint`
+        """
+        directory = os.path.abspath(directory)
+        parent = os.path.dirname(directory)
+        os.makedirs(parent, exist_ok=True)
+
+        temporary_directory = tempfile.mkdtemp(dir=parent, prefix=f'.{os.path.basename(directory)}.')
+        try:
+            for name in _ARRAY_NAMES:
+                np.save(os.path.join(temporary_directory, f'{name}.npy'), getattr(self, name))
+            if fingerprint is not None:
+                with open(os.path.join(temporary_directory, FINGERPRINT_FILE_NAME), 'w') as file:
+                    print(fingerprint, file=file)
+
+            # a non-empty directory can't be renamed over, so the old snapshot is moved aside first. Processes
+            # that memory-mapped it keep their pages after it's removed.
+            old_directory = None
+            if os.path.exists(directory):
+                old_directory = tempfile.mkdtemp(dir=parent, prefix=f'.{os.path.basename(directory)}.old.')
+                os.replace(directory, os.path.join(old_directory, 'snapshot'))
+            os.replace(temporary_directory, directory)
+            if old_directory is not None:
+                shutil.rmtree(old_directory)
+        finally:
+            if os.path.exists(temporary_directory):
+                shutil.rmtree(temporary_directory)
+
+    @staticmethod
+    def get_fingerprint(directory: str) -> Optional[str]:
+        """Get the fingerprint of the database a saved snapshot was built from, if it was saved with one.
+
+        Snapshots missing any of the arrays, like ones saved by an older version, don't have a fingerprint so that
+        they're rebuilt.
+        """
+        path = os.path.join(directory, FINGERPRINT_FILE_NAME)
+        if not os.path.exists(path):
+            return
+        if not all(os.path.exists(os.path.join(directory, f'{name}.npy')) for name in _ARRAY_NAMES):
+            return
+        with open(path) as file:
+            return file.read().strip()
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'Hierarchy':
+        """Load a snapshot saved with :meth:`save`.
+
+        :param directory: The directory the snapshot was saved to
+        :param mmap: Should the arrays be memory-mapped read-only instead of read into memory?
+        """
+        return cls({
+            name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r' if mmap else None)
+            for name in _ARRAY_NAMES
+        })
+
+    def get_index(self, descriptor_ui: str) -> int:
+        """Get the index of a descriptor by its UI."""
+        if self._ui_index is None:
+            self._ui_index = {
+                ui.decode('utf-8'): i
+                for i, ui in enumerate(self.descriptor_uis.tolist())
+            }
+        return self._ui_index[descriptor_ui]
+
+    def get_ui(self, i: int) -> str:
+        """Get the UI of the descriptor with the given index."""
+        return self.descriptor_uis[i].decode('utf-8')
+
+    def get_name(self, i: int) -> str:
+        """Get the name of the descriptor with the given index."""
+        return bytes(self.name_data[self.name_offsets[i]:self.name_offsets[i + 1]]).decode('utf-8')
+
+    def get_parents(self, i: int) -> np.ndarray:
+        """Get the indexes of the parents of the descriptor with the given index."""
+        return self.parent_indices[self.parent_indptr[i]:self.parent_indptr[i + 1]]
+
+    def get_children(self, i: int) -> np.ndarray:
+        """Get the indexes of the children of the descriptor with the given index."""
+        return self.child_indices[self.child_indptr[i]:self.child_indptr[i + 1]]
+
+    def get_tree_numbers(self, i: int) -> List[str]:
+        """Get the tree numbers of the descriptor with the given index, in hierarchical order."""
+        positions = self.tree_indices[self.tree_indptr[i]:self.tree_indptr[i + 1]]
+        return [
+            tree_number.decode('utf-8')
+            for tree_number in self.tree_numbers[positions].tolist()
+        ]
+
+    def get_subtree(self, tree_number: str) -> np.ndarray:
+        """Get the indexes of the descriptors in the subtree of a tree number or category letter, sorted."""
+        lower, upper = get_tree_key_range(tree_number)
+        start = np.searchsorted(self.tree_keys, lower.encode('utf-8'))
+        end = len(self.tree_keys) if upper is None else np.searchsorted(self.tree_keys, upper.encode('utf-8'))
+        return np.unique(self.tree_descriptors[start:end])
+
+    def get_category_mask(self, category: str, descriptors: Optional[np.ndarray] = None) -> np.ndarray:
+        """Get a boolean array saying which descriptors are in a category, like ``pathology``.
+
+        :param category: One of :data:`bio2bel_mesh.categories.CATEGORIES`
+        :param descriptors: The indexes of the descriptors to check. Defaults to all of them.
+        """
+        bit = np.uint8(CATEGORY_BITS[category])
+        categories = self.categories if descriptors is None else self.categories[descriptors]
+        return (categories & bit).astype(bool)
+
+    def get_categories(self, i: int) -> List[str]:
+        """Get the categories of the descriptor with the given index."""
+        return get_categories(int(self.categories[i]))
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+"""A bounded cache for looking up MeSH descriptors from BEL nodes."""
+
+from collections import OrderedDict
+from typing import Any, Hashable, Mapping
+
+__all__ = [
+    'MISSING',
+    'LookupCache',
+]
+
+#: Returned by :meth:`LookupCache.get` when a key isn't cached, since ``None`` is cached for misses
+MISSING = object()
+
+
+class LookupCache:
+    """A least-recently-used cache that also remembers keys that couldn't be looked up."""
+
+    def __init__(self, maxsize: int = 100_000) -> None:
+        """Initialize the cache.
+
+        :param maxsize: The number of entries kept before the least recently used ones are evicted
+        """
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Any:
+        """Get the cached value for a key, or :data:`MISSING` if it's not cached.
+
+        A cached value of ``None`` means the key was looked up before and nothing was found.
+        """
+        value = self._data.get(key, MISSING)
+        if value is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Cache a value for a key, evicting the least recently used entry if the cache is full."""
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if self.maxsize < len(self._data):
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all entries, e.g., after the database changes."""
+        self._data.clear()
+
+    def summarize(self) -> Mapping[str, int]:
+        """Summarize the size and use of the cache."""
+        return dict(
+            size=len(self._data),
+            maxsize=self.maxsize,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+        )
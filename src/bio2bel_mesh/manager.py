@@ -3,13 +3,15 @@
 """Manager for Bio2BEL MeSH."""
 
 import logging
+import sys
 import time
-from collections import Counter
-from itertools import groupby
-from operator import itemgetter
-from typing import Iterable, List, Mapping, Optional, Tuple
+from collections import Counter, OrderedDict
+from functools import partial
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, TextIO, Tuple
 
-from networkx import relabel_nodes
+import click
+from sqlalchemy import inspect
+from sqlalchemy.orm import aliased
 from tqdm import tqdm
 
 from bio2bel import AbstractManager
@@ -17,12 +19,31 @@ from bio2bel.manager.bel_manager import BELManagerMixin
 from bio2bel.manager.flask_manager import FlaskMixin
 from bio2bel.manager.namespace_manager import BELNamespaceManagerMixin
 from pybel import BELGraph
-from pybel.constants import FUNCTION, FUSION, IDENTIFIER, MEMBERS, NAME, NAMESPACE, REACTANTS, VARIANTS
-from pybel.dsl import BaseEntity, FUNC_TO_DSL
+from pybel.constants import IDENTIFIER, NAME, NAMESPACE
+from pybel.dsl import BaseEntity
 from pybel.manager.models import Namespace, NamespaceEntry
+from .bulk import BulkLoader, get_fingerprint, prefetch_records, sqlite_fast_load
+from .categories import get_mask
+from .closure import build_closure, delete_closure, refresh_closure
 from .constants import MODULE_NAME
-from .models import Base, Concept, Descriptor, Term, Tree
-from .parsers import get_descriptor_records, get_supplementary_records
+from .export import (
+    get_bel_cache_path, get_database_fingerprint, get_hierarchy_graph, iter_hierarchy_edges, set_database_fingerprint,
+    write_hierarchy_bel, write_hierarchy_jsonl,
+)
+from .fuzzy import TrigramIndex
+from .lookup import LookupCache, MISSING
+from .models import Base, Concept, Descriptor, DescriptorClosure, Term, Tree
+from .namespace import (
+    delete_namespace_entries, insert_namespace_entries, refresh_namespace_entries, write_annotation_values,
+    write_namespace_values,
+)
+from .normalize import LookupSnapshot, normalize_graph_paths, normalize_graphs, relabel_mesh_nodes
+from .parsers import (
+    download_descriptors_release, download_supplement_release, get_descriptor_records, get_supplementary_records,
+)
+from .search import build_search_index, drop_search_index, has_search_index, search_terms
+from .tagger import Mention, Tagger, tag_documents
+from .utils import get_tree_depth, iter_batches, normalize_name
 
 __all__ = [
     'Manager',
@@ -30,6 +51,22 @@ __all__ = [
 
 log = logging.getLogger(__name__)
 
+#: Functions for writing is-a relations, by the formats of :meth:`Manager.export_hierarchy`
+HIERARCHY_WRITERS = {
+    'bel': write_hierarchy_bel,
+    'jsonl': write_hierarchy_jsonl,
+}
+
+#: The number of parameters to bind at once in ``IN`` queries, which stays below SQLite's default limit
+IN_CHUNK_SIZE = 900
+
+
+def _get_outdated_message(table_names: Iterable[str]) -> str:
+    return (
+        f'the tables {", ".join(table_names)} were made by an older version of {MODULE_NAME}. Drop and populate '
+        f'the database again with `bio2bel_mesh drop` then `bio2bel_mesh populate`'
+    )
+
 
 class Manager(AbstractManager, BELNamespaceManagerMixin, BELManagerMixin, FlaskMixin):
     """Bio2BEL MeSH manager."""
@@ -48,6 +85,60 @@ class Manager(AbstractManager, BELNamespaceManagerMixin, BELManagerMixin, FlaskM
     is_namespace = True
     is_annotation = True
 
+    def __init__(self, *args, lookup_cache_size: int = 100_000, **kwargs) -> None:  # noqa: D107
+        super().__init__(*args, **kwargs)
+        self.lookup_cache = LookupCache(maxsize=lookup_cache_size)
+        self._has_search_index = None
+        self._fuzzy_index = None
+        self._tagger = None
+
+        outdated_tables = self.get_outdated_tables()
+        if outdated_tables:
+            log.warning(_get_outdated_message(outdated_tables))
+
+    def get_outdated_tables(self) -> List[str]:
+        """List the tables whose columns differ from the models, like ones made by an older version.
+
+        Tables that are missing are made when the manager is created, but existing ones aren't changed, so a
+        database made by an older version has to be dropped and populated again.
+        """
+        inspector = inspect(self.engine)
+        table_names = set(inspector.get_table_names())
+        return [
+            table.name
+            for table in self._metadata.sorted_tables
+            if table.name in table_names
+            if {column['name'] for column in inspector.get_columns(table.name)} != set(table.columns.keys())
+        ]
+
+    def _assert_schema(self) -> None:
+        outdated_tables = self.get_outdated_tables()
+        if outdated_tables:
+            raise ValueError(_get_outdated_message(outdated_tables))
+
+    def build_search_index(self) -> None:
+        """Build the full-text index over terms used by :meth:`search_terms`.
+
+        Called whenever the database is populated or updated.
+        """
+        self._has_search_index = build_search_index(self.session)
+
+    def clear_lookup_cache(self) -> None:
+        """Clear the caches used by :meth:`look_up_node`, :meth:`fuzzy_match`, and :meth:`tag_documents`.
+
+        Called whenever the database is populated or updated.
+        """
+        self.lookup_cache.clear()
+        self._fuzzy_index = None
+        self._tagger = None
+
+    def drop_all(self, check_first: bool = True) -> None:
+        """Drop all tables from the database, along with the full-text index and the caches built from them."""
+        drop_search_index(self.session)
+        self._has_search_index = None
+        self.clear_lookup_cache()
+        super().drop_all(check_first=check_first)
+
     def is_populated(self) -> bool:
         """Check if the database is already populated."""
         return 0 < self.count_terms()
@@ -60,13 +151,183 @@ class Manager(AbstractManager, BELNamespaceManagerMixin, BELManagerMixin, FlaskM
         """List the descriptors from the database."""
         return self._list_model(Descriptor)
 
+    def _filter_categories(self, query, categories: Iterable[str], match_all: bool = False):
+        """Filter a query over descriptors to some categories with the index on the category bitmask.
+
+        The index can't be used to check bits, so the distinct bitmasks are read from the index first and the query
+        is filtered to the ones with the right bits, of which there are only a few.
+        """
+        mask = get_mask(categories)
+        category_masks = [
+            category_mask
+            for category_mask, in self.session.query(Descriptor.category_mask).distinct()
+            if (category_mask & mask == mask if match_all else category_mask & mask)
+        ]
+        return query.filter(Descriptor.category_mask.in_(category_masks))
+
+    def get_descriptors_by_categories(self, categories: Iterable[str], match_all: bool = False) -> List[Descriptor]:
+        """Get the descriptors in any of the given categories, ordered by name.
+
+        :param categories: Categories from :data:`bio2bel_mesh.categories.CATEGORIES`, like ``pathology``
+        :param match_all: Should only descriptors in all of the categories be kept?
+        """
+        query = self._filter_categories(self.session.query(Descriptor), categories, match_all=match_all)
+        return query.order_by(Descriptor.name).all()
+
+    def count_descriptors_by_categories(self, categories: Iterable[str], match_all: bool = False) -> int:
+        """Count the descriptors in any of the given categories, or in all of them if ``match_all`` is true."""
+        query = self._filter_categories(self.session.query(Descriptor), categories, match_all=match_all)
+        return query.count()
+
     def get_descriptor_by_ui(self, descriptor_ui: str) -> Optional[Descriptor]:
         """Get a descriptor by its UI, if it exists."""
-        return self.session.query(Descriptor.descriptor_ui == descriptor_ui).one_or_none()
+        return self.session.query(Descriptor).filter(Descriptor.descriptor_ui == descriptor_ui).one_or_none()
+
+    def get_descriptors_by_uis(self, descriptor_uis: Iterable[str]) -> Dict[str, Descriptor]:
+        """Get a dictionary from the given UIs to descriptors, for the ones that exist."""
+        return self._get_models_by_keys(Descriptor, Descriptor.descriptor_ui, descriptor_uis)
 
     def get_descriptor_by_name(self, name: str) -> Optional[Descriptor]:
         """Get a descriptor by its name, if it exists."""
-        return self.session.query(Descriptor.name == name).one_or_none()
+        return self.session.query(Descriptor).filter(Descriptor.name == name).one_or_none()
+
+    def get_descriptors_by_names(self, names: Iterable[str]) -> Dict[str, Descriptor]:
+        """Get a dictionary from the given names to descriptors, for the ones that exist."""
+        return self._get_models_by_keys(Descriptor, Descriptor.name, names)
+
+    def get_descriptor_by_normalized_name(self, name: str) -> Optional[Descriptor]:
+        """Get a descriptor by its name ignoring case, punctuation, whitespace, and possessives, if it exists."""
+        return (
+            self.session.query(Descriptor)
+            .filter(Descriptor.normalized_name == normalize_name(name))
+            .order_by(Descriptor.id)
+            .first()
+        )
+
+    def get_descriptors_by_normalized_names(self, names: Iterable[str]) -> Dict[str, Descriptor]:
+        """Get a dictionary from the given names to descriptors matched by :func:`normalize_name`."""
+        return self._get_models_by_normalized_names(Descriptor, names)
+
+    def get_ancestors(self, descriptor_ui: str, max_depth: Optional[int] = None,
+                      include_self: bool = False) -> List[Descriptor]:
+        """Get the descriptors above the given one in the hierarchy, closest first.
+
+        :param descriptor_ui: The UI of a descriptor
+        :param max_depth: If given, only get ancestors at most this many levels up
+        :param include_self: Should the descriptor itself be included?
+        """
+        return self._query_closure(descriptor_ui, DescriptorClosure.descendant_id, DescriptorClosure.ancestor_id,
+                                   max_depth=max_depth, include_self=include_self)
+
+    def get_descendants(self, descriptor_ui: str, max_depth: Optional[int] = None,
+                        include_self: bool = False) -> List[Descriptor]:
+        """Get the descriptors below the given one in the hierarchy, closest first.
+
+        :param descriptor_ui: The UI of a descriptor
+        :param max_depth: If given, only get descendants at most this many levels down, e.g., 1 for its children
+        :param include_self: Should the descriptor itself be included?
+        """
+        return self._query_closure(descriptor_ui, DescriptorClosure.ancestor_id, DescriptorClosure.descendant_id,
+                                   max_depth=max_depth, include_self=include_self)
+
+    def _query_closure(self, descriptor_ui: str, source_column, target_column, max_depth: Optional[int] = None,
+                       include_self: bool = False) -> List[Descriptor]:
+        source = aliased(Descriptor)
+        query = (
+            self.session.query(Descriptor)
+            .join(DescriptorClosure, target_column == Descriptor.id)
+            .join(source, source_column == source.id)
+            .filter(source.descriptor_ui == descriptor_ui)
+        )
+        if not include_self:
+            query = query.filter(0 < DescriptorClosure.depth)
+        if max_depth is not None:
+            query = query.filter(DescriptorClosure.depth <= max_depth)
+        return query.order_by(DescriptorClosure.depth, Descriptor.name).all()
+
+    def is_descendant(self, descriptor_ui: str, ancestor_ui: str) -> bool:
+        """Check if a descriptor is in the subtree of another, including being the same descriptor."""
+        ancestor, descendant = aliased(Descriptor), aliased(Descriptor)
+        query = (
+            self.session.query(DescriptorClosure)
+            .join(ancestor, DescriptorClosure.ancestor_id == ancestor.id)
+            .join(descendant, DescriptorClosure.descendant_id == descendant.id)
+            .filter(ancestor.descriptor_ui == ancestor_ui, descendant.descriptor_ui == descriptor_ui)
+        )
+        return self.session.query(query.exists()).scalar()
+
+    def get_semantic_similarity(self, wang_weight: float = 0.8):
+        """Load the hierarchy for calculating semantic similarities between descriptors.
+
+        Requires ``numpy``.
+
+        :rtype: bio2bel_mesh.similarity.SemanticSimilarity
+        """
+        from .similarity import SemanticSimilarity
+        return SemanticSimilarity.from_session(self.session, wang_weight=wang_weight)
+
+    def get_hierarchy(self, directory: Optional[str] = None):
+        """Get an array-backed snapshot of the hierarchy.
+
+        Requires ``numpy``.
+
+        :param directory: If given, memory-map the snapshot saved in this directory, building and saving it there
+         first if it doesn't exist yet or the database changed since it was saved
+        :rtype: bio2bel_mesh.hierarchy.Hierarchy
+        """
+        from .hierarchy import Hierarchy
+
+        if directory is None:
+            return Hierarchy.from_session(self.session)
+
+        fingerprint = get_database_fingerprint(self.session)
+        if fingerprint is None or Hierarchy.get_fingerprint(directory) != fingerprint:
+            log.info('saving hierarchy to %s', directory)
+            Hierarchy.from_session(self.session).save(directory, fingerprint=fingerprint)
+        return Hierarchy.load(directory)
+
+    def get_subtree_trees(self, tree_number: str, max_depth: Optional[int] = None) -> List[Tree]:
+        """Get the tree numbers in the subtree of a tree number or category letter, in hierarchical order.
+
+        This is a single range scan over the index on :data:`Tree.tree_key`.
+
+        :param tree_number: A tree number like ``C10.228`` or a category letter like ``C``
+        :param max_depth: If given, only get tree numbers at most this many levels below the given one
+        """
+        query = self.session.query(Tree).filter(Tree.in_subtree(tree_number))
+        if max_depth is not None:
+            query = query.filter(Tree.depth <= get_tree_depth(tree_number) + max_depth)
+        return query.order_by(Tree.tree_key).all()
+
+    def get_subtree_descriptors(self, tree_number: str) -> List[Descriptor]:
+        """Get the descriptors with a tree number in the subtree of a tree number or category letter.
+
+        Descriptors are in the hierarchical order of their first tree number in the subtree.
+        """
+        query = (
+            self.session.query(Descriptor)
+            .join(Tree, Tree.descriptor_id == Descriptor.id)
+            .filter(Tree.in_subtree(tree_number))
+            .order_by(Tree.tree_key)
+        )
+        return list(OrderedDict.fromkeys(query))
+
+    def get_tree_children(self, tree_number: str) -> List[Tree]:
+        """Get the tree numbers directly below a tree number, in order."""
+        return [
+            tree
+            for tree in self.get_subtree_trees(tree_number, max_depth=1)
+            if tree.name != tree_number
+        ]
+
+    def get_tree_siblings(self, tree_number: str) -> List[Tree]:
+        """Get the other tree numbers with the same parent as a tree number, in order."""
+        parent = tree_number.rsplit('.', 1)[0] if '.' in tree_number else tree_number[0]
+        return [
+            tree
+            for tree in self.get_subtree_trees(parent, max_depth=1)
+            if tree.depth == get_tree_depth(tree_number) and tree.name != tree_number
+        ]
 
     def count_concepts(self) -> int:
         """Count the number of concepts in the database."""
@@ -78,7 +339,11 @@ class Manager(AbstractManager, BELNamespaceManagerMixin, BELManagerMixin, FlaskM
 
     def get_concept_by_ui(self, concept_ui) -> Optional[Concept]:
         """Get a concept by its UI, if it exists."""
-        return self.session.query(Concept.concept_ui == concept_ui).one_or_none()
+        return self.session.query(Concept).filter(Concept.concept_ui == concept_ui).one_or_none()
+
+    def get_concepts_by_uis(self, concept_uis: Iterable[str]) -> Dict[str, Concept]:
+        """Get a dictionary from the given UIs to concepts, for the ones that exist."""
+        return self._get_models_by_keys(Concept, Concept.concept_ui, concept_uis)
 
     def count_terms(self) -> int:
         """Count the number of terms in the database."""
@@ -90,11 +355,68 @@ class Manager(AbstractManager, BELNamespaceManagerMixin, BELManagerMixin, FlaskM
 
     def get_term_by_ui(self, term_ui: str) -> Optional[Term]:
         """Get a term by its UI, if it exists."""
-        return self.session.query(Term.term_ui == term_ui).one_or_none()
+        return self.session.query(Term).filter(Term.term_ui == term_ui).order_by(Term.id).first()
+
+    def get_terms_by_uis(self, term_uis: Iterable[str]) -> Dict[str, Term]:
+        """Get a dictionary from the given UIs to terms, for the ones that exist.
+
+        Permuted terms share their UI, in which case the first one loaded is used.
+        """
+        return self._get_models_by_keys(Term, Term.term_ui, term_uis)
 
     def get_term_by_name(self, name: str) -> Optional[Term]:
-        """Get a term by its name, if it exists."""
-        return self.session.query(Term).filter(Term.name == name).one_or_none()
+        """Get a term by its name, if it exists.
+
+        If several terms have the same name, the first one loaded is used.
+        """
+        return self.session.query(Term).filter(Term.name == name).order_by(Term.id).first()
+
+    def get_terms_by_names(self, names: Iterable[str]) -> Dict[str, Term]:
+        """Get a dictionary from the given names to terms, for the ones that exist.
+
+        If several terms have the same name, the first one loaded is used.
+        """
+        return self._get_models_by_keys(Term, Term.name, names)
+
+    def get_term_by_normalized_name(self, name: str) -> Optional[Term]:
+        """Get a term by its name ignoring case, punctuation, whitespace, and possessives, if it exists."""
+        return self.session.query(Term).filter(Term.normalized_name == normalize_name(name)).order_by(Term.id).first()
+
+    def get_terms_by_normalized_names(self, names: Iterable[str]) -> Dict[str, Term]:
+        """Get a dictionary from the given names to terms matched by :func:`normalize_name`."""
+        return self._get_models_by_normalized_names(Term, names)
+
+    def search_terms(self, query: str, limit: int = 10) -> List[Term]:
+        """Search for terms whose names contain the words in the query, the last of which can be partial.
+
+        Uses the full-text index on SQLite, otherwise only finds names starting with the query.
+
+        :param query: A query like ``alzheimer dis``
+        :param limit: The maximum number of terms to return, best matches first
+        """
+        if self._has_search_index is None:
+            self._has_search_index = has_search_index(self.session)
+        return search_terms(self.session, query, limit=limit, full_text=self._has_search_index)
+
+    def _get_models_by_normalized_names(self, model, names: Iterable[str]) -> Dict:
+        name_key = {
+            name: normalize_name(name)
+            for name in names
+        }
+        key_model = self._get_models_by_keys(model, model.normalized_name, name_key.values())
+        return {
+            name: key_model[key]
+            for name, key in name_key.items()
+            if key in key_model
+        }
+
+    def _get_models_by_keys(self, model, column, keys: Iterable[str]) -> Dict:
+        """Get a dictionary from keys to the models whose column matches, with one ``IN`` query per chunk of keys."""
+        rv = {}
+        for chunk in iter_batches(sorted(set(keys)), IN_CHUNK_SIZE):
+            for instance in self.session.query(model).filter(column.in_(chunk)).order_by(model.id):
+                rv.setdefault(getattr(instance, column.key), instance)
+        return rv
 
     def summarize(self) -> Mapping[str, int]:
         """Summarize the database."""
@@ -104,130 +426,208 @@ class Manager(AbstractManager, BELNamespaceManagerMixin, BELManagerMixin, FlaskM
             descriptors=self.count_descriptors()
         )
 
-    def populate(self, descriptors_path: Optional[str] = None, supplement_path: Optional[str] = None) -> None:
-        """Populate the database."""
-        self._populate_descriptors(path=descriptors_path)
-        self._populate_supplement(path=supplement_path)
+    def populate(self, descriptors_path: Optional[str] = None, supplement_path: Optional[str] = None,
+                 stream: bool = False, workers: Optional[int] = None, batch_size: Optional[int] = None,
+                 fast: bool = False, pipeline: bool = False) -> None:
+        """Populate the database.
+
+        :param descriptors_path: Path to the MeSH descriptors XML GZIP file
+        :param supplement_path: Path to the MeSH supplementary records XML GZIP file
+        :param stream: Should the XML be parsed incrementally instead of loading it all in memory?
+        :param workers: If more than one, the number of processes across which the XML records are converted
+        :param batch_size: The number of records to insert per transaction
+        :param fast: If using SQLite, should durability be relaxed and indexes be built after loading?
+        :param pipeline: Should records be parsed in background threads while earlier ones are inserted?
+         Works best with ``stream`` so records flow to the database as they're parsed.
+        """
+        self._assert_schema()
+        kwargs = dict(stream=stream, workers=workers, batch_size=batch_size, pipeline=pipeline)
+
+        # a new fingerprint before and after loading, so caches of the old contents are outdated even if it fails
+        set_database_fingerprint(self.session)
+        try:
+            if fast and self.engine.dialect.name == 'sqlite':
+                with sqlite_fast_load(self.session, self._metadata.sorted_tables):
+                    self._populate(descriptors_path, supplement_path, **kwargs)
+            else:
+                if fast:
+                    log.warning('fast loading is only available for SQLite. Loading normally')
+                self._populate(descriptors_path, supplement_path, **kwargs)
+            self.build_search_index()
+            set_database_fingerprint(self.session)
+        finally:
+            self.clear_lookup_cache()
+
+    def _populate(self, descriptors_path: Optional[str] = None, supplement_path: Optional[str] = None,
+                  stream: bool = False, workers: Optional[int] = None, batch_size: Optional[int] = None,
+                  pipeline: bool = False) -> None:
+        if not pipeline:
+            self._populate_descriptors(path=descriptors_path, stream=stream, workers=workers, batch_size=batch_size)
+            self._populate_supplement(path=supplement_path, stream=stream, workers=workers, batch_size=batch_size)
+        else:
+            # both files start getting parsed right away. the supplement waits in a bounded queue
+            # while the descriptors are inserted
+            log.info('getting descriptor and supplementary xml')
+            descriptor_records = prefetch_records(
+                partial(get_descriptor_records, path=descriptors_path, stream=stream, workers=workers),
+                batch_size=batch_size,
+            )
+            supplementary_records = prefetch_records(
+                partial(get_supplementary_records, path=supplement_path, stream=stream, workers=workers),
+                batch_size=batch_size,
+            )
+            try:
+                self._populate_records(descriptor_records, batch_size=batch_size)
+                self._populate_records(supplementary_records, batch_size=batch_size)
+            finally:
+                descriptor_records.close()
+                supplementary_records.close()
+
+        build_closure(self.session)
 
-    def _populate_descriptors(self, path: Optional[str] = None) -> None:
+    def _populate_descriptors(self, path: Optional[str] = None, stream: bool = False,
+                              workers: Optional[int] = None, batch_size: Optional[int] = None) -> None:
         log.info('getting descriptor xml')
-        records = get_descriptor_records(path=path)
-        self._populate_records(records)
+        records = get_descriptor_records(path=path, stream=stream, workers=workers)
+        self._populate_records(records, batch_size=batch_size)
 
-    def _populate_supplement(self, path: Optional[str] = None) -> None:
+    def _populate_supplement(self, path: Optional[str] = None, stream: bool = False,
+                             workers: Optional[int] = None, batch_size: Optional[int] = None) -> None:
         log.info('getting supplementary xml')
-        records = get_supplementary_records(path=path)
-        self._populate_records(records)
-
-    def _populate_records(self, records: List[Mapping]) -> None:
-        ui_descriptor = {d.descriptor_ui: d for d in self.list_descriptors()}
-        ui_concept = {d.concept_ui: d for d in self.list_concepts()}
-        ui_term = {d.term_ui: d for d in self.list_terms()}
-
-        log.info('building models')
-        for descriptor_xml in tqdm(records):
-            descriptor_ui = descriptor_xml['descriptor_ui']
-
-            descriptor = ui_descriptor.get(descriptor_ui)
-            if descriptor is None:
-                tree_names = descriptor_xml.get('tree_numbers', [])
-
-                is_anatomy = any(
-                    tree_name.startswith('A')
-                    for tree_name in tree_names
-                )
-                is_organism = any(
-                    tree_name.startswith('B')
-                    for tree_name in tree_names
-                )
-                is_pathology = any(
-                    tree_name.startswith(prefix)
-                    for tree_name in tree_names
-                    for prefix in ('C', 'F')
-                )
-                is_chemical = any(
-                    tree_name.startswith('D')
-                    for tree_name in tree_names
-                    if not any(
-                        tree_name.startswith(prefix)
-                        for prefix in (
-                            'D05.500',  # multiprotein complexes
-                            'D12.776',  # protein
-                            'D08.811',  # enzymes
-                            'D08.244',  # cytochromes
-                            'D08.622',  # enzyme precursors
-                        )
-                    )
-                )
-                is_protein = any(
-                    tree_name.startswith(prefix)
-                    for tree_name in tree_names
-                    for prefix in (
-                        'D12.776',  # protein
-                        'D08.811',  # enzymes
-                        'D08.244',  # cytochromes
-                        'D08.622',  # enzyme precursors
-                    )
-                )
-                is_complex = any(
-                    tree_name.startswith('D05.500')
-                    for tree_name in tree_names
-                )
-                is_measurement = any(
-                    tree_name.startswith('E')
-                    for tree_name in tree_names
-                )
-                is_process = any(
-                    tree_name.startswith('G')
-                    for tree_name in tree_names
-                ) and not any(
-                    tree_name.startswith(prefix)
-                    for tree_name in tree_names
-                    for prefix in ('G01', 'G15', 'G17')
-                )
-
-                descriptor = Descriptor(
-                    descriptor_ui=descriptor_ui,
-                    name=descriptor_xml['name'],
-                    is_anatomy=is_anatomy,
-                    is_organism=is_organism,
-                    is_pathology=is_pathology,
-                    is_chemical=is_chemical,
-                    is_protein=is_protein,
-                    is_complex=is_complex,
-                    is_measurement=is_measurement,
-                    is_process=is_process,
-                    trees=[
-                        Tree(name=tree_name)
-                        for tree_name in tree_names
-                    ],
-                )
-                self.session.add(descriptor)
-
-            for concept_xml in descriptor_xml['concepts']:
-                concept_ui, concept_name = concept_xml['concept_ui'], concept_xml['name']
-
-                concept = ui_concept.get(concept_ui)
-                if concept is None:
-                    concept = Concept(concept_ui=concept_ui, name=concept_name, descriptor=descriptor)
-                    self.session.add(concept)
-
-                for term_xml in concept_xml['terms']:
-
-                    # if term_xml['IsPermutedTermYN'] == 'Y':
-                    #    continue  # FIXME need better solution for these
-
-                    term_ui, term_name = term_xml['term_ui'], term_xml['name']
-
-                    term = ui_term.get(term_ui)
-                    if term is None:
-                        term = Term(term_ui=term_ui, name=term_name, concept=concept)
-                        self.session.add(term)
+        records = get_supplementary_records(path=path, stream=stream, workers=workers)
+        self._populate_records(records, batch_size=batch_size)
+
+    def _populate_records(self, records: Iterable[Mapping], batch_size: Optional[int] = None,
+                          reuse_descriptor_ids: Optional[Mapping[str, int]] = None) -> None:
+        # only fetch (UI, identifier) pairs so the models already loaded aren't hydrated
+        loader = BulkLoader(
+            session=self.session,
+            ui_descriptor_id=dict(self.session.query(Descriptor.descriptor_ui, Descriptor.id)),
+            ui_concept_id=dict(self.session.query(Concept.concept_ui, Concept.id)),
+            term_uis={term_ui for term_ui, in self.session.query(Term.term_ui).distinct()},
+            batch_size=batch_size,
+            reuse_descriptor_ids=reuse_descriptor_ids,
+        )
+
+        log.info('loading models')
+        loader.load(records)
+
+    def update(self, descriptors_path: Optional[str] = None, supplement_path: Optional[str] = None,
+               year: Optional[str] = None, stream: bool = True, workers: Optional[int] = None,
+               batch_size: Optional[int] = None) -> Mapping[str, int]:
+        """Update the database to another MeSH release, only changing the descriptors that differ.
+
+        Descriptors are matched by UI and compared using the fingerprint of the record they were loaded from.
+        New descriptors are inserted, changed ones (e.g., renamed, with new tree numbers or terms) are reloaded
+        with their concepts, terms, and trees, and ones missing from the release are deleted. If the BEL namespace
+        has been uploaded, its entries are changed to match.
+
+        :param descriptors_path: Path to the new MeSH descriptors XML GZIP file
+        :param supplement_path: Path to the new MeSH supplementary records XML GZIP file
+        :param year: If paths aren't given, the year of the MeSH release to download
+        :param stream: Should the XML be parsed incrementally instead of loading it all in memory?
+        :param workers: If more than one, the number of processes across which the XML records are converted
+        :param batch_size: The number of records to insert per transaction
+        :return: The number of descriptors inserted, updated, deleted, and unchanged
+        """
+        self._assert_schema()
+        if year is not None:
+            descriptors_path = descriptors_path or download_descriptors_release(year)
+            supplement_path = supplement_path or download_supplement_release(year)
+
+        ui_fingerprint = dict(self.session.query(Descriptor.descriptor_ui, Descriptor.fingerprint))
+        seen_uis = set()
+        inserted, updated = [], []
+
+        for records in (get_descriptor_records(path=descriptors_path, stream=stream, workers=workers),
+                        get_supplementary_records(path=supplement_path, stream=stream, workers=workers)):
+            for record in tqdm(records, desc='Comparing records'):
+                descriptor_ui = record['descriptor_ui']
+                seen_uis.add(descriptor_ui)
+
+                if descriptor_ui not in ui_fingerprint:
+                    inserted.append(record)
+                elif ui_fingerprint[descriptor_ui] != get_fingerprint(record):
+                    updated.append(record)
+
+        deleted_uis = set(ui_fingerprint) - seen_uis
+        updated_uis = {record['descriptor_ui'] for record in updated}
+
+        set_database_fingerprint(self.session)
+
+        log.info('deleting %d descriptors', len(deleted_uis) + len(updated_uis))
+        ui_descriptor_id = self._delete_descriptors(deleted_uis | updated_uis)
+
+        log.info('loading %d descriptors', len(inserted) + len(updated))
+        self._populate_records(
+            updated + inserted,
+            batch_size=batch_size,
+            reuse_descriptor_ids={
+                descriptor_ui: ui_descriptor_id[descriptor_ui]
+                for descriptor_ui in updated_uis
+            },
+        )
+        changed_descriptor_ids = set(ui_descriptor_id.values())
+        for uis in iter_batches([record['descriptor_ui'] for record in inserted], IN_CHUNK_SIZE):
+            changed_descriptor_ids.update(
+                descriptor_id
+                for descriptor_id, in self.session.query(Descriptor.id).filter(Descriptor.descriptor_ui.in_(uis))
+            )
+        refresh_closure(self.session, changed_descriptor_ids)
+
+        namespace = self._get_default_namespace()
+        if namespace is not None:
+            self._update_namespace(namespace)
+
+        self.clear_lookup_cache()
+        self.build_search_index()
+        set_database_fingerprint(self.session)
+
+        rv = dict(
+            inserted=len(inserted),
+            updated=len(updated),
+            deleted=len(deleted_uis),
+            unchanged=len(seen_uis) - len(inserted) - len(updated),
+        )
+        log.info('updated MeSH: %s', ', '.join(f'{count} {key}' for key, count in rv.items()))
+        return rv
+
+    def _delete_descriptors(self, descriptor_uis: Iterable[str]) -> Mapping[str, int]:
+        """Delete descriptors and everything that refers to them then return their former identifiers."""
+        rv = {}
+        for uis in iter_batches(sorted(descriptor_uis), IN_CHUNK_SIZE):
+            ui_descriptor_id = dict(
+                self.session.query(Descriptor.descriptor_ui, Descriptor.id).filter(Descriptor.descriptor_ui.in_(uis))
+            )
+            descriptor_ids = list(ui_descriptor_id.values())
+            concept_ids = [
+                concept_id
+                for concept_id, in self.session.query(Concept.id).filter(Concept.descriptor_id.in_(descriptor_ids))
+            ]
+
+            for concept_ids_chunk in iter_batches(concept_ids, IN_CHUNK_SIZE):
+                self.session.execute(Term.__table__.delete().where(Term.concept_id.in_(concept_ids_chunk)))
+            self.session.execute(Concept.__table__.delete().where(Concept.descriptor_id.in_(descriptor_ids)))
+            self.session.execute(Tree.__table__.delete().where(Tree.descriptor_id.in_(descriptor_ids)))
+            delete_closure(self.session, descriptor_ids)
+            self.session.execute(Descriptor.__table__.delete().where(Descriptor.id.in_(descriptor_ids)))
+
+            rv.update(ui_descriptor_id)
 
-        t = time.time()
-        log.info('committing models')
         self.session.commit()
-        log.info('committed models in %.2f seconds', time.time() - t)
+        return rv
+
+    @staticmethod
+    def _cli_add_populate(main: click.Group) -> click.Group:
+        """Add the populate command with MeSH-specific options."""
+        return add_cli_populate(main)
+
+    @classmethod
+    def get_cli(cls) -> click.Group:
+        """Get the :mod:`click` main function to use as a command line interface."""
+        main = super().get_cli()
+        add_cli_update(main)
+        return main
 
     @staticmethod
     def _get_identifier(descriptor: Descriptor) -> str:
@@ -241,90 +641,396 @@ class Manager(AbstractManager, BELNamespaceManagerMixin, BELManagerMixin, FlaskM
             encoding=descriptor.bel_encoding,
         )
 
+    def _make_namespace(self) -> Namespace:
+        """Make the namespace, copying the descriptors into it with one ``INSERT ... SELECT``."""
+        namespace = Namespace(
+            name=self._get_namespace_name(),
+            keyword=self._get_namespace_keyword(),
+            url=self._get_namespace_url(),
+            version=str(time.asctime()),
+        )
+        self.session.add(namespace)
+        self.session.flush()
+
+        insert_namespace_entries(self.session, namespace)
+        self.session.commit()
+        return namespace
+
+    def _update_namespace(self, namespace: Namespace) -> None:
+        """Rename, delete, and insert the entries of the namespace so they match the descriptors.
+
+        Called by :meth:`update` when the namespace has been uploaded.
+        """
+        refresh_namespace_entries(self.session, namespace)
+        self.session.commit()
+        self.session.expire(namespace)
+
+    def drop_bel_namespace(self) -> Optional[Namespace]:
+        """Remove the default namespace and its entries, if it exists."""
+        namespace = self._get_default_namespace()
+
+        if namespace is not None:
+            delete_namespace_entries(self.session, namespace)
+            self.session.expunge(namespace)
+            self.session.commit()
+            return namespace
+
+    def write_bel_namespace(self, file: TextIO, use_names: bool = False) -> None:
+        """Write a BEL namespace file, streaming the descriptors from the database."""
+        if not self.is_populated():
+            self.populate()
+
+        write_namespace_values(
+            self.session,
+            file,
+            namespace_name=self._get_namespace_name(),
+            namespace_keyword=self._get_namespace_keyword(),
+            namespace_query_url=self.identifiers_url,
+            use_names=use_names,
+        )
+
+    def write_bel_annotation(self, file: TextIO) -> None:
+        """Write a BEL annotation file from descriptor names to their UIs, streaming them from the database."""
+        if not self.is_populated():
+            self.populate()
+
+        write_annotation_values(
+            self.session,
+            file,
+            keyword=self.identifiers_recommended,
+            description='Medical Subject Headings descriptors',
+        )
+
+    def get_descriptors_by_term_names(self, names: Iterable[str]) -> Dict[str, Descriptor]:
+        """Get a dictionary from the given term names to the descriptors of their concepts, for the ones that exist.
+
+        Terms and their descriptors are joined in the database so no relationships have to be loaded.
+        """
+        rv = {}
+        for chunk in iter_batches(list(set(names)), IN_CHUNK_SIZE):
+            query = (
+                self.session.query(Term.name, Descriptor)
+                .join(Concept, Term.concept_id == Concept.id)
+                .join(Descriptor, Concept.descriptor_id == Descriptor.id)
+                .filter(Term.name.in_(chunk))
+                .order_by(Term.id)
+            )
+            for name, descriptor in query:
+                rv.setdefault(name, descriptor)
+        return rv
+
     def look_up_node(self, node: BaseEntity) -> Optional[Descriptor]:
-        """Look up a descriptor based on a PyBEL node."""
-        namespace = node.get(NAMESPACE)
-        if namespace is None or not namespace.lower().startswith('mesh'):
-            return
+        """Look up a descriptor based on a PyBEL node.
+
+        The UI and name it maps to are kept in :attr:`lookup_cache`, see :meth:`look_up_node_names`.
+        """
+        return self.look_up_nodes([node]).get(node)
+
+    def look_up_nodes(self, nodes: Iterable[BaseEntity]) -> Dict[BaseEntity, Descriptor]:
+        """Look up descriptors for many PyBEL nodes at once and return a dictionary for the ones that map.
 
-        name, identifier = node.get(NAME), node.get(IDENTIFIER)
+        The nodes are mapped to UIs with :meth:`look_up_node_names`, then the descriptors are loaded in one batch
+        query. Use :meth:`look_up_node_names` directly when the UIs and names are enough.
+        """
+        node_ui_name = self.look_up_node_names(nodes)
+        ui_descriptor = self.get_descriptors_by_uis(descriptor_ui for descriptor_ui, _ in node_ui_name.values())
+        return {
+            node: ui_descriptor[descriptor_ui]
+            for node, (descriptor_ui, _) in node_ui_name.items()
+            if descriptor_ui in ui_descriptor
+        }
 
-        if identifier:
-            return self.get_descriptor_by_ui(identifier)
+    def look_up_node_names(self, nodes: Iterable[BaseEntity]) -> Dict[BaseEntity, Tuple[str, str]]:
+        """Look up the UIs and names of the descriptors for many PyBEL nodes and return a dictionary for the ones that map.
 
-        term = self.get_term_by_name(name)
-        if term:
-            return term.concept.descriptor
+        Results, including misses, are kept in :attr:`lookup_cache` as plain values rather than models, so they
+        stay valid across commits and repeated nodes never query the database. Unmappable nodes are only warned
+        about once. Nodes that aren't cached are resolved with a batch query for their identifiers and another
+        for their names, regardless of how many there are.
+        """
+        node_key = {}
+        for node in nodes:
+            namespace = node.get(NAMESPACE)
+            if namespace is not None and namespace.lower().startswith('mesh'):
+                node_key[node] = namespace, node.get(NAME), node.get(IDENTIFIER)
+
+        key_ui_name, uncached = {}, {}
+        for node, key in node_key.items():
+            if key in key_ui_name or key in uncached:
+                continue
+            ui_name = self.lookup_cache.get(key)
+            if ui_name is MISSING:
+                uncached[key] = node
+            else:
+                key_ui_name[key] = ui_name
+
+        if uncached:
+            ui_descriptor = self.get_descriptors_by_uis(
+                identifier
+                for _, _, identifier in uncached
+                if identifier
+            )
+            name_descriptor = self.get_descriptors_by_term_names(
+                name
+                for _, name, identifier in uncached
+                if not identifier and name
+            )
 
-        log.warning('Could not map MeSH node: %r', node)
+            for key, node in uncached.items():
+                _, name, identifier = key
+                descriptor = ui_descriptor.get(identifier) if identifier else name_descriptor.get(name)
+                if descriptor is None:
+                    log.warning('Could not map MeSH node: %r', node)
+                    ui_name = None
+                else:
+                    ui_name = descriptor.descriptor_ui, descriptor.name
+                self.lookup_cache.set(key, ui_name)
+                key_ui_name[key] = ui_name
+
+        return {
+            node: key_ui_name[key]
+            for node, key in node_key.items()
+            if key_ui_name[key] is not None
+        }
+
+    def get_fuzzy_index(self) -> TrigramIndex:
+        """Get the trigram index over all term names, building it the first time."""
+        if self._fuzzy_index is None:
+            self._fuzzy_index = TrigramIndex(self._query_term_names_descriptor_uis())
+        return self._fuzzy_index
+
+    def get_tagger(self) -> Tagger:
+        """Get the tagger over all term names, compiling it the first time."""
+        if self._tagger is None:
+            self._tagger = Tagger(self._query_term_names_descriptor_uis())
+        return self._tagger
+
+    def tag_documents(self, texts: Iterable[str], workers: Optional[int] = None,
+                      batch_size: int = 500) -> Iterable[List[Mention]]:
+        """Tag the longest non-overlapping mentions of MeSH terms in a stream of documents across processes.
+
+        :param texts: The documents to tag
+        :param workers: The number of worker processes. Defaults to the number of CPUs.
+        :param batch_size: The number of documents sent to a worker at once
+        :return: The mentions in each document, in the original order
+        """
+        return tag_documents(texts, self.get_tagger(), workers=workers, batch_size=batch_size)
+
+    def _query_term_names_descriptor_uis(self):
+        """Query the names of all terms and the UIs of their descriptors, in the order they were loaded."""
+        return (
+            self.session.query(Term.name, Descriptor.descriptor_ui)
+            .join(Concept, Term.concept_id == Concept.id)
+            .join(Descriptor, Concept.descriptor_id == Descriptor.id)
+            .order_by(Term.id)
+        )
+
+    def fuzzy_match(self, name: str, k: int = 5, threshold: float = 0.3) -> List[Tuple[Descriptor, float]]:
+        """Find the descriptors whose terms' names are most similar to the given name.
+
+        :param name: A name, possibly misspelled or written differently
+        :param k: The maximum number of descriptors to return
+        :param threshold: The minimum similarity between the character trigrams of the names, greater than zero
+        :return: Pairs of descriptors and their similarities, most similar first
+        """
+        return self.fuzzy_match_names([name], k=k, threshold=threshold)[name]
+
+    def fuzzy_match_names(self, names: Iterable[str], k: int = 5,
+                          threshold: float = 0.3) -> Dict[str, List[Tuple[Descriptor, float]]]:
+        """Find the most similar descriptors for each of the given names, loading all descriptors at once."""
+        index = self.get_fuzzy_index()
+        name_matches = {
+            name: index.search(name, k=k, threshold=threshold)
+            for name in set(names)
+        }
+        ui_descriptor = self.get_descriptors_by_uis(
+            descriptor_ui
+            for matches in name_matches.values()
+            for descriptor_ui, _ in matches
+        )
+        return {
+            name: [(ui_descriptor[descriptor_ui], score) for descriptor_ui, score in matches]
+            for name, matches in name_matches.items()
+        }
+
+    def fuzzy_match_nodes(self, nodes: Iterable[BaseEntity], k: int = 5,
+                          threshold: float = 0.3) -> Dict[BaseEntity, List[Tuple[Descriptor, float]]]:
+        """Find candidate descriptors for the MeSH nodes that :meth:`look_up_nodes` can't map.
+
+        :param nodes: PyBEL nodes, like a BEL graph
+        :param k: The maximum number of descriptors to return for each node
+        :param threshold: The minimum similarity between the character trigrams of the names, greater than zero
+        :return: A dictionary from unmapped nodes with names to pairs of descriptors and their similarities
+        """
+        nodes = [
+            node
+            for node in nodes
+            if node.get(NAMESPACE, '').lower().startswith('mesh') and node.get(NAME)
+        ]
+        mapped = self.look_up_node_names(nodes)
+        unmapped = [node for node in nodes if node not in mapped]
+
+        name_matches = self.fuzzy_match_names((node[NAME] for node in unmapped), k=k, threshold=threshold)
+        return {
+            node: name_matches[node[NAME]]
+            for node in unmapped
+        }
 
     def iter_nodes(self, graph: BELGraph, use_tqdm: bool = False) -> Iterable[Tuple[BaseEntity, Descriptor]]:
         """Iterate over nodes in a BEL graph that can be normalized to MeSH Descriptors."""
+        node_descriptor = self.look_up_nodes(graph)
         it = (
-            tqdm(graph, desc='MeSH terms')
+            tqdm(node_descriptor.items(), desc='MeSH terms')
             if use_tqdm else
-            graph
+            node_descriptor.items()
         )
-        for node in it:
-            descriptor = self.look_up_node(node)
-            if descriptor is not None:
-                yield node, descriptor
+        yield from it
 
     def normalize_terms(self, graph: BELGraph, use_tqdm: bool = False) -> Counter:
         """Add identifiers to all MeSH terms and return a counter of the namespaces fixed."""
         self.add_namespace_to_graph(graph)
 
-        mapping = {}
-        fixed_namespaces = []
+        node_ui_name = self.look_up_node_names(graph).items()
+        if use_tqdm:
+            node_ui_name = tqdm(node_ui_name, desc='MeSH terms')
 
-        for node, descriptor in self.iter_nodes(graph, use_tqdm=use_tqdm):
-            if any(x in node for x in (VARIANTS, MEMBERS, REACTANTS, FUSION)):
-                log.debug('skipping: %s', node)
-                continue
+        return relabel_mesh_nodes(graph, (
+            (node, descriptor_ui, name)
+            for node, (descriptor_ui, name) in node_ui_name
+        ))
 
-            fixed_namespaces.append(node[NAMESPACE])
-            dsl = FUNC_TO_DSL[node[FUNCTION]]
-            mapping[node] = dsl(
-                namespace='mesh',
-                name=descriptor.name,
-                identifier=descriptor.descriptor_ui,
-            )
+    def get_lookup_snapshot(self) -> LookupSnapshot:
+        """Get a read-only copy of the descriptor names and UIs for normalizing graphs without the database.
 
-        relabel_nodes(graph, mapping, copy=False)
+        This also makes sure the MeSH namespace is uploaded, so it only has to happen once for all graphs.
+        """
+        namespace = self.upload_bel_namespace()
 
-        return Counter(fixed_namespaces)
+        ui_name = dict(self.session.query(Descriptor.descriptor_ui, Descriptor.name))
 
-    def to_bel(self) -> BELGraph:
-        """Dump the MeSH tree in BEL."""
-        graph = BELGraph(
-            name='MeSH Hierarchy',
-            version='0.0.0',
-        )
+        term_name_ui = {}
+        for name, descriptor_ui in self._query_term_names_descriptor_uis():
+            term_name_ui.setdefault(name, descriptor_ui)
 
-        tree_parent = {}
-        tree_bel = {}
-        query = self.session.query(Descriptor, Tree).join(Tree)
-        total = query.count()
-        it = groupby(
-            tqdm(
-                query,
-                total=total,
-                desc='Mapping MeSH hierarchy',
-            ),
-            key=itemgetter(0),
+        return LookupSnapshot(
+            ui_name=ui_name,
+            term_name_ui=term_name_ui,
+            namespace_keyword=namespace.keyword,
+            namespace_url=namespace.url,
+            module_name=self.module_name,
         )
-        for descriptor, trees in it:
-            sub = descriptor.to_bel()
-            if sub is None:
-                continue
-            for _, tree in trees:
-                tree_parent[tree.name] = tree.name.rsplit('.', 1)[0]
-                tree_bel[tree.name] = sub
 
-        for child, parent in tqdm(tree_parent.items(), desc='Converting to BEL'):
-            child_bel = tree_bel.get(child)
-            parent_bel = tree_bel.get(parent)
-            if child_bel is not None and parent_bel is not None:
-                graph.add_is_a(child_bel, parent_bel)
+    def normalize_graphs(self, graphs: Iterable[BELGraph],
+                         workers: Optional[int] = None) -> List[Tuple[BELGraph, Counter]]:
+        """Normalize the MeSH nodes in many graphs across a process pool.
+
+        :param graphs: BEL graphs
+        :param workers: The number of processes to use. Defaults to the number of CPUs.
+        :return: Pairs of normalized graphs and counters of the namespaces fixed in each, in order
+        """
+        return normalize_graphs(graphs, snapshot=self.get_lookup_snapshot(), workers=workers)
+
+    def normalize_graph_paths(self, paths: Iterable[str], directory: str,
+                              workers: Optional[int] = None) -> Mapping[str, Counter]:
+        """Normalize the MeSH nodes in many graph files across a process pool.
+
+        :param paths: Paths to BEL graphs as pickles or Node-Link JSON
+        :param directory: The directory to write the normalized graphs to, using the same file names
+        :param workers: The number of processes to use. Defaults to the number of CPUs.
+        :return: A dictionary from the given paths to counters of the namespaces fixed in each
+        """
+        return normalize_graph_paths(paths, directory, snapshot=self.get_lookup_snapshot(), workers=workers)
+
+    def to_bel(self, use_cache: bool = True, cache_path: Optional[str] = None) -> BELGraph:
+        """Dump the MeSH tree in BEL.
+
+        :param use_cache: Should the graph be reused from a pickle file until the database is populated or updated?
+        :param cache_path: The path of the pickle file. Defaults to one in the data directory for this connection.
+        """
+        if not use_cache:
+            cache_path = None
+        elif cache_path is None:
+            cache_path = get_bel_cache_path(self.connection)
+        return get_hierarchy_graph(self.session, cache_path=cache_path)
+
+    def iter_hierarchy_edges(self, tree_numbers: Sequence[str],
+                             categories: Optional[Sequence[str]] = None) -> Iterable[Tuple[BaseEntity, BaseEntity]]:
+        """Iterate over the is-a relations between descriptors in the subtrees under the given tree numbers.
+
+        :param tree_numbers: Tree numbers like ``C10.228`` or category letters like ``C``
+        :param categories: The categories of descriptors to keep, from ``pathology``, ``process``, and ``chemical``.
+         Defaults to all of them.
+        :return: Pairs of child and parent BEL nodes, in hierarchical order
+        """
+        return iter_hierarchy_edges(self.session, tree_numbers, categories=categories)
+
+    def export_hierarchy(self, file: TextIO, tree_numbers: Sequence[str], categories: Optional[Sequence[str]] = None,
+                         fmt: str = 'bel') -> int:
+        """Write the is-a relations in the subtrees under the given tree numbers without building a graph.
+
+        :param file: A writable file-like object
+        :param tree_numbers: Tree numbers like ``C10.228`` or category letters like ``C``
+        :param categories: The categories of descriptors to keep. Defaults to all that convert to BEL.
+        :param fmt: Either ``bel`` for a BEL script or ``jsonl`` for JSON lines
+        :return: The number of relations written
+        """
+        if fmt not in HIERARCHY_WRITERS:
+            raise ValueError(f'invalid format: {fmt}. Use one of {sorted(HIERARCHY_WRITERS)}')
+        t = time.time()
+        count = HIERARCHY_WRITERS[fmt](self.iter_hierarchy_edges(tree_numbers, categories=categories), file)
+        log.info('exported %d relations under %s in %.2f seconds', count, ', '.join(tree_numbers), time.time() - t)
+        return count
+
+
+def add_cli_populate(main: click.Group) -> click.Group:  # noqa: D202
+    """Add a ``populate`` command to main :mod:`click` function."""
+
+    @main.command()
+    @click.option('--reset', is_flag=True, help='Nuke database first')
+    @click.option('--force', is_flag=True, help='Force overwrite if already populated')
+    @click.option('--stream', is_flag=True, help='Parse the XML incrementally to bound memory usage')
+    @click.option('-w', '--workers', type=int, help='Number of processes for converting XML records')
+    @click.option('-b', '--batch-size', type=int, help='Number of records to insert per transaction')
+    @click.option('--fast', is_flag=True, help='Relax durability and defer indexes while loading into SQLite')
+    @click.option('--pipeline', is_flag=True, help='Parse records in the background while inserting')
+    @click.pass_obj
+    def populate(manager, reset, force, stream, workers, batch_size, fast, pipeline):
+        """Populate the database."""
+        if reset:
+            click.echo('Deleting the previous instance of the database')
+            manager.drop_all()
+            click.echo('Creating new models')
+            manager.create_all()
+
+        if manager.is_populated() and not force:
+            click.echo('Database already populated. Use --force to overwrite')
+            sys.exit(0)
+
+        manager.populate(stream=stream, workers=workers, batch_size=batch_size, fast=fast, pipeline=pipeline)
+
+    return main
+
+
+def add_cli_update(main: click.Group) -> click.Group:  # noqa: D202
+    """Add an ``update`` command to main :mod:`click` function."""
+
+    @main.command()
+    @click.option('--year', help='Year of the MeSH release to download')
+    @click.option('--descriptors-path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--supplement-path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('-w', '--workers', type=int, help='Number of processes for converting XML records')
+    @click.option('-b', '--batch-size', type=int, help='Number of records to insert per transaction')
+    @click.pass_obj
+    def update(manager, year, descriptors_path, supplement_path, workers, batch_size):
+        """Update the database to another MeSH release."""
+        counts = manager.update(
+            descriptors_path=descriptors_path,
+            supplement_path=supplement_path,
+            year=year,
+            workers=workers,
+            batch_size=batch_size,
+        )
+        for key, count in counts.items():
+            click.echo(f'{key.capitalize()}: {count}')
 
-        return graph
+    return main
@@ -2,16 +2,17 @@
 
 """SQLAlchemy database models for Bio2BEL MeSH."""
 
-import itertools as itt
-from typing import Mapping, Optional
+from typing import List, Mapping, Optional
 
-from sqlalchemy import Column, ForeignKey, Integer, String, Boolean
+from sqlalchemy import Column, ForeignKey, Integer, String, and_
 from sqlalchemy.ext.declarative import DeclarativeMeta, declarative_base
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import backref, relationship
 
 import pybel.dsl
-from pybel.constants import belns_encodings
+from .categories import CATEGORY_BITS, get_categories
 from .constants import MODULE_NAME
+from .utils import get_tree_key_range
 
 Base: DeclarativeMeta = declarative_base()
 
@@ -19,6 +20,21 @@ DESCRIPTOR_TABLE_NAME = f'{MODULE_NAME}_descriptor'
 CONCEPT_TABLE_NAME = f'{MODULE_NAME}_concept'
 TERM_TABLE_NAME = f'{MODULE_NAME}_term'
 TREE_TABLE_NAME = f'{MODULE_NAME}_tree'
+CLOSURE_TABLE_NAME = f'{MODULE_NAME}_closure'
+INFO_TABLE_NAME = f'{MODULE_NAME}_info'
+
+
+def _category_property(category: str) -> hybrid_property:
+    """Make a property for whether a descriptor is in a category that also works in queries."""
+    bit = CATEGORY_BITS[category]
+
+    def fget(self) -> bool:
+        return bool(self.category_mask & bit)
+
+    def expr(cls):
+        return cls.category_mask.op('&')(bit) != 0
+
+    return hybrid_property(fget, expr=expr)
 
 
 class Descriptor(Base):
@@ -32,79 +48,72 @@ class Descriptor(Base):
                            doc='MeSH descriptor identifier. Starts with D.')
 
     name = Column(String(255), nullable=False, unique=True, index=True, doc='MeSH descriptor label')
+    normalized_name = Column(String(255), index=True,
+                             doc='MeSH descriptor label without case, punctuation, or possessives for lookup')
+
+    category_mask = Column(Integer, nullable=False, default=0, index=True,
+                           doc='Bits for the categories of this descriptor, from bio2bel_mesh.categories.CATEGORIES')
+    bel_encoding = Column(String(8), doc='The BEL encoding of this descriptor, from its categories')
 
-    is_anatomy = Column(Boolean, default=False)
-    is_organism = Column(Boolean, default=False)
-    is_pathology = Column(Boolean, default=False)
-    is_chemical = Column(Boolean, default=False)
-    is_protein = Column(Boolean, default=False)
-    is_complex = Column(Boolean, default=False)
-    is_measurement = Column(Boolean, default=False)
-    is_process = Column(Boolean, default=False)
+    fingerprint = Column(String(40), doc='Hash of the record this descriptor was loaded from, for updating')
+
+    is_anatomy = _category_property('anatomy')
+    is_organism = _category_property('organism')
+    is_pathology = _category_property('pathology')
+    is_chemical = _category_property('chemical')
+    is_protein = _category_property('protein')
+    is_complex = _category_property('complex')
+    is_measurement = _category_property('measurement')
+    is_process = _category_property('process')
 
     def __str__(self):
         return self.name
 
-    @property
-    def bel_encoding(self) -> str:
-        """Get the BEL encoding for this descriptor."""
-        rv = set()
-
-        if self.is_anatomy or self.is_chemical or self.is_organism:
-            rv.add('A')
-        if self.is_pathology or self.is_measurement:
-            rv.add('O')
-        if self.is_process:
-            rv.add('B')
-        if self.is_protein:
-            rv.update('GRP')
-        if self.is_complex:
-            rv.add('C')
-
-        if not rv:
-            rv = set(belns_encodings)
-
-        return ''.join(sorted(rv))
-
-    def _not_has_tree_prefixes(self, prefixes) -> bool:
-        return all(
-            prefix not in tree.name
-            for prefix, tree in itt.product(prefixes, self.trees)
-        )
+    def to_json(self) -> Mapping:
+        """Return this descriptor as a JSON object."""
+        return {
+            'descriptor_ui': self.descriptor_ui,
+            'name': self.name,
+            'tree_numbers': [tree.name for tree in self.trees],
+            'bel_encoding': self.bel_encoding,
+        }
 
-    def _has_tree_prefixes(self, prefixes) -> bool:
-        """Check if any of the tree entries have any of the given prefixes."""
-        return any(
-            prefix in tree.name
-            for prefix, tree in itt.product(prefixes, self.trees)
-        )
+    def has_category(self, category: str) -> bool:
+        """Check if this descriptor is in the given category, like ``pathology``."""
+        return bool(self.category_mask & CATEGORY_BITS[category])
 
-    def _has_tree_prefix(self, prefix: str) -> bool:
-        """Check if any of the tree entries for this descriptor have the given prefix."""
-        return any(
-            prefix in tree.name
-            for tree in self.trees
-        )
+    @property
+    def categories(self) -> List[str]:
+        """Get the categories of this descriptor."""
+        return get_categories(self.category_mask)
 
     def to_bel(self) -> Optional[pybel.dsl.BaseEntity]:
         """Convert this MeSH term to a PyBEL DSL entry."""
-        if self.is_pathology:
-            dsl = pybel.dsl.Pathology
-        elif self.is_process:
-            dsl = pybel.dsl.BiologicalProcess
-        elif self.is_chemical:
-            dsl = pybel.dsl.Abundance
-        else:
-            def dsl(**kwargs) -> None:
-                """Return none."""
-
-        return dsl(
-            namespace='mesh',
+        return get_descriptor_bel(
+            descriptor_ui=self.descriptor_ui,
             name=self.name,
-            identifier=self.descriptor_ui,
+            category_mask=self.category_mask,
         )
 
 
+def get_descriptor_bel(descriptor_ui: str, name: str, category_mask: int) -> Optional[pybel.dsl.BaseEntity]:
+    """Convert the columns of a MeSH descriptor to a PyBEL DSL entry, if it's a pathology, process, or chemical."""
+    if category_mask & CATEGORY_BITS['pathology']:
+        dsl = pybel.dsl.Pathology
+    elif category_mask & CATEGORY_BITS['process']:
+        dsl = pybel.dsl.BiologicalProcess
+    elif category_mask & CATEGORY_BITS['chemical']:
+        dsl = pybel.dsl.Abundance
+    else:
+        return
+
+    return dsl(
+        namespace='mesh',
+        name=name,
+        identifier=descriptor_ui,
+    )
+
+
 class Concept(Base):
     """MeSH Concept."""
 
@@ -133,6 +142,8 @@ class Term(Base):
     term_ui = Column(String(255), nullable=False, index=True,
                      doc='MeSH concept identifier. Starts with T. Might be duplicate for permutations')
     name = Column(String(255), nullable=False, index=True, doc='MeSH term label')
+    normalized_name = Column(String(255), index=True,
+                             doc='MeSH term label without case, punctuation, or possessives for lookup')
 
     concept_id = Column(Integer, ForeignKey(f'{CONCEPT_TABLE_NAME}.id'), nullable=False)
     concept = relationship(Concept)
@@ -165,9 +176,45 @@ class Tree(Base):
     id = Column(Integer, primary_key=True)
 
     name = Column(String(255), nullable=False, unique=True, index=True, doc='MeSH tree number')
+    tree_key = Column(String(255), index=True,
+                      doc='Tree number with fixed-width segments so a subtree is a range. See get_tree_key')
+    depth = Column(Integer, doc='Level in the hierarchy, where top-level tree numbers like C10 are 1')
 
     descriptor_id = Column(Integer, ForeignKey(f'{DESCRIPTOR_TABLE_NAME}.id'), nullable=False)
     descriptor = relationship(Descriptor, backref=backref('trees'))
 
     def __str__(self):
         return self.name
+
+    @classmethod
+    def in_subtree(cls, tree_number: str):
+        """Filter to the tree numbers in the subtree of a tree number or category letter with a range over keys."""
+        lower, upper = get_tree_key_range(tree_number)
+        if upper is None:
+            return lower <= cls.tree_key
+        return and_(lower <= cls.tree_key, cls.tree_key < upper)
+
+
+class DescriptorClosure(Base):
+    """A pair of a MeSH descriptor and one of its descendants, or itself."""
+
+    __tablename__ = CLOSURE_TABLE_NAME
+
+    ancestor_id = Column(Integer, ForeignKey(f'{DESCRIPTOR_TABLE_NAME}.id'), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey(f'{DESCRIPTOR_TABLE_NAME}.id'), primary_key=True, index=True)
+    depth = Column(Integer, nullable=False, doc='Fewest levels between the descriptors. Zero for the descriptor itself')
+
+    ancestor = relationship(Descriptor, foreign_keys=[ancestor_id])
+    descendant = relationship(Descriptor, foreign_keys=[descendant_id])
+
+    def __str__(self):
+        return f'{self.ancestor} > {self.descendant}'
+
+
+class DatabaseInfo(Base):
+    """A property of the database as a whole, like the fingerprint of its contents."""
+
+    __tablename__ = INFO_TABLE_NAME
+
+    key = Column(String(255), primary_key=True)
+    value = Column(String(255), nullable=False)
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+"""Bulk export of MeSH descriptors to BEL namespaces and annotations.
+
+The BEL encoding of each descriptor is stored in :data:`bio2bel_mesh.models.Descriptor.bel_encoding` when it's
+loaded. This lets namespace entries be copied into PyBEL's table with a single ``INSERT ... SELECT`` and lets
+``.belns`` and ``.belanno`` files be written line by line from a query that is already sorted, so neither builds a
+Python object per descriptor.
+"""
+
+import logging
+import time
+from typing import Iterable, Mapping, Optional, TextIO, Tuple
+
+from bel_resources.write_annotation import iter_annotation_nominal
+from bel_resources.write_namespace import iter_namespace_nominal
+from bel_resources.write_utils import iter_author_header, iter_citation_header, iter_properties_header
+from sqlalchemy import Table, and_, exists, literal, or_, select
+from sqlalchemy.orm import Session
+
+from pybel.manager.models import Namespace, NamespaceEntry
+from .models import Descriptor
+
+__all__ = [
+    'delete_namespace_entries',
+    'insert_namespace_entries',
+    'refresh_namespace_entries',
+    'write_annotation_values',
+    'write_namespace_values',
+]
+
+log = logging.getLogger(__name__)
+
+
+def insert_namespace_entries(session: Session, namespace: Namespace) -> int:
+    """Copy the descriptors that aren't in the namespace yet into it in one statement, without committing.
+
+    :param session: A SQLAlchemy session on the same database as PyBEL's tables
+    :param namespace: A namespace that has been flushed, so it has an identifier
+    :return: The number of entries inserted
+    """
+    t = time.time()
+    query = (
+        select([
+            Descriptor.name,
+            Descriptor.descriptor_ui,
+            Descriptor.bel_encoding,
+            literal(namespace.id),
+        ])
+        .where(~exists().where(and_(
+            NamespaceEntry.namespace_id == namespace.id,
+            NamespaceEntry.identifier == Descriptor.descriptor_ui,
+        )))
+    )
+    result = session.execute(NamespaceEntry.__table__.insert().from_select(
+        ['name', 'identifier', 'encoding', 'namespace_id'],
+        query,
+    ))
+    log.info('inserted %d namespace entries in %.2f seconds', result.rowcount, time.time() - t)
+    return result.rowcount
+
+
+def _delete_references(session: Session, table: Table, ids) -> None:
+    """Remove the references to some rows of a table from PyBEL's other tables, without committing.
+
+    Rows of association tables, whose references can't be null, are deleted. Other references, like from nodes,
+    are set to null so the rows holding them are kept.
+
+    :param session: A SQLAlchemy session
+    :param table: The table whose rows are going to be deleted
+    :param ids: A query for the identifiers of the rows that are going to be deleted
+    """
+    for referring_table in table.metadata.sorted_tables:
+        for foreign_key in referring_table.foreign_keys:
+            if foreign_key.column.table is not table:
+                continue
+            column = foreign_key.parent
+            if column.nullable:
+                session.execute(referring_table.update().where(column.in_(ids)).values({column.name: None}))
+            else:
+                session.execute(referring_table.delete().where(column.in_(ids)))
+
+
+def refresh_namespace_entries(session: Session, namespace: Namespace) -> Mapping[str, int]:
+    """Bring the entries of a namespace in line with the descriptors after an update, without committing.
+
+    Entries whose descriptors were renamed or encoded differently are changed in place so the references to them
+    are kept. Entries whose descriptors were deleted are deleted along with the references to them, and entries
+    for new descriptors are inserted with :func:`insert_namespace_entries`.
+
+    :param session: A SQLAlchemy session on the same database as PyBEL's tables
+    :param namespace: A namespace that has been flushed, so it has an identifier
+    :return: The number of entries updated, deleted, and inserted
+    """
+    t = time.time()
+    in_namespace = NamespaceEntry.namespace_id == namespace.id
+    matches_entry = Descriptor.descriptor_ui == NamespaceEntry.identifier
+
+    updated = session.execute(
+        NamespaceEntry.__table__.update()
+        .where(and_(in_namespace, exists().where(and_(matches_entry, or_(
+            Descriptor.name != NamespaceEntry.name,
+            Descriptor.bel_encoding.is_distinct_from(NamespaceEntry.encoding),
+        )))))
+        .values(
+            name=select([Descriptor.name]).where(matches_entry).as_scalar(),
+            encoding=select([Descriptor.bel_encoding]).where(matches_entry).as_scalar(),
+        )
+    ).rowcount
+
+    is_stale = and_(in_namespace, ~exists().where(matches_entry))
+    _delete_references(session, NamespaceEntry.__table__, select([NamespaceEntry.id]).where(is_stale))
+    deleted = session.execute(NamespaceEntry.__table__.delete().where(is_stale)).rowcount
+
+    rv = dict(
+        updated=updated,
+        deleted=deleted,
+        inserted=insert_namespace_entries(session, namespace),
+    )
+    log.info('refreshed namespace entries in %.2f seconds: %s', time.time() - t,
+             ', '.join(f'{count} {key}' for key, count in rv.items()))
+    return rv
+
+
+def delete_namespace_entries(session: Session, namespace: Namespace) -> None:
+    """Delete a namespace, its entries, and the references to them from PyBEL's other tables, without committing.
+
+    PyBEL's models don't cascade deletions to the rows that refer to entries, like the annotations of edges, so
+    they're cleaned up with a statement per reference before the entries are deleted.
+    """
+    entry_ids = select([NamespaceEntry.id]).where(NamespaceEntry.namespace_id == namespace.id)
+    _delete_references(session, NamespaceEntry.__table__, entry_ids)
+    session.execute(NamespaceEntry.__table__.delete().where(NamespaceEntry.namespace_id == namespace.id))
+    session.execute(Namespace.__table__.delete().where(Namespace.id == namespace.id))
+
+
+def _iter_values(session: Session, key_column, label_column) -> Iterable[Tuple[str, str]]:
+    return session.query(key_column, label_column).order_by(key_column).yield_per(10_000)
+
+
+def _write_values(values: Iterable[Tuple[str, str]], file: TextIO, delimiter: str = '|') -> int:
+    print('[Values]', file=file)
+    count = 0
+    for key, label in values:
+        print(f'{key}{delimiter}{label}', file=file)
+        count += 1
+    print('', file=file)
+    return count
+
+
+def write_namespace_values(session: Session, file: TextIO, namespace_name: str, namespace_keyword: str,
+                           namespace_query_url: Optional[str] = None, use_names: bool = False) -> int:
+    """Write a BEL namespace file, streaming the values from the database in sorted order.
+
+    :param session: A SQLAlchemy session
+    :param file: A writable file-like object
+    :param namespace_name: The name of the namespace
+    :param namespace_keyword: The keyword of the namespace
+    :param namespace_query_url: The URL for looking up values
+    :param use_names: Should descriptor names be written instead of UIs?
+    :return: The number of values written
+    """
+    t = time.time()
+    lines = (
+        iter_namespace_nominal(namespace_name, namespace_keyword, query_url=namespace_query_url),
+        iter_author_header(),
+        iter_citation_header(None),
+        iter_properties_header(),
+    )
+    for section in lines:
+        for line in section:
+            print(line, file=file)
+
+    key_column = Descriptor.name if use_names else Descriptor.descriptor_ui
+    count = _write_values(_iter_values(session, key_column, Descriptor.bel_encoding), file)
+    log.info('wrote %d namespace values in %.2f seconds', count, time.time() - t)
+    return count
+
+
+def write_annotation_values(session: Session, file: TextIO, keyword: str, description: Optional[str] = None) -> int:
+    """Write a BEL annotation file from descriptor names to their UIs, streaming them from the database.
+
+    :param session: A SQLAlchemy session
+    :param file: A writable file-like object
+    :param keyword: The keyword of the annotation
+    :param description: A description of the annotation
+    :return: The number of values written
+    """
+    t = time.time()
+    lines = (
+        iter_annotation_nominal(keyword, description=description),
+        iter_author_header(),
+        iter_citation_header(keyword),
+        iter_properties_header(),
+    )
+    for section in lines:
+        for line in section:
+            print(line, file=file)
+
+    count = _write_values(_iter_values(session, Descriptor.name, Descriptor.descriptor_ui), file)
+    log.info('wrote %d annotation values in %.2f seconds', count, time.time() - t)
+    return count
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+"""Normalization of the MeSH nodes in many BEL graphs in parallel.
+
+Each worker process gets a read-only snapshot of the names and UIs in the database once, when it starts, so it
+can normalize any number of graphs without opening a session or querying the database.
+"""
+
+import logging
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+from networkx import relabel_nodes
+
+from pybel import BELGraph, from_json_path, from_pickle, to_json_path, to_pickle
+from pybel.constants import FUNCTION, FUSION, IDENTIFIER, MEMBERS, NAME, NAMESPACE, REACTANTS, VARIANTS
+from pybel.dsl import BaseEntity, FUNC_TO_DSL
+
+__all__ = [
+    'LookupSnapshot',
+    'relabel_mesh_nodes',
+    'normalize_graph',
+    'normalize_graphs',
+    'normalize_graph_paths',
+]
+
+log = logging.getLogger(__name__)
+
+
+class LookupSnapshot(NamedTuple):
+    """A read-only copy of what's needed from the database to normalize MeSH nodes."""
+
+    #: A dictionary from descriptor UIs to names
+    ui_name: Mapping[str, str]
+    #: A dictionary from term names to the UIs of their descriptors
+    term_name_ui: Mapping[str, str]
+    #: The keyword of the MeSH namespace, as added by :meth:`bio2bel_mesh.Manager.add_namespace_to_graph`
+    namespace_keyword: str
+    #: The URL of the MeSH namespace
+    namespace_url: str
+    #: The name of this Bio2BEL module, added to the graph's ``bio2bel`` annotation
+    module_name: str
+
+    def look_up_node(self, node: BaseEntity) -> Optional[Tuple[str, str]]:
+        """Look up the UI and name of the descriptor for a PyBEL node."""
+        namespace = node.get(NAMESPACE)
+        if namespace is None or not namespace.lower().startswith('mesh'):
+            return
+
+        identifier = node.get(IDENTIFIER)
+        if not identifier:
+            identifier = self.term_name_ui.get(node.get(NAME))
+
+        name = self.ui_name.get(identifier)
+        if name is None:
+            log.debug('Could not map MeSH node: %r', node)
+            return
+
+        return identifier, name
+
+    def add_namespace_to_graph(self, graph: BELGraph) -> None:
+        """Add the MeSH namespace and the Bio2BEL annotation to the graph without using the database."""
+        graph.namespace_url[self.namespace_keyword] = self.namespace_url
+        graph.annotation_list.setdefault('bio2bel', set()).add(self.module_name)
+
+
+def relabel_mesh_nodes(graph: BELGraph, nodes: Iterable[Tuple[BaseEntity, str, str]]) -> Counter:
+    """Relabel nodes in place with their descriptors and return a counter of the namespaces fixed.
+
+    :param graph: A BEL graph
+    :param nodes: Triples of nodes in the graph and the UIs and names of their descriptors
+    """
+    mapping = {}
+    fixed_namespaces = []
+
+    for node, descriptor_ui, name in nodes:
+        if any(x in node for x in (VARIANTS, MEMBERS, REACTANTS, FUSION)):
+            log.debug('skipping: %s', node)
+            continue
+
+        fixed_namespaces.append(node[NAMESPACE])
+        dsl = FUNC_TO_DSL[node[FUNCTION]]
+        mapping[node] = dsl(
+            namespace='mesh',
+            name=name,
+            identifier=descriptor_ui,
+        )
+
+    relabel_nodes(graph, mapping, copy=False)
+
+    return Counter(fixed_namespaces)
+
+
+def normalize_graph(graph: BELGraph, snapshot: LookupSnapshot) -> Counter:
+    """Add identifiers to all MeSH terms using a snapshot and return a counter of the namespaces fixed."""
+    snapshot.add_namespace_to_graph(graph)
+
+    nodes = []
+    for node in graph:
+        descriptor = snapshot.look_up_node(node)
+        if descriptor is not None:
+            nodes.append((node, *descriptor))
+
+    return relabel_mesh_nodes(graph, nodes)
+
+
+#: The snapshot used by each worker process, set once by :func:`_init_worker`
+_snapshot: Optional[LookupSnapshot] = None
+
+
+def _init_worker(snapshot: LookupSnapshot) -> None:
+    global _snapshot
+    _snapshot = snapshot
+
+
+def _normalize_graph_in_worker(graph: BELGraph) -> Tuple[BELGraph, Counter]:
+    counter = normalize_graph(graph, _snapshot)
+    return graph, counter
+
+
+def _read_graph(path: str) -> BELGraph:
+    if path.endswith('.json'):
+        return from_json_path(path)
+    return from_pickle(path)
+
+
+def _write_graph(graph: BELGraph, path: str) -> None:
+    if path.endswith('.json'):
+        to_json_path(graph, path)
+    else:
+        to_pickle(graph, path)
+
+
+def _normalize_path_in_worker(paths: Tuple[str, str]) -> Counter:
+    source_path, target_path = paths
+    graph = _read_graph(source_path)
+    counter = normalize_graph(graph, _snapshot)
+    _write_graph(graph, target_path)
+    return counter
+
+
+def normalize_graphs(graphs: Iterable[BELGraph], snapshot: LookupSnapshot,
+                     workers: Optional[int] = None) -> List[Tuple[BELGraph, Counter]]:
+    """Normalize the MeSH nodes in many graphs across a process pool.
+
+    Graphs are copied to and from the workers, so the normalized graphs are returned instead of being modified in
+    place. Prefer :func:`normalize_graph_paths` for large graphs.
+
+    :param graphs: BEL graphs
+    :param snapshot: A snapshot from :meth:`bio2bel_mesh.Manager.get_lookup_snapshot`
+    :param workers: The number of processes to use. Defaults to the number of CPUs.
+    :return: Pairs of normalized graphs and counters of the namespaces fixed in each, in order
+    """
+    t = time.time()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(snapshot,)) as executor:
+        rv = list(executor.map(_normalize_graph_in_worker, graphs))
+    log.info('normalized %d graphs in %.2f seconds', len(rv), time.time() - t)
+    return rv
+
+
+def normalize_graph_paths(paths: Iterable[str], directory: str, snapshot: LookupSnapshot,
+                          workers: Optional[int] = None) -> Mapping[str, Counter]:
+    """Normalize the MeSH nodes in many graph files across a process pool.
+
+    Graphs are read and written by the workers, so only paths and counters pass between processes. Files ending
+    in ``.json`` are read and written as Node-Link JSON and all others as pickles.
+
+    :param paths: Paths to BEL graphs
+    :param directory: The directory to write the normalized graphs to, using the same file names
+    :param snapshot: A snapshot from :meth:`bio2bel_mesh.Manager.get_lookup_snapshot`
+    :param workers: The number of processes to use. Defaults to the number of CPUs.
+    :return: A dictionary from the given paths to counters of the namespaces fixed in each
+    :raises ValueError: If two different paths have the same file name, so they'd overwrite each other
+    """
+    target_source = {}
+    for path in paths:
+        target_path = os.path.join(directory, os.path.basename(path))
+        source_path = target_source.setdefault(target_path, path)
+        if os.path.abspath(source_path) != os.path.abspath(path):
+            raise ValueError(f'{source_path} and {path} would both be written to {target_path}')
+
+    t = time.time()
+    os.makedirs(directory, exist_ok=True)
+    paths = [
+        (source_path, target_path)
+        for target_path, source_path in target_source.items()
+    ]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(snapshot,)) as executor:
+        counters = executor.map(_normalize_path_in_worker, paths, chunksize=max(1, len(paths) // 64))
+        rv = {
+            source_path: counter
+            for (source_path, _), counter in zip(paths, counters)
+        }
+
+    log.info('normalized %d graphs in %.2f seconds', len(rv), time.time() - t)
+    return rv
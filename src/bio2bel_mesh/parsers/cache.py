@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+"""A compact, validated binary cache for parsed MeSH records.
+
+The cache file starts with a magic string and a length-prefixed JSON header describing the source file and the
+parser version that produced it, followed by length-prefixed :mod:`marshal` records. This makes it possible to
+check the cache without reading the records and to stream the records back one at a time.
+"""
+
+import hashlib
+import json
+import logging
+import marshal
+import os
+import struct
+import time
+from typing import Iterable, Mapping, Optional
+
+from ..constants import PARSER_VERSION
+
+__all__ = [
+    'is_records_cache_valid',
+    'iter_records_cache',
+    'iter_write_records_cache',
+]
+
+log = logging.getLogger(__name__)
+
+MAGIC = b'B2BMESH\x01'
+_LENGTH = struct.Struct('<I')
+
+
+def _get_source_sha256(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _get_source_metadata(path: str, sha256: bool = True) -> Mapping:
+    stat = os.stat(path)
+    rv = {
+        'parser_version': PARSER_VERSION,
+        'source': os.path.basename(path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+    }
+    if sha256:
+        rv['sha256'] = _get_source_sha256(path)
+    return rv
+
+
+def _read_header(file, magic: bytes = MAGIC) -> Optional[Mapping]:
+    if file.read(len(magic)) != magic:
+        return
+    length = file.read(_LENGTH.size)
+    if len(length) != _LENGTH.size:
+        return
+    return json.loads(file.read(_LENGTH.unpack(length)[0]))
+
+
+def _write_header(file, source_path: str, magic: bytes = MAGIC) -> None:
+    header = json.dumps(_get_source_metadata(source_path)).encode()
+    file.write(magic)
+    file.write(_LENGTH.pack(len(header)))
+    file.write(header)
+
+
+def _is_valid(path: str, source_path: str, magic: bytes = MAGIC) -> bool:
+    """Check if the file at the given path was built from the given source by the current parser.
+
+    The size and modification time of the source are checked first. The source is only hashed if its
+    modification time changed, e.g., because it was downloaded again.
+    """
+    if not os.path.exists(path) or not os.path.exists(source_path):
+        return False
+
+    with open(path, 'rb') as file:
+        header = _read_header(file, magic=magic)
+
+    if header is None:
+        log.info('invalid header in %s', path)
+        return False
+
+    current = _get_source_metadata(source_path, sha256=False)
+    if any(header.get(key) != current[key] for key in ('parser_version', 'source', 'size')):
+        log.info('%s is outdated', path)
+        return False
+
+    if header['mtime_ns'] != current['mtime_ns'] and header['sha256'] != _get_source_sha256(source_path):
+        log.info('%s does not match the contents of %s', path, source_path)
+        return False
+
+    return True
+
+
+def is_records_cache_valid(path: str, source_path: str) -> bool:
+    """Check if the cache at the given path was built from the given source by the current parser.
+
+    :param path: Path to the binary records cache
+    :param source_path: Path to the GZIP file from which the cache was built
+    """
+    return _is_valid(path, source_path)
+
+
+def iter_records_cache(path: str) -> Iterable[Mapping]:
+    """Iterate over the records in a binary records cache.
+
+    :param path: Path to the binary records cache
+    """
+    t = time.time()
+    log.info('loading cached records from %s (%.1f MB)', path, os.path.getsize(path) / 2 ** 20)
+    count = 0
+    with open(path, 'rb') as file:
+        if _read_header(file) is None:
+            raise ValueError(f'invalid records cache: {path}')
+
+        for length in iter(lambda: file.read(_LENGTH.size), b''):
+            yield marshal.loads(file.read(_LENGTH.unpack(length)[0]))
+            count += 1
+
+    log.info('loaded %d cached records in %.2f seconds', count, time.time() - t)
+
+
+def iter_write_records_cache(path: str, records: Iterable[Mapping], source_path: str) -> Iterable[Mapping]:
+    """Write records to a binary records cache as they are iterated over.
+
+    The cache is written to a temporary file which is only moved into place once all records have been consumed,
+    so an interrupted iteration never leaves a partial cache behind.
+
+    :param path: Path to the binary records cache
+    :param records: The records to cache
+    :param source_path: Path to the GZIP file from which the records were parsed
+    """
+    t = time.time()
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+
+    try:
+        with open(temporary_path, 'wb') as file:
+            _write_header(file, source_path)
+
+            for record in records:
+                value = marshal.dumps(record)
+                file.write(_LENGTH.pack(len(value)))
+                file.write(value)
+                yield record
+
+        os.replace(temporary_path, path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+    log.info('cached records to %s (%.1f MB) in %.2f seconds', path, os.path.getsize(path) / 2 ** 20,
+             time.time() - t)
@@ -2,22 +2,27 @@
 
 """Parser for the MeSH descriptors."""
 
-import json
 import logging
-import os
-from typing import Dict, List, Mapping, Optional
+from typing import Dict, Iterable, List, Mapping, Optional
 from xml.etree.ElementTree import Element
 
 from tqdm import tqdm
 
 from bio2bel import make_downloader
-from .utils import get_concepts, parse_xml
-from ..constants import DESCRIPTOR_JSON_PATH, DESCRIPTOR_PATH, DESCRIPTOR_URL
+from .cache import is_records_cache_valid, iter_records_cache, iter_write_records_cache
+from .index import get_indexed_record
+from .utils import get_concepts, iter_records_parallel, iterparse_xml, parse_xml
+from ..constants import (
+    DESCRIPTOR_CACHE_PATH, DESCRIPTOR_PATH, DESCRIPTOR_PATH_FMT, DESCRIPTOR_URL, DESCRIPTOR_URL_FMT,
+)
 
 __all__ = [
     'download_descriptors',
+    'download_descriptors_release',
     'get_descriptors_root',
+    'get_descriptor_record',
     'get_descriptor_records',
+    'iter_descriptor_records',
 ]
 
 log = logging.getLogger(__name__)
@@ -25,22 +30,64 @@ log = logging.getLogger(__name__)
 download_descriptors = make_downloader(DESCRIPTOR_URL, DESCRIPTOR_PATH)
 
 
-def get_descriptor_records(path: Optional[str] = None, cache=True, force_download=False) -> List[Mapping]:
-    """Get descriptors from a path."""
-    if path is None and os.path.exists(DESCRIPTOR_JSON_PATH):
-        log.info(f'loading cached descriptors json from {DESCRIPTOR_JSON_PATH}')
-        with open(DESCRIPTOR_JSON_PATH) as file:
-            return json.load(file)
+def download_descriptors_release(year: str, force_download: bool = False) -> str:
+    """Download the descriptors from the given year's MeSH release and return the path."""
+    downloader = make_downloader(DESCRIPTOR_URL_FMT.format(year=year), DESCRIPTOR_PATH_FMT.format(year=year))
+    return downloader(force_download=force_download)
 
-    root = get_descriptors_root(path=path, cache=cache, force_download=force_download)
-    rv = _get_descriptors(root)
 
-    if path is None:
-        with open(DESCRIPTOR_JSON_PATH, 'w') as file:
-            log.info('caching descriptors json')
-            json.dump(rv, file, indent=2)
+def get_descriptor_records(path: Optional[str] = None, cache=True, force_download=False,
+                           stream: bool = False, workers: Optional[int] = None) -> Iterable[Mapping]:
+    """Get descriptors from a path.
 
-    return rv
+    :param path: Path to the descriptors XML GZIP file. If none, is downloaded.
+    :param cache: If no path is given, should the records be loaded from and saved to the binary records cache?
+    :param force_download: Should the descriptors be downloaded again?
+    :param stream: If true, return an iterator that parses the XML incrementally instead of a list
+    :param workers: If more than one, the number of processes across which records are converted
+    """
+    if path is not None:
+        return _get_descriptor_records(path, stream=stream, workers=workers)
+
+    path = download_descriptors(force_download=force_download)
+
+    if not cache:
+        return _get_descriptor_records(path, stream=stream, workers=workers)
+
+    if is_records_cache_valid(DESCRIPTOR_CACHE_PATH, path):
+        rv = iter_records_cache(DESCRIPTOR_CACHE_PATH)
+    else:
+        log.info('caching descriptor records')
+        rv = iter_write_records_cache(
+            DESCRIPTOR_CACHE_PATH,
+            _get_descriptor_records(path, stream=stream, workers=workers),
+            source_path=path,
+        )
+
+    return rv if stream else list(rv)
+
+
+def _get_descriptor_records(path: str, stream: bool = False, workers: Optional[int] = None) -> Iterable[Mapping]:
+    if stream:
+        return iter_descriptor_records(path=path, workers=workers)
+
+    if workers is not None and 1 < workers:
+        return _resolve_parents(list(iter_records_parallel(path, 'DescriptorRecord', _get_descriptor, workers)))
+
+    return _get_descriptors(parse_xml(path))
+
+
+def get_descriptor_record(ui: str, path: Optional[str] = None) -> Optional[Mapping]:
+    """Get a single descriptor by its UI without parsing the whole file.
+
+    The first call builds a random-access index alongside the GZIP file, which is reused until the file changes.
+
+    :param ui: The UI of the descriptor
+    :param path: Path to the XML GZIP file. If none, is downloaded.
+    """
+    if path is None:
+        path = download_descriptors()
+    return get_indexed_record(path, ui, tag='DescriptorRecord', ui_tag='DescriptorUI', converter=_get_descriptor)
 
 
 def get_descriptors_root(path: Optional[str] = None, cache: bool = True, force_download: bool = False) -> Element:
@@ -51,6 +98,38 @@ def get_descriptors_root(path: Optional[str] = None, cache: bool = True, force_d
     return parse_xml(path)
 
 
+def iter_descriptor_records(path: Optional[str] = None, cache: bool = True, force_download: bool = False,
+                            workers: Optional[int] = None) -> Iterable[Mapping]:
+    """Iterate over descriptors, only holding one record's XML in memory at a time.
+
+    The file is read twice: the first pass only collects the tree numbers needed to resolve each
+    descriptor's parents and the second pass converts the records.
+
+    :param workers: If more than one, the number of processes across which records are converted
+    """
+    if path is None and cache:
+        path = download_descriptors(force_download=force_download)
+
+    tree_number_to_descriptor_ui = {
+        tree_number.text: element.findtext('DescriptorUI')
+        for element in iterparse_xml(path, 'DescriptorRecord')
+        for tree_number in element.findall('TreeNumberList/TreeNumber')
+    }
+    log.debug(f'got {len(tree_number_to_descriptor_ui)} tree mappings')
+
+    if workers is not None and 1 < workers:
+        descriptors = iter_records_parallel(path, 'DescriptorRecord', _get_descriptor, workers)
+    else:
+        descriptors = (
+            _get_descriptor(element)
+            for element in iterparse_xml(path, 'DescriptorRecord')
+        )
+
+    for descriptor in descriptors:
+        _add_parents(descriptor, tree_number_to_descriptor_ui)
+        yield descriptor
+
+
 def _get_descriptors(element: Element) -> List[Mapping]:
     log.info('extract MeSH descriptors, concepts, and terms')
 
@@ -58,6 +137,10 @@ def _get_descriptors(element: Element) -> List[Mapping]:
         _get_descriptor(descriptor)
         for descriptor in tqdm(element, desc='Getting MeSH Descriptors')
     ]
+    return _resolve_parents(rv)
+
+
+def _resolve_parents(rv: List[Dict]) -> List[Mapping]:
     log.debug(f'got {len(rv)} descriptors')
 
     # cache tree numbers
@@ -70,30 +153,35 @@ def _get_descriptors(element: Element) -> List[Mapping]:
 
     # add in parents to each descriptor based on their tree numbers
     for descriptor in rv:
-        parents_descriptor_uis = set()
-        for tree_number in descriptor['tree_numbers']:
-            try:
-                parent_tn, self_tn = tree_number.rsplit('.', 1)
-            except ValueError:
-                log.debug('No dot for %s', tree_number)
-                continue
-
-            parent_descriptor_ui = tree_number_to_descriptor_ui.get(parent_tn)
-            if parent_descriptor_ui is not None:
-                parents_descriptor_uis.add(parent_descriptor_ui)
-            else:
-                log.debug('missing tree number: %s', parent_tn)
-
-        descriptor['parents'] = list(parents_descriptor_uis)
+        _add_parents(descriptor, tree_number_to_descriptor_ui)
 
     return rv
 
 
+def _add_parents(descriptor: Dict, tree_number_to_descriptor_ui: Mapping[str, str]) -> None:
+    """Add the parents to a descriptor based on its tree numbers."""
+    parents_descriptor_uis = set()
+    for tree_number in descriptor['tree_numbers']:
+        try:
+            parent_tn, self_tn = tree_number.rsplit('.', 1)
+        except ValueError:
+            log.debug('No dot for %s', tree_number)
+            continue
+
+        parent_descriptor_ui = tree_number_to_descriptor_ui.get(parent_tn)
+        if parent_descriptor_ui is not None:
+            parents_descriptor_uis.add(parent_descriptor_ui)
+        else:
+            log.debug('missing tree number: %s', parent_tn)
+
+    descriptor['parents'] = sorted(parents_descriptor_uis)
+
+
 def _get_descriptor(element: Element) -> Dict:
     return {
         'descriptor_ui': element.findtext('DescriptorUI'),
         'name': element.findtext('DescriptorName/String'),
-        'tree_numbers': list({
+        'tree_numbers': sorted({
             x.text
             for x in element.findall('TreeNumberList/TreeNumber')
         }),
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+"""A random-access index over the records in the gzipped MeSH XML.
+
+A plain GZIP stream can't be decompressed from the middle, so building the index re-compresses the XML into
+independent GZIP members of whole records (like BGZF). Each member start is an access point. The index maps each
+record's UI to the offset and compressed length of its member and the record's position inside the decompressed
+member. The UIs are stored sorted in fixed-width entries so a lookup is a binary search over a memory map that
+decompresses a single member.
+"""
+
+import bisect
+import gzip
+import logging
+import mmap
+import os
+import re
+import struct
+import time
+import xml.etree.ElementTree as ET  # noqa: N817
+from typing import Callable, Iterable, Mapping, Optional, Tuple
+from xml.etree.ElementTree import Element
+
+from .cache import _is_valid, _read_header, _write_header
+
+__all__ = [
+    'build_record_index',
+    'ensure_record_index',
+    'get_index_paths',
+    'get_indexed_record',
+]
+
+log = logging.getLogger(__name__)
+
+INDEX_MAGIC = b'B2BMIDX\x01'
+_UI_SIZE = 16
+#: UI, member offset, member compressed length, record offset in the member, record length
+_ENTRY = struct.Struct(f'<{_UI_SIZE}sQIII')
+
+#: The number of decompressed bytes after which a new GZIP member is started
+MEMBER_SIZE = 1 << 16
+
+
+def get_index_paths(path: str) -> Tuple[str, str]:
+    """Get the paths of the index and the re-compressed XML built alongside the given GZIP file."""
+    return f'{path}.idx', f'{path}.blocks.gz'
+
+
+def _iter_record_spans(path: str, tag: str, ui_tag: str) -> Iterable[Tuple[bytes, bytes]]:
+    """Iterate over the UI and bytes of each record in a GZIP file containing XML."""
+    record_pattern = re.compile(f'<{tag}[\\s>].*?</{tag}>'.encode(), re.DOTALL)
+    ui_pattern = re.compile(f'<{ui_tag}>(.*?)</{ui_tag}>'.encode())
+
+    buffer = b''
+    with gzip.open(path) as xml_file:
+        for block in iter(lambda: xml_file.read(1 << 20), b''):
+            buffer += block
+            end = 0
+            for match in record_pattern.finditer(buffer):
+                record = match.group()
+                yield ui_pattern.search(record).group(1), record
+                end = match.end()
+            buffer = buffer[end:]
+
+
+def build_record_index(path: str, tag: str, ui_tag: str) -> None:
+    """Build a random-access index alongside a GZIP file containing MeSH XML.
+
+    :param path: Path to a GZIP file containing XML
+    :param tag: The tag of the records, like ``DescriptorRecord``
+    :param ui_tag: The tag of the child holding the record's UI, like ``DescriptorUI``
+    """
+    t = time.time()
+    index_path, blocks_path = get_index_paths(path)
+    log.info('indexing %s', path)
+
+    entries = []
+    member, member_entries, member_offset = [], [], 0
+
+    with open(f'{blocks_path}.tmp', 'wb') as blocks_file:
+        def flush_member() -> int:
+            compressed = gzip.compress(b''.join(member))
+            blocks_file.write(compressed)
+            entries.extend(
+                (ui, member_offset, len(compressed), start, length)
+                for ui, start, length in member_entries
+            )
+            member.clear()
+            member_entries.clear()
+            return member_offset + len(compressed)
+
+        member_length = 0
+        for ui, record in _iter_record_spans(path, tag, ui_tag):
+            member_entries.append((ui, member_length, len(record)))
+            member.append(record)
+            member_length += len(record)
+
+            if MEMBER_SIZE <= member_length:
+                member_offset = flush_member()
+                member_length = 0
+
+        if member:
+            flush_member()
+
+    entries.sort()
+    with open(f'{index_path}.tmp', 'wb') as index_file:
+        _write_header(index_file, path, magic=INDEX_MAGIC)
+        for entry in entries:
+            index_file.write(_ENTRY.pack(*entry))
+
+    os.replace(f'{blocks_path}.tmp', blocks_path)
+    os.replace(f'{index_path}.tmp', index_path)
+    log.info('indexed %d records from %s in %.2f seconds', len(entries), path, time.time() - t)
+
+
+def ensure_record_index(path: str, tag: str, ui_tag: str) -> None:
+    """Build the random-access index alongside a GZIP file containing MeSH XML if it's missing or outdated."""
+    index_path, blocks_path = get_index_paths(path)
+    if not os.path.exists(blocks_path) or not _is_valid(index_path, path, magic=INDEX_MAGIC):
+        build_record_index(path, tag, ui_tag)
+
+
+class _Entries:
+    """A sequence of the UIs in an index's memory map that can be searched with :mod:`bisect`."""
+
+    def __init__(self, buffer: mmap.mmap, start: int) -> None:
+        self.buffer = buffer
+        self.start = start
+
+    def __len__(self) -> int:
+        return (len(self.buffer) - self.start) // _ENTRY.size
+
+    def __getitem__(self, i: int) -> bytes:
+        return self.unpack(i)[0]
+
+    def unpack(self, i: int) -> Tuple[bytes, int, int, int, int]:
+        return _ENTRY.unpack_from(self.buffer, self.start + i * _ENTRY.size)
+
+
+def _get_record_bytes(path: str, ui: str) -> Optional[bytes]:
+    index_path, blocks_path = get_index_paths(path)
+    key = ui.encode().ljust(_UI_SIZE, b'\0')
+
+    with open(index_path, 'rb') as index_file:
+        _read_header(index_file, magic=INDEX_MAGIC)
+        start = index_file.tell()
+        with mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            entries = _Entries(buffer, start)
+            i = bisect.bisect_left(entries, key)
+            if i == len(entries):
+                return
+            entry_ui, member_offset, member_length, record_start, record_length = entries.unpack(i)
+
+    if entry_ui != key:
+        return
+
+    with open(blocks_path, 'rb') as blocks_file:
+        blocks_file.seek(member_offset)
+        member = gzip.decompress(blocks_file.read(member_length))
+
+    return member[record_start:record_start + record_length]
+
+
+def get_indexed_record(path: str, ui: str, tag: str, ui_tag: str,
+                       converter: Callable[[Element], Mapping]) -> Optional[Mapping]:
+    """Get a single record from a GZIP file containing MeSH XML by its UI, building the index if needed.
+
+    :param path: Path to a GZIP file containing XML
+    :param ui: The UI of the record to get
+    :param tag: The tag of the records, like ``DescriptorRecord``
+    :param ui_tag: The tag of the child holding the record's UI, like ``DescriptorUI``
+    :param converter: A function that converts a record element
+    """
+    ensure_record_index(path, tag, ui_tag)
+
+    record = _get_record_bytes(path, ui)
+    if record is None:
+        return
+
+    return converter(ET.fromstring(record))
@@ -2,22 +2,27 @@
 
 """Parser for the MeSH supplemental."""
 
-import json
 import logging
-import os
-from typing import List, Mapping, Optional
+from typing import Iterable, List, Mapping, Optional
 from xml.etree.ElementTree import Element
 
 from tqdm import tqdm
 
 from bio2bel import make_downloader
-from .utils import get_concepts, parse_xml
-from ..constants import SUPPLEMENT_JSON_PATH, SUPPLEMENT_PATH, SUPPLEMENT_URL
+from .cache import is_records_cache_valid, iter_records_cache, iter_write_records_cache
+from .index import get_indexed_record
+from .utils import get_concepts, iter_records_parallel, iterparse_xml, parse_xml
+from ..constants import (
+    SUPPLEMENT_CACHE_PATH, SUPPLEMENT_PATH, SUPPLEMENT_PATH_FMT, SUPPLEMENT_URL, SUPPLEMENT_URL_FMT,
+)
 
 __all__ = [
     'download_supplement',
+    'download_supplement_release',
     'get_supplement_root',
+    'get_supplementary_record',
     'get_supplementary_records',
+    'iter_supplementary_records',
 ]
 
 log = logging.getLogger(__name__)
@@ -25,23 +30,62 @@ log = logging.getLogger(__name__)
 download_supplement = make_downloader(SUPPLEMENT_URL, SUPPLEMENT_PATH)
 
 
-def get_supplementary_records(path: Optional[str] = None, cache: bool = True, force_download: bool = False) -> List[
-    Mapping]:  # noqa: E126
-    """Get supplementary records."""
-    if path is None and os.path.exists(SUPPLEMENT_JSON_PATH):
-        log.info('loading cached supplemental records json')
-        with open(SUPPLEMENT_JSON_PATH) as file:
-            return json.load(file)
+def download_supplement_release(year: str, force_download: bool = False) -> str:
+    """Download the supplementary records from the given year's MeSH release and return the path."""
+    downloader = make_downloader(SUPPLEMENT_URL_FMT.format(year=year), SUPPLEMENT_PATH_FMT.format(year=year))
+    return downloader(force_download=force_download)
 
-    root = get_supplement_root(path=path, cache=cache, force_download=force_download)
-    rv = _get_terms(root)
 
-    if path is None:
-        with open(SUPPLEMENT_JSON_PATH, 'w') as file:
-            log.info('caching supplemental records json')
-            json.dump(rv, file, indent=2)
+def get_supplementary_records(path: Optional[str] = None, cache: bool = True, force_download: bool = False,
+                              stream: bool = False, workers: Optional[int] = None) -> Iterable[Mapping]:
+    """Get supplementary records.
+
+    :param path: Path to the supplementary records XML GZIP file. If none, is downloaded.
+    :param cache: If no path is given, should the records be loaded from and saved to the binary records cache?
+    :param force_download: Should the supplementary records be downloaded again?
+    :param stream: If true, return an iterator that parses the XML incrementally instead of a list
+    :param workers: If more than one, the number of processes across which records are converted
+    """
+    if path is not None:
+        return _get_supplementary_records(path, stream=stream, workers=workers)
+
+    path = download_supplement(force_download=force_download)
+
+    if not cache:
+        return _get_supplementary_records(path, stream=stream, workers=workers)
+
+    if is_records_cache_valid(SUPPLEMENT_CACHE_PATH, path):
+        rv = iter_records_cache(SUPPLEMENT_CACHE_PATH)
+    else:
+        log.info('caching supplementary records')
+        rv = iter_write_records_cache(
+            SUPPLEMENT_CACHE_PATH,
+            _get_supplementary_records(path, stream=stream, workers=workers),
+            source_path=path,
+        )
+
+    return rv if stream else list(rv)
+
+
+def _get_supplementary_records(path: str, stream: bool = False, workers: Optional[int] = None) -> Iterable[Mapping]:
+    if stream or (workers is not None and 1 < workers):
+        rv = iter_supplementary_records(path=path, workers=workers)
+        return rv if stream else list(rv)
+
+    return _get_terms(parse_xml(path))
+
+
+def get_supplementary_record(ui: str, path: Optional[str] = None) -> Optional[Mapping]:
+    """Get a single supplementary record by its UI without parsing the whole file.
 
-    return rv
+    The first call builds a random-access index alongside the GZIP file, which is reused until the file changes.
+
+    :param ui: The UI of the supplementary record
+    :param path: Path to the XML GZIP file. If none, is downloaded.
+    """
+    if path is None:
+        path = download_supplement()
+    return get_indexed_record(path, ui, tag='SupplementalRecord', ui_tag='SupplementalRecordUI', converter=_get_term)
 
 
 def get_supplement_root(path: Optional[str] = None, cache: bool = True, force_download: bool = False) -> Element:
@@ -51,14 +95,35 @@ def get_supplement_root(path: Optional[str] = None, cache: bool = True, force_do
     return parse_xml(path)
 
 
+def iter_supplementary_records(path: Optional[str] = None, cache: bool = True, force_download: bool = False,
+                               workers: Optional[int] = None) -> Iterable[Mapping]:
+    """Iterate over supplementary records, only holding one record's XML in memory at a time.
+
+    :param workers: If more than one, the number of processes across which records are converted
+    """
+    if path is None and cache:
+        path = download_supplement(force_download=force_download)
+
+    if workers is not None and 1 < workers:
+        yield from iter_records_parallel(path, 'SupplementalRecord', _get_term, workers)
+        return
+
+    for record in iterparse_xml(path, 'SupplementalRecord'):
+        yield _get_term(record)
+
+
 def _get_terms(element: Element) -> List[Mapping]:
     return [
-        {
-            # this basically takes the same form as a descriptor
-            'descriptor_ui': record.findtext('SupplementalRecordUI'),
-            'name': record.findtext('SupplementalRecordName/String'),
-            'scr': record.get('SCRClass'),
-            'concepts': get_concepts(record),
-        }
+        _get_term(record)
         for record in tqdm(element.findall('SupplementalRecord'), desc='Supplemental Records')
     ]
+
+
+def _get_term(record: Element) -> Mapping:
+    return {
+        # this basically takes the same form as a descriptor
+        'descriptor_ui': record.findtext('SupplementalRecordUI'),
+        'name': record.findtext('SupplementalRecordName/String'),
+        'scr': record.get('SCRClass'),
+        'concepts': get_concepts(record),
+    }
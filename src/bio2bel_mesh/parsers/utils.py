@@ -4,11 +4,15 @@
 
 import gzip
 import logging
+import re
 import time
 import xml.etree.ElementTree as ET  # noqa: N814
-from typing import List, Mapping
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Iterable, List, Mapping
 from xml.etree.ElementTree import Element
 
+from ..utils import map_bounded
 
 log = logging.getLogger(__name__)
 
@@ -24,6 +28,83 @@ def parse_xml(path: str) -> Element:
     return tree.getroot()
 
 
+def iterparse_xml(path: str, tag: str) -> Iterable[Element]:
+    """Iterate over the elements with the given tag in a GZIP file without building the whole tree.
+
+    Each element is cleared from the tree after it has been yielded, so only the record currently being
+    converted is held in memory. Consumers must finish with an element before advancing the iterator.
+
+    :param path: Path to a GZIP file containing XML
+    :param tag: The tag of the records to yield, like ``DescriptorRecord``
+    """
+    t = time.time()
+    log.info('iteratively parsing %s from %s', tag, path)
+    with gzip.open(path) as xml_file:
+        context = ET.iterparse(xml_file, events=('start', 'end'))
+        _, root = next(context)
+        for event, element in context:
+            if event == 'end' and element.tag == tag:
+                yield element
+                root.clear()
+    log.info('iteratively parsed xml in %.2f seconds', time.time() - t)
+
+
+def iter_xml_chunks(path: str, tag: str, chunk_size: int = 1 << 22) -> Iterable[bytes]:
+    """Split the decompressed XML in a GZIP file into chunks that each contain only whole records.
+
+    :param path: Path to a GZIP file containing XML
+    :param tag: The tag of the records on which chunks are aligned, like ``DescriptorRecord``
+    :param chunk_size: The number of decompressed bytes to read at a time
+    """
+    start_pattern = re.compile(f'<{tag}[\\s>]'.encode())
+    end_tag = f'</{tag}>'.encode()
+
+    buffer = b''
+    with gzip.open(path) as xml_file:
+        for block in iter(lambda: xml_file.read(chunk_size), b''):
+            buffer += block
+
+            start = start_pattern.search(buffer)
+            end = buffer.rfind(end_tag)
+            if start is None or end == -1 or end < start.start():
+                continue
+
+            end += len(end_tag)
+            yield buffer[start.start():end]
+            buffer = buffer[end:]
+
+
+def _convert_chunk(chunk: bytes, tag: str, converter: Callable[[Element], Mapping]) -> List[Mapping]:
+    """Convert all of the records in a chunk from :func:`iter_xml_chunks`."""
+    root = ET.fromstring(b'<chunk>' + chunk + b'</chunk>')
+    return [
+        converter(element)
+        for element in root.findall(tag)
+    ]
+
+
+def iter_records_parallel(path: str, tag: str, converter: Callable[[Element], Mapping], workers: int,
+                          chunk_size: int = 1 << 22) -> Iterable[Mapping]:
+    """Convert the records in a GZIP file across a pool of processes, yielding them in the original order.
+
+    At most twice as many chunks as there are workers are in flight at once, so memory stays bounded.
+
+    :param path: Path to a GZIP file containing XML
+    :param tag: The tag of the records to convert, like ``DescriptorRecord``
+    :param converter: A module-level (picklable) function that converts one record element
+    :param workers: The number of worker processes
+    :param chunk_size: The number of decompressed bytes to read at a time
+    """
+    t = time.time()
+    log.info('parsing %s from %s with %d workers', tag, path, workers)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = iter_xml_chunks(path, tag, chunk_size=chunk_size)
+        convert_chunk = partial(_convert_chunk, tag=tag, converter=converter)
+        for records in map_bounded(executor, convert_chunk, chunks, max_pending=2 * workers):
+            yield from records
+    log.info('parsed xml with %d workers in %.2f seconds', workers, time.time() - t)
+
+
 def get_terms(element: Element) -> List[Mapping]:
     """Get all of the terms for a concept."""
     return [
@@ -42,7 +123,7 @@ def get_concepts(element: Element) -> List[Mapping]:
         {
             'concept_ui': concept.findtext('ConceptUI'),
             'name': concept.findtext('ConceptName/String'),
-            'semantic_types': list({
+            'semantic_types': sorted({
                 x.text
                 for x in concept.findall('SemanticTypeList/SemanticType/SemanticTypeUI')
             }),
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+"""Full-text and prefix search over MeSH terms.
+
+On SQLite, the normalized names of all terms are indexed in an FTS5 table when the database is populated. Queries
+match every token, the last one as a prefix so partially typed words complete, and results are ranked with BM25,
+which favors shorter names, so the closest names come first. Other backends, and SQLite builds without FTS5, fall back to a
+range scan over the index on :data:`bio2bel_mesh.models.Term.normalized_name`, which only supports prefixes and
+returns matches alphabetically.
+"""
+
+import logging
+import time
+from typing import List
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, joinedload
+
+from .constants import MODULE_NAME
+from .models import Concept, TERM_TABLE_NAME, Term
+from .utils import normalize_name
+
+__all__ = [
+    'SEARCH_TABLE_NAME',
+    'build_search_index',
+    'drop_search_index',
+    'has_search_index',
+    'search_terms',
+]
+
+log = logging.getLogger(__name__)
+
+#: Load the concept and descriptor of each term found in the same query, since results are shown with them
+_load_descriptors = joinedload(Term.concept).joinedload(Concept.descriptor)
+
+SEARCH_TABLE_NAME = f'{MODULE_NAME}_term_search'
+
+
+def build_search_index(session: Session) -> bool:
+    """Build the full-text index over terms, replacing an existing one.
+
+    :param session: A SQLAlchemy session
+    :return: If the index could be built. It can't on backends other than SQLite or without FTS5.
+    """
+    if session.get_bind().dialect.name != 'sqlite':
+        log.info('full-text search is only available for SQLite. Falling back to prefix search')
+        return False
+
+    t = time.time()
+    drop_search_index(session)
+    try:
+        session.execute(
+            f"CREATE VIRTUAL TABLE {SEARCH_TABLE_NAME} USING fts5("
+            f"normalized_name, content='', tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+    except OperationalError:
+        log.warning('SQLite was built without FTS5. Falling back to prefix search')
+        session.rollback()
+        return False
+
+    session.execute(
+        f'INSERT INTO {SEARCH_TABLE_NAME} (rowid, normalized_name) '
+        f'SELECT id, normalized_name FROM {TERM_TABLE_NAME} WHERE normalized_name IS NOT NULL'
+    )
+    session.commit()
+    log.info('built full-text index over terms in %.2f seconds', time.time() - t)
+    return True
+
+
+def drop_search_index(session: Session) -> None:
+    """Drop the full-text index over terms if it exists.
+
+    It isn't part of the metadata of :mod:`bio2bel_mesh.models`, so it has to be dropped along with the tables.
+    """
+    if session.get_bind().dialect.name != 'sqlite':
+        return
+
+    session.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE_NAME}')
+    session.commit()
+
+
+def has_search_index(session: Session) -> bool:
+    """Check if the full-text index over terms exists."""
+    if session.get_bind().dialect.name != 'sqlite':
+        return False
+
+    return session.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name",
+        {'name': SEARCH_TABLE_NAME},
+    ).scalar() is not None
+
+
+def _get_match_query(tokens: List[str]) -> str:
+    """Build an FTS5 query where all tokens must match and the last one can be a prefix.
+
+    Tokens only contain alphanumeric characters after :func:`normalize_name`, so quoting them is enough.
+    """
+    return ' '.join(f'"{token}"' for token in tokens) + '*'
+
+
+def search_terms(session: Session, query: str, limit: int = 10, full_text: bool = True) -> List[Term]:
+    """Search for terms matching the query, best matches first.
+
+    :param session: A SQLAlchemy session
+    :param query: Words in the name, the last of which can be partial, like ``alzheimer dis``
+    :param limit: The maximum number of terms to return
+    :param full_text: Should the full-text index be used? It must exist, see :func:`has_search_index`. If not,
+     only names starting with the query are found.
+    :return: Terms with their concepts and descriptors already loaded
+    """
+    tokens = normalize_name(query).split()
+    if not tokens:
+        return []
+
+    if not full_text:
+        return _search_terms_by_prefix(session, ' '.join(tokens), limit)
+
+    term_ids = [
+        term_id
+        for term_id, in session.execute(
+            f'SELECT rowid FROM {SEARCH_TABLE_NAME} WHERE {SEARCH_TABLE_NAME} MATCH :query '
+            f'ORDER BY bm25({SEARCH_TABLE_NAME}) LIMIT :limit',
+            {'query': _get_match_query(tokens), 'limit': limit},
+        )
+    ]
+    if not term_ids:
+        return []
+
+    id_term = {
+        term.id: term
+        for term in session.query(Term).options(_load_descriptors).filter(Term.id.in_(term_ids))
+    }
+    # skip terms that were deleted since the index was built
+    return [id_term[term_id] for term_id in term_ids if term_id in id_term]
+
+
+def _search_terms_by_prefix(session: Session, prefix: str, limit: int) -> List[Term]:
+    # a range in index order instead of LIKE, which many backends won't use an index for, so the scan
+    # stops after the first matches
+    return (
+        session.query(Term)
+        .options(_load_descriptors)
+        .filter(Term.normalized_name >= prefix, Term.normalized_name < prefix + '\U0010ffff')
+        .order_by(Term.normalized_name, Term.id)
+        .limit(limit)
+        .all()
+    )
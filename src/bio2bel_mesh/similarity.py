@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+
+"""Semantic similarity between MeSH descriptors with NumPy.
+
+The ancestors of each descriptor, including itself, are loaded from :class:`bio2bel_mesh.models.DescriptorClosure`
+into compressed sparse rows: ``indices[indptr[i]:indptr[i + 1]]`` are the ancestors of descriptor ``i`` and
+``depths`` the number of levels up to each. Information content is intrinsic, based on the fraction of descriptors
+in the hierarchy under each one. Comparing one descriptor to many gathers all of their ancestor rows at once and
+reduces each row with :func:`numpy.ufunc.reduceat`, so there's no Python loop over pairs.
+
+The measures are:
+
+- Resnik: the information content of the most informative common ancestor
+- Lin: Resnik's similarity divided by the mean information content of the two descriptors
+- Wang: the overlap of the descriptors' semantic values, where an ancestor ``d`` levels up contributes ``w ** d``
+
+Requires ``numpy``, which can be installed with ``pip install bio2bel_mesh[numpy]``.
+"""
+
+import logging
+import time
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from .models import Descriptor, DescriptorClosure
+
+__all__ = [
+    'METHODS',
+    'SemanticSimilarity',
+]
+
+log = logging.getLogger(__name__)
+
+METHODS = {'resnik', 'lin', 'wang'}
+
+
+class SemanticSimilarity:
+    """Vectorized semantic similarity between the descriptors in the MeSH hierarchy."""
+
+    def __init__(self, descriptor_uis: Sequence[str], indptr: np.ndarray, indices: np.ndarray, depths: np.ndarray,
+                 wang_weight: float = 0.8) -> None:
+        """Precompute the information content and semantic values of all descriptors.
+
+        :param descriptor_uis: The UIs of the descriptors, in the order of their indexes
+        :param indptr: The offsets of each descriptor's ancestors in ``indices``, of length one more than the
+         number of descriptors
+        :param indices: The indexes of the ancestors of each descriptor, including itself
+        :param depths: The number of levels up to each ancestor in ``indices``, zero for the descriptor itself
+        :param wang_weight: The weight of each level up for Wang's measure
+        """
+        self.descriptor_uis = list(descriptor_uis)
+        self.ui_index = {ui: i for i, ui in enumerate(self.descriptor_uis)}
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.depths = np.asarray(depths, dtype=np.int64)
+
+        n = len(self.descriptor_uis)
+        descendant_counts = np.bincount(self.indices, minlength=n)
+        self.information_content = -np.log(descendant_counts / n)
+        self.semantic_values = wang_weight ** self.depths.astype(float)
+        self.semantic_value_sums = np.add.reduceat(self.semantic_values, self.indptr[:-1])
+
+    def __len__(self) -> int:
+        return len(self.descriptor_uis)
+
+    @classmethod
+    def from_session(cls, session: Session, wang_weight: float = 0.8) -> 'SemanticSimilarity':
+        """Load the hierarchy from the closure table in two queries."""
+        t = time.time()
+        descriptors = (
+            session.query(Descriptor.id, Descriptor.descriptor_ui)
+            .join(DescriptorClosure, DescriptorClosure.descendant_id == Descriptor.id)
+            .filter(DescriptorClosure.depth == 0)
+            .order_by(Descriptor.id)
+            .all()
+        )
+        descriptor_ids = np.array([descriptor_id for descriptor_id, _ in descriptors], dtype=np.int64)
+
+        closure = np.array(
+            session.query(DescriptorClosure.descendant_id, DescriptorClosure.ancestor_id, DescriptorClosure.depth)
+            .order_by(DescriptorClosure.descendant_id)
+            .all(),
+            dtype=np.int64,
+        ).reshape(-1, 3)
+
+        descendants = np.searchsorted(descriptor_ids, closure[:, 0])
+        indptr = np.zeros(len(descriptor_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(descendants, minlength=len(descriptor_ids)), out=indptr[1:])
+
+        rv = cls(
+            descriptor_uis=[descriptor_ui for _, descriptor_ui in descriptors],
+            indptr=indptr,
+            indices=np.searchsorted(descriptor_ids, closure[:, 1]),
+            depths=closure[:, 2],
+            wang_weight=wang_weight,
+        )
+        log.info('loaded %d descriptors for similarity in %.2f seconds', len(rv), time.time() - t)
+        return rv
+
+    def get_ancestors(self, descriptor_ui: str) -> List[Tuple[str, int]]:
+        """Get the UIs of the ancestors of a descriptor, including itself, and the levels up to each."""
+        i = self.ui_index[descriptor_ui]
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return [
+            (self.descriptor_uis[ancestor], int(depth))
+            for ancestor, depth in zip(self.indices[start:end], self.depths[start:end])
+        ]
+
+    def _gather(self, targets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the positions in ``indices`` of all of the targets' ancestors and where each target's start."""
+        starts = self.indptr[targets]
+        lengths = self.indptr[targets + 1] - starts
+        offsets = np.zeros(len(targets), dtype=np.int64)
+        np.cumsum(lengths[:-1], out=offsets[1:])
+        positions = np.arange(lengths.sum()) + np.repeat(starts - offsets, lengths)
+        return positions, offsets
+
+    def _one_vs_many(self, source: int, targets: np.ndarray, method: str) -> np.ndarray:
+        if method not in METHODS:
+            raise ValueError(f'invalid method: {method}. Use one of {sorted(METHODS)}')
+        if not len(targets):
+            return np.zeros(0)
+
+        positions, offsets = self._gather(targets)
+        ancestors = self.indices[positions]
+
+        # the source's ancestors as a dense vector, so checking if an ancestor is shared is a lookup
+        source_ancestors = self.indices[self.indptr[source]:self.indptr[source + 1]]
+
+        if method == 'wang':
+            source_values = np.zeros(len(self))
+            source_values[source_ancestors] = self.semantic_values[self.indptr[source]:self.indptr[source + 1]]
+            shared_values = source_values[ancestors]
+            contributions = np.where(0 < shared_values, shared_values + self.semantic_values[positions], 0.0)
+            totals = self.semantic_value_sums[source] + self.semantic_value_sums[targets]
+            return np.add.reduceat(contributions, offsets) / totals
+
+        is_shared = np.zeros(len(self), dtype=bool)
+        is_shared[source_ancestors] = True
+        resnik = np.maximum.reduceat(
+            np.where(is_shared[ancestors], self.information_content[ancestors], 0.0),
+            offsets,
+        )
+        if method == 'resnik':
+            return resnik
+
+        totals = self.information_content[source] + self.information_content[targets]
+        # two descriptors with no information content, like a root, are only similar to themselves
+        return np.divide(2 * resnik, totals, out=(targets == source).astype(float), where=0 < totals)
+
+    def _get_indexes(self, descriptor_uis: Iterable[str]) -> np.ndarray:
+        return np.array([self.ui_index[ui] for ui in descriptor_uis], dtype=np.int64)
+
+    def similarity(self, descriptor_ui: str, other_ui: str, method: str = 'lin') -> float:
+        """Calculate the similarity between two descriptors.
+
+        :param descriptor_ui: The UI of a descriptor with a tree number
+        :param other_ui: The UI of another descriptor with a tree number
+        :param method: One of ``resnik``, ``lin``, or ``wang``
+        """
+        return float(self.one_vs_many(descriptor_ui, [other_ui], method=method)[0])
+
+    def one_vs_many(self, descriptor_ui: str, other_uis: Iterable[str], method: str = 'lin') -> np.ndarray:
+        """Calculate the similarities between a descriptor and each of several others."""
+        return self._one_vs_many(self.ui_index[descriptor_ui], self._get_indexes(other_uis), method)
+
+    def pairwise(self, descriptor_uis: Iterable[str], other_uis: Optional[Iterable[str]] = None,
+                 method: str = 'lin') -> np.ndarray:
+        """Calculate a matrix of similarities between each of the descriptors and each of the others.
+
+        :param descriptor_uis: The UIs of descriptors, for the rows
+        :param other_uis: The UIs of descriptors, for the columns. Defaults to the same as the rows.
+        :param method: One of ``resnik``, ``lin``, or ``wang``
+        """
+        sources = self._get_indexes(descriptor_uis)
+        targets = sources if other_uis is None else self._get_indexes(other_uis)
+        rv = np.zeros((len(sources), len(targets)))
+        for row, source in enumerate(sources):
+            rv[row] = self._one_vs_many(source, targets, method)
+        return rv
+
+    def pairs(self, pairs: Iterable[Tuple[str, str]], method: str = 'lin') -> np.ndarray:
+        """Calculate the similarities of many pairs of descriptors, batched by their first descriptor."""
+        pairs = np.array([(self.ui_index[a], self.ui_index[b]) for a, b in pairs], dtype=np.int64).reshape(-1, 2)
+        rv = np.zeros(len(pairs))
+
+        order = np.argsort(pairs[:, 0], kind='stable')
+        sources = pairs[order, 0]
+        boundaries = np.flatnonzero(np.diff(sources)) + 1
+        for group in np.split(order, boundaries):
+            rv[group] = self._one_vs_many(pairs[group[0], 0], pairs[group, 1], method)
+
+        return rv
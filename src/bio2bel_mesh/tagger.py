@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+"""Dictionary-based tagging of MeSH terms in free text.
+
+All term names, including permuted ones, are split into tokens like :func:`bio2bel_mesh.utils.normalize_name`
+and compiled into a token trie, stored flat as a dictionary from whole names to descriptor UIs and a set of the
+proper prefixes of names. Text is scanned once from left to right. At each token, the trie is followed as far as
+the text allows without crossing the end of a sentence and the longest name ending along the way is kept, then
+scanning continues after it, so mentions never overlap.
+"""
+
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from .utils import iter_batches, map_bounded, normalize_name
+
+__all__ = [
+    'Mention',
+    'Tagger',
+    'tag_documents',
+]
+
+log = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r'[^\W_]+')
+_SENTENCE_BREAK = re.compile(r'[.;!?]\s|\n')
+
+
+class Mention(NamedTuple):
+    """A mention of a MeSH term in a text."""
+
+    #: The index of the first character of the mention in the text
+    start: int
+    #: The index after the last character of the mention in the text
+    end: int
+    #: The mention as written in the text
+    text: str
+    #: The UI of the descriptor of the mentioned term
+    descriptor_ui: str
+
+
+def _tokenize(text: str) -> List[Tuple[str, int, int, bool]]:
+    """Split text into case folded tokens with their character spans, dropping possessives.
+
+    Each token also says if it starts a new sentence, since mentions shouldn't span sentences.
+    """
+    rv = []
+    previous_end = 0
+    for match in _TOKEN.finditer(text):
+        start, end = match.span()
+        token = match.group().casefold()
+        if token == 's' and 0 < start and text[start - 1] in "'’":
+            continue
+        rv.append((token, start, end, _SENTENCE_BREAK.search(text, previous_end, start) is not None))
+        previous_end = end
+    return rv
+
+
+class Tagger:
+    """Finds the longest non-overlapping mentions of MeSH terms in text."""
+
+    def __init__(self, pairs: Iterable[Tuple[str, str]]) -> None:
+        """Compile the names into a token trie.
+
+        :param pairs: Pairs of names and the UIs of their descriptors. If a name appears more than once,
+         its first descriptor is used.
+        """
+        t = time.time()
+        self.name_descriptor = {}
+        self.prefixes = set()
+        self.max_tokens = 0
+
+        for name, descriptor_ui in pairs:
+            tokens = normalize_name(name).split()
+            if not tokens:
+                continue
+
+            self.name_descriptor.setdefault(' '.join(tokens), descriptor_ui)
+            self.prefixes.update(
+                ' '.join(tokens[:i])
+                for i in range(1, len(tokens))
+            )
+            self.max_tokens = max(self.max_tokens, len(tokens))
+
+        log.info('compiled %d names in %.2f seconds', len(self.name_descriptor), time.time() - t)
+
+    def tag(self, text: str) -> List[Mention]:
+        """Find the longest non-overlapping mentions of MeSH terms in the text, in order."""
+        tokens = _tokenize(text)
+        rv = []
+
+        i = 0
+        while i < len(tokens):
+            key = None
+            longest: Optional[Tuple[int, str]] = None
+
+            for j in range(i, min(len(tokens), i + self.max_tokens)):
+                if i < j and tokens[j][3]:
+                    break
+                key = tokens[j][0] if key is None else f'{key} {tokens[j][0]}'
+                descriptor_ui = self.name_descriptor.get(key)
+                if descriptor_ui is not None:
+                    longest = j, descriptor_ui
+                if key not in self.prefixes:
+                    break
+
+            if longest is None:
+                i += 1
+                continue
+
+            j, descriptor_ui = longest
+            start, end = tokens[i][1], tokens[j][2]
+            rv.append(Mention(start=start, end=end, text=text[start:end], descriptor_ui=descriptor_ui))
+            i = j + 1
+
+        return rv
+
+
+#: The tagger used by each worker process, set once by :func:`_init_worker`
+_tagger: Optional[Tagger] = None
+
+
+def _init_worker(tagger: Tagger) -> None:
+    global _tagger
+    _tagger = tagger
+
+
+def _tag_batch(texts: List[str]) -> List[List[Mention]]:
+    return [_tagger.tag(text) for text in texts]
+
+
+def tag_documents(texts: Iterable[str], tagger: Tagger, workers: Optional[int] = None,
+                  batch_size: int = 500) -> Iterable[List[Mention]]:
+    """Tag a stream of documents across a pool of processes, yielding their mentions in the original order.
+
+    The tagger is sent to each worker once, when it starts. At most twice as many batches as there are workers
+    are in flight at once, so memory stays bounded. The throughput is logged at the end.
+
+    :param texts: The documents to tag
+    :param tagger: A tagger, like from :meth:`bio2bel_mesh.Manager.get_tagger`
+    :param workers: The number of worker processes. Defaults to the number of CPUs. If one, documents are tagged
+     in this process.
+    :param batch_size: The number of documents sent to a worker at once
+    """
+    t = time.time()
+    count = 0
+    batches = iter_batches(texts, batch_size)
+
+    if workers is not None and workers <= 1:
+        for batch in batches:
+            for text in batch:
+                yield tagger.tag(text)
+            count += len(batch)
+    else:
+        workers = workers or os.cpu_count()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(tagger,)) as executor:
+            for result in map_bounded(executor, _tag_batch, batches, max_pending=2 * workers):
+                count += len(result)
+                yield from result
+
+    elapsed = time.time() - t
+    log.info('tagged %d documents in %.2f seconds (%.1f documents/second)', count, elapsed,
+             count / elapsed if elapsed else 0.0)
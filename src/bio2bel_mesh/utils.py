@@ -4,18 +4,135 @@
 
 import json
 import logging
-from typing import Iterable, TextIO
+import re
+import string
+from collections import deque
+from concurrent.futures import Executor
+from itertools import islice
+from typing import Any, Callable, Iterable, List, Optional, TextIO, Tuple
 
 from .constants import VERSION
 
 log = logging.getLogger(__name__)
 
+_POSSESSIVE = re.compile(r"['\u2019]s\b")
+_NON_ALPHANUMERIC = re.compile(r'[\W_]+')
+
 
 def get_version() -> str:
     """Get the version of Bio2BEL MeSH."""
     return VERSION
 
 
+def iter_batches(iterable: Iterable, size: int) -> Iterable[List]:
+    """Split an iterable into lists of the given size, the last of which can be shorter.
+
+    >>> list(iter_batches(range(5), 2))
+    [[0, 1], [2, 3], [4]]
+    """
+    it = iter(iterable)
+    return iter(lambda: list(islice(it, size)), [])
+
+
+def map_bounded(executor: Executor, function: Callable, items: Iterable, max_pending: int) -> Iterable[Any]:
+    """Apply a function to items in an executor, yielding the results in the original order.
+
+    Unlike :meth:`concurrent.futures.Executor.map`, the items are submitted as the results are consumed, so at
+    most ``max_pending`` of them are in flight at once and memory stays bounded for long streams.
+
+    :param executor: An executor, like a :class:`concurrent.futures.ProcessPoolExecutor`
+    :param function: The function to apply. Must be picklable for process pools.
+    :param items: The items to apply the function to
+    :param max_pending: The number of items submitted before waiting for the first result
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(function, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+
+    while pending:
+        yield pending.popleft().result()
+
+
+def normalize_name(name: str) -> str:
+    """Normalize a name so lookups ignore case, punctuation, whitespace, and possessives.
+
+    >>> normalize_name("Alzheimer's  Disease")
+    'alzheimer disease'
+    >>> normalize_name('A-23187')
+    'a 23187'
+    """
+    name = _POSSESSIVE.sub('', name)
+    name = _NON_ALPHANUMERIC.sub(' ', name)
+    return name.strip().casefold()
+
+
+#: The number of characters in each segment of a tree key
+TREE_KEY_SEGMENT_WIDTH = 3
+
+#: The characters in tree keys, in the order they sort in with both binary and locale-aware collations
+TREE_KEY_ALPHABET = string.digits + string.ascii_uppercase
+
+
+def get_tree_key(tree_number: str) -> str:
+    """Encode a tree number so sorting is hierarchical and a subtree is a range of keys.
+
+    Numeric segments are zero-padded to :data:`TREE_KEY_SEGMENT_WIDTH` and the dots are dropped, so every segment
+    has the same width and the keys of a subtree are exactly the ones starting with the key of its root, so they
+    are a range. See :func:`get_tree_key_range`.
+
+    >>> get_tree_key('C10.228.140')
+    'C10228140'
+    >>> get_tree_key('C10.228.14')
+    'C10228014'
+    """
+    segments = tree_number.split('.')
+    if any(TREE_KEY_SEGMENT_WIDTH < len(segment) for segment in segments):
+        raise ValueError(f'tree number has a segment longer than {TREE_KEY_SEGMENT_WIDTH} characters: {tree_number}')
+    return ''.join(
+        segment.zfill(TREE_KEY_SEGMENT_WIDTH) if segment.isdigit() else segment
+        for segment in segments
+    )
+
+
+def get_tree_key_range(tree_number: str) -> Tuple[str, Optional[str]]:
+    """Get the lower (inclusive) and upper (exclusive) bounds of the keys in the subtree of a tree number.
+
+    The upper bound is the next key of the same length in :data:`TREE_KEY_ALPHABET`, so it only contains digits
+    and uppercase letters, which sort the same way under locale-aware collations as they do byte by byte. It's
+    none if no key comes after the subtree.
+
+    The tree number can also be a category letter, like ``C``.
+
+    >>> get_tree_key_range('C10.228')
+    ('C10228', 'C10229')
+    >>> get_tree_key_range('C10.229')
+    ('C10229', 'C1022A')
+    >>> get_tree_key_range('Z')
+    ('Z', None)
+    """
+    key = get_tree_key(tree_number)
+    invalid = set(key).difference(TREE_KEY_ALPHABET)
+    if invalid:
+        raise ValueError(f'tree number has characters other than digits and uppercase letters: {tree_number}')
+
+    prefix = key.rstrip(TREE_KEY_ALPHABET[-1])
+    if not prefix:
+        return key, None
+    return key, prefix[:-1] + TREE_KEY_ALPHABET[TREE_KEY_ALPHABET.index(prefix[-1]) + 1]
+
+
+def get_tree_depth(tree_number: str) -> int:
+    """Get the level of a tree number in the hierarchy, where top-level ones like ``C10`` are 1.
+
+    Category letters like ``C`` are 0.
+    """
+    if len(tree_number) == 1:
+        return 0
+    return tree_number.count('.') + 1
+
+
 def get_names(file: TextIO, tree_prefix: str) -> Iterable[str]:
     """Iterate over the names that match the given tree prefix.
 
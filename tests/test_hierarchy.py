@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the descriptor hierarchy in Bio2BEL MeSH."""
+
+import gzip
+import io
+import json
+import math
+import os
+import re
+import tempfile
+from typing import List, Mapping
+from unittest import mock
+
+import numpy as np
+
+from bio2bel_mesh.benchmarks import benchmark_similarity
+from bio2bel_mesh.categories import CATEGORIES
+from bio2bel_mesh.closure import build_closure, iter_closure
+from bio2bel_mesh.export import get_bel_cache_path, get_database_fingerprint
+from bio2bel_mesh.hierarchy import Hierarchy
+from bio2bel_mesh.models import Descriptor, DescriptorClosure, Tree
+from bio2bel_mesh.similarity import METHODS
+from bio2bel_mesh.utils import TREE_KEY_ALPHABET, get_tree_depth, get_tree_key, get_tree_key_range
+from pybel import from_lines
+from tests.cases import TemporaryCacheClass
+from tests.constants import TEST_DESCRIPTORS_PATH, TEST_SUPPLEMENT_PATH
+
+#: Tree numbers for some of the test descriptors so they form a small hierarchy
+HIERARCHY = {
+    'D000005': ['A01'],  # Abdomen
+    'D000006': ['A01.047', 'C23'],  # Abdomen, Acute
+    'D000001': ['A01.047.100', 'D03'],  # Calcimycin
+    'D000002': ['C23.888'],  # Temefos
+    'D000004': ['C23.100'],  # Abbreviations as Topic
+}
+
+
+def make_release(path: str, descriptor_trees: Mapping[str, List[str]]) -> None:
+    """Write a copy of the test descriptors with the tree numbers of some descriptors replaced."""
+    with gzip.open(TEST_DESCRIPTORS_PATH, 'rt') as file:
+        xml = file.read()
+
+    records = re.split(r'(?=<DescriptorRecord )', xml)
+    for i, record in enumerate(records):
+        match = re.search(r'<DescriptorUI>(\w+)</DescriptorUI>', record)
+        if match is None or match.group(1) not in descriptor_trees:
+            continue
+        tree_numbers = ''.join(
+            f'<TreeNumber>{tree_number}</TreeNumber>'
+            for tree_number in descriptor_trees[match.group(1)]
+        )
+        records[i] = re.sub(
+            r'<TreeNumberList>.*?</TreeNumberList>',
+            f'<TreeNumberList>{tree_numbers}</TreeNumberList>',
+            record,
+            flags=re.DOTALL,
+        )
+
+    with gzip.open(path, 'wt') as file:
+        file.write(''.join(records))
+
+
+class HierarchyCacheClass(TemporaryCacheClass):
+    """A test case with test data where some descriptors are above others."""
+
+    @classmethod
+    def populate(cls):
+        """Populate the database with test data rewritten into a hierarchy."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'desc.gz')
+            make_release(path, HIERARCHY)
+            cls.manager.populate(descriptors_path=path, supplement_path=TEST_SUPPLEMENT_PATH)
+
+
+def _get_uis(descriptors) -> List[str]:
+    return [descriptor.descriptor_ui for descriptor in descriptors]
+
+
+class TestClosure(HierarchyCacheClass):
+    """Tests for the transitive closure of the hierarchy."""
+
+    def test_iter_closure(self):
+        """Test that the smallest depth is kept for descriptors related through several tree numbers."""
+        tree_descriptor = {'A': 1, 'A.B': 2, 'A.B.C': 3, 'A.C': 3}
+        self.assertEqual(
+            {(1, 1, 0), (2, 2, 0), (3, 3, 0), (1, 2, 1), (1, 3, 1), (2, 3, 1)},
+            set(iter_closure(tree_descriptor)),
+        )
+
+    def test_queries(self):
+        """Test getting ancestors and descendants."""
+        self.assertEqual(['D000006', 'D000001'], _get_uis(self.manager.get_descendants('D000005')))
+        self.assertEqual(['D000006'], _get_uis(self.manager.get_descendants('D000005', max_depth=1)))
+        self.assertEqual(
+            ['D000005', 'D000006', 'D000001'],
+            _get_uis(self.manager.get_descendants('D000005', include_self=True)),
+        )
+        self.assertEqual(['D000004', 'D000001', 'D000002'], _get_uis(self.manager.get_descendants('D000006')))
+        self.assertEqual(['D000006', 'D000005'], _get_uis(self.manager.get_ancestors('D000001')))
+        self.assertEqual([], self.manager.get_ancestors('D000005'))
+
+        self.assertTrue(self.manager.is_descendant('D000001', 'D000005'))
+        self.assertTrue(self.manager.is_descendant('D000001', 'D000001'))
+        self.assertFalse(self.manager.is_descendant('D000005', 'D000001'))
+        self.assertFalse(self.manager.is_descendant('D000002', 'D000005'))
+
+
+class TestClosureRefresh(HierarchyCacheClass):
+    """Tests for refreshing the closure when updating."""
+
+    def _get_closure(self):
+        return {
+            (closure.ancestor.descriptor_ui, closure.descendant.descriptor_ui, closure.depth)
+            for closure in self.manager.session.query(DescriptorClosure)
+        }
+
+    def test_refresh(self):
+        """Test that updating the database refreshes the closure like building it from scratch would."""
+        trees = dict(HIERARCHY, D000001=['D03'], D000003=['C23.888.100'])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'desc.gz')
+            make_release(path, trees)
+            counts = self.manager.update(descriptors_path=path, supplement_path=TEST_SUPPLEMENT_PATH)
+        self.assertEqual(2, counts['updated'])
+
+        self.assertEqual(['D000006'], _get_uis(self.manager.get_descendants('D000005')))
+        self.assertEqual([], self.manager.get_ancestors('D000001'))
+        self.assertEqual(['D000002', 'D000006'], _get_uis(self.manager.get_ancestors('D000003')))
+
+        refreshed = self._get_closure()
+        self.manager.session.expire_all()
+        build_closure(self.manager.session)
+        self.assertEqual(self._get_closure(), refreshed)
+
+
+class TestTreeKeys(HierarchyCacheClass):
+    """Tests for range scans over tree keys."""
+
+    def test_tree_key(self):
+        """Test that tree keys sort hierarchically."""
+        tree_numbers = ['C10.228.140', 'C10', 'C10.228', 'C10.1', 'C10.228.140.1', 'C11', 'C10.229']
+        self.assertEqual(
+            ['C10', 'C10.1', 'C10.228', 'C10.228.140', 'C10.228.140.1', 'C10.229', 'C11'],
+            sorted(tree_numbers, key=get_tree_key),
+        )
+        self.assertEqual(0, get_tree_depth('C'))
+        self.assertEqual(3, get_tree_depth('C10.228.140'))
+
+    def test_tree_key_range(self):
+        """Test that the bounds of subtrees only use digits and letters and contain exactly the subtree."""
+        keys = [
+            get_tree_key(tree_number)
+            for tree_number in ('C10', 'C10.228', 'C10.229', 'C10.229.1', 'C10.23A', 'C10.999', 'C11', 'Z01', 'Z01.1')
+        ]
+        for tree_number in ('C10', 'C10.229', 'C10.999', 'Z', 'Z01'):
+            lower, upper = get_tree_key_range(tree_number)
+            self.assertTrue(set(upper or '').issubset(TREE_KEY_ALPHABET))
+            self.assertEqual(
+                [key for key in keys if key.startswith(lower)],
+                [key for key in keys if lower <= key and (upper is None or key < upper)],
+            )
+        self.assertRaises(ValueError, get_tree_key_range, 'c10')
+
+    def test_subtree(self):
+        """Test getting the tree numbers and descriptors in a subtree."""
+        self.assertEqual(
+            ['A01', 'A01.047', 'A01.047.100'],
+            [tree.name for tree in self.manager.get_subtree_trees('A01')],
+        )
+        self.assertEqual(['A01', 'A01.047'], [tree.name for tree in self.manager.get_subtree_trees('A', max_depth=2)])
+        self.assertEqual(['D000005', 'D000006', 'D000001'], _get_uis(self.manager.get_subtree_descriptors('A')))
+        self.assertEqual(['D000006', 'D000004', 'D000002'], _get_uis(self.manager.get_subtree_descriptors('C23')))
+        self.assertEqual([], self.manager.get_subtree_trees('A02'))
+
+    def test_children_and_siblings(self):
+        """Test getting the tree numbers directly below a tree number and next to it."""
+        self.assertEqual(['A01.047'], [tree.name for tree in self.manager.get_tree_children('A01')])
+        self.assertEqual(['C23.100', 'C23.888'], [tree.name for tree in self.manager.get_tree_children('C23')])
+        self.assertEqual([], self.manager.get_tree_children('C23.888'))
+        self.assertEqual(['A01'], [tree.name for tree in self.manager.get_tree_children('A')])
+
+        self.assertEqual(['C23.100'], [tree.name for tree in self.manager.get_tree_siblings('C23.888')])
+        self.assertEqual([], self.manager.get_tree_siblings('A01'))
+
+
+class TestSimilarity(HierarchyCacheClass):
+    """Tests for semantic similarity."""
+
+    def test_similarity(self):
+        """Test the measures against values calculated by hand."""
+        similarity = self.manager.get_semantic_similarity()
+        self.assertEqual({'D000001', 'D000002', 'D000003', 'D000004', 'D000005', 'D000006'},
+                         set(similarity.descriptor_uis))
+
+        # Abdomen, Acute is above 4 of the 6 descriptors with tree numbers
+        self.assertAlmostEqual(math.log(6 / 4), similarity.similarity('D000001', 'D000002', method='resnik'))
+        self.assertAlmostEqual(
+            2 * math.log(6 / 4) / (2 * math.log(6)),
+            similarity.similarity('D000001', 'D000002', method='lin'),
+        )
+        self.assertAlmostEqual(1.0, similarity.similarity('D000001', 'D000001', method='lin'))
+        self.assertEqual(0.0, similarity.similarity('D000001', 'D000003', method='lin'))
+
+        # Calcimycin has values 1, 0.8, and 0.64 and Temefos has 1 and 0.8. They share Abdomen, Acute
+        self.assertAlmostEqual(1.6 / 4.24, similarity.similarity('D000001', 'D000002', method='wang'))
+        self.assertAlmostEqual(1.0, similarity.similarity('D000001', 'D000001', method='wang'))
+
+        with self.assertRaises(ValueError):
+            similarity.similarity('D000001', 'D000002', method='nope')
+
+    def test_batches(self):
+        """Test that batched similarities match calculating each pair and the naive version."""
+        similarity = self.manager.get_semantic_similarity()
+        uis = similarity.descriptor_uis
+        pairs = [(a, b) for a in uis for b in uis]
+
+        for method in METHODS:
+            matrix = similarity.pairwise(uis, method=method)
+            values = similarity.pairs(pairs, method=method)
+            for (a, b), value in zip(pairs, values):
+                expected = similarity.similarity(a, b, method=method)
+                self.assertAlmostEqual(expected, value)
+                self.assertAlmostEqual(expected, matrix[uis.index(a), uis.index(b)])
+
+        self.assertAlmostEqual(0.0, benchmark_similarity(similarity, pairs)['difference'])
+
+
+class TestHierarchySnapshot(HierarchyCacheClass):
+    """Tests for the array-backed snapshot of the hierarchy."""
+
+    def _check(self, hierarchy):
+        self.assertEqual(6, len(hierarchy))
+
+        abdomen, acute = hierarchy.get_index('D000005'), hierarchy.get_index('D000006')
+        calcimycin = hierarchy.get_index('D000001')
+        self.assertEqual('D000006', hierarchy.get_ui(acute))
+        self.assertEqual('Abdomen, Acute', hierarchy.get_name(acute))
+        self.assertEqual([abdomen], hierarchy.get_parents(acute).tolist())
+        self.assertEqual([acute], hierarchy.get_parents(calcimycin).tolist())
+        self.assertEqual([], hierarchy.get_parents(abdomen).tolist())
+        self.assertEqual(
+            {'D000001', 'D000002', 'D000004'},
+            {hierarchy.get_ui(child) for child in hierarchy.get_children(acute)},
+        )
+        self.assertEqual(['A01.047', 'C23'], hierarchy.get_tree_numbers(acute))
+
+        self.assertEqual(
+            {'D000005', 'D000006', 'D000001'},
+            {hierarchy.get_ui(i) for i in hierarchy.get_subtree('A')},
+        )
+        self.assertEqual(
+            {'D000006', 'D000004', 'D000002'},
+            {hierarchy.get_ui(i) for i in hierarchy.get_subtree('C23')},
+        )
+        self.assertEqual(0, len(hierarchy.get_subtree('A02')))
+
+        for i in range(len(hierarchy)):
+            descriptor = self.manager.get_descriptor_by_ui(hierarchy.get_ui(i))
+            self.assertEqual(
+                [tree.name for tree in sorted(descriptor.trees, key=lambda tree: tree.tree_key)],
+                hierarchy.get_tree_numbers(i),
+            )
+            self.assertEqual(
+                [category for category in CATEGORIES if getattr(descriptor, f'is_{category}')],
+                hierarchy.get_categories(i),
+            )
+        for category in CATEGORIES:
+            self.assertEqual(
+                [category in hierarchy.get_categories(i) for i in range(len(hierarchy))],
+                hierarchy.get_category_mask(category).tolist(),
+            )
+
+    def test_snapshot(self):
+        """Test the snapshot built from the database."""
+        self._check(self.manager.get_hierarchy())
+
+    def test_save_load(self):
+        """Test that a saved snapshot is memory-mapped and answers the same."""
+        with tempfile.TemporaryDirectory() as directory:
+            hierarchy = self.manager.get_hierarchy(directory=directory)
+            self.assertIsInstance(hierarchy.child_indices, np.memmap)
+            self._check(hierarchy)
+
+    def test_outdated(self):
+        """Test that a saved snapshot is replaced once the database changes."""
+        with tempfile.TemporaryDirectory() as parent:
+            directory = os.path.join(parent, 'hierarchy')
+            self.manager.get_hierarchy(directory=directory)
+            self.assertEqual(get_database_fingerprint(self.manager.session), Hierarchy.get_fingerprint(directory))
+
+            with mock.patch('bio2bel_mesh.manager.get_database_fingerprint', return_value='changed'):
+                hierarchy = self.manager.get_hierarchy(directory=directory)
+            self.assertEqual('changed', Hierarchy.get_fingerprint(directory))
+            self._check(hierarchy)
+            self.assertEqual(['hierarchy'], os.listdir(parent))
+
+            # snapshots saved by older versions are missing arrays
+            os.remove(os.path.join(directory, 'tree_indptr.npy'))
+            self.assertIsNone(Hierarchy.get_fingerprint(directory))
+            self._check(self.manager.get_hierarchy(directory=directory))
+
+
+class TestExport(HierarchyCacheClass):
+    """Tests for exporting the hierarchy to BEL."""
+
+    def _get_expected_edges(self):
+        tree_bel = {
+            tree.name: descriptor.to_bel()
+            for descriptor, tree in self.manager.session.query(Descriptor, Tree).join(Tree)
+            if descriptor.to_bel() is not None
+        }
+        return {
+            (child_bel, tree_bel[tree_name.rsplit('.', 1)[0]])
+            for tree_name, child_bel in tree_bel.items()
+            if '.' in tree_name and tree_name.rsplit('.', 1)[0] in tree_bel
+        }
+
+    def test_to_bel(self):
+        """Test that the graph has the same is-a relations as converting each descriptor."""
+        graph = self.manager.to_bel(use_cache=False)
+        expected = self._get_expected_edges()
+        self.assertLess(0, len(expected))
+        self.assertEqual(expected, set(graph.edges()))
+
+    def test_cache(self):
+        """Test that the graph is cached until the database changes."""
+        with tempfile.TemporaryDirectory() as directory:
+            cache_path = os.path.join(directory, 'hierarchy.bel.pickle')
+            graph = self.manager.to_bel(cache_path=cache_path)
+            self.assertTrue(os.path.exists(cache_path))
+
+            fingerprint = get_database_fingerprint(self.manager.session)
+            with mock.patch('bio2bel_mesh.export._build_hierarchy_graph') as build:
+                cached = self.manager.to_bel(cache_path=cache_path)
+            build.assert_not_called()
+            self.assertEqual(set(graph.edges()), set(cached.edges()))
+
+            path = os.path.join(directory, 'desc.gz')
+            make_release(path, dict(HIERARCHY, D000002=['C23.888', 'D03.100']))
+            self.manager.update(descriptors_path=path, supplement_path=TEST_SUPPLEMENT_PATH)
+            self.assertNotEqual(fingerprint, get_database_fingerprint(self.manager.session))
+
+            updated = self.manager.to_bel(cache_path=cache_path)
+            self.assertEqual(self._get_expected_edges(), set(updated.edges()))
+            self.assertNotEqual(set(graph.edges()), set(updated.edges()))
+
+    def test_invalid_cache(self):
+        """Test that a cache that can't be read is rebuilt."""
+        with tempfile.TemporaryDirectory() as directory:
+            cache_path = os.path.join(directory, 'hierarchy.bel.pickle')
+            graph = self.manager.to_bel(cache_path=cache_path)
+            with open(cache_path, 'rb') as file:
+                content = file.read()
+
+            for invalid in (content[:len(content) // 2], b'nope', b'cbuiltins\nnope\n.', b'cmissing\nGraph\n.'):
+                with open(cache_path, 'wb') as file:
+                    file.write(invalid)
+                self.assertEqual(set(graph.edges()), set(self.manager.to_bel(cache_path=cache_path).edges()))
+
+    def test_cache_path(self):
+        """Test that each database gets its own cache and ones without a fingerprint aren't cached."""
+        self.assertNotEqual(get_bel_cache_path('sqlite:///a.db'), get_bel_cache_path('sqlite:///b.db'))
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache_path = os.path.join(directory, 'hierarchy.bel.pickle')
+            with mock.patch('bio2bel_mesh.export.get_database_fingerprint', return_value=None):
+                self.manager.to_bel(cache_path=cache_path)
+            self.assertFalse(os.path.exists(cache_path))
+
+    def test_stream(self):
+        """Test streaming the relations in subtrees."""
+        graph = self.manager.to_bel(use_cache=False)
+        self.assertEqual(set(graph.edges()), set(self.manager.iter_hierarchy_edges(['A', 'C', 'D'])))
+        self.assertFalse(any(u == v for u, v in graph.edges()))
+        self.assertEqual(
+            {('D000004', 'D000006'), ('D000002', 'D000006')},
+            {
+                (child.identifier, parent.identifier)
+                for child, parent in self.manager.iter_hierarchy_edges(['C23'])
+            },
+        )
+        self.assertEqual([], list(self.manager.iter_hierarchy_edges(['C23.888'])))
+        self.assertEqual([], list(self.manager.iter_hierarchy_edges(['C'], categories=['process'])))
+        with self.assertRaises(ValueError):
+            self.manager.iter_hierarchy_edges(['C'], categories=['anatomy'])
+
+    def test_write(self):
+        """Test writing the streamed relations to a BEL script and to JSON lines."""
+        expected = set(self.manager.iter_hierarchy_edges(['C']))
+
+        file = io.StringIO()
+        self.assertEqual(len(expected), self.manager.export_hierarchy(file, ['C'], fmt='bel'))
+        graph = from_lines(file.getvalue().splitlines())
+        self.assertEqual(
+            {(child.as_bel(), parent.as_bel()) for child, parent in expected},
+            {(u.as_bel(), v.as_bel()) for u, v in graph.edges()},
+        )
+
+        file = io.StringIO()
+        self.assertEqual(len(expected), self.manager.export_hierarchy(file, ['C'], fmt='jsonl'))
+        self.assertEqual(
+            {(child.identifier, parent.identifier) for child, parent in expected},
+            {
+                (data['source']['identifier'], data['target']['identifier'])
+                for data in map(json.loads, file.getvalue().splitlines())
+            },
+        )
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the parsers in Bio2BEL MeSH."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from bio2bel_mesh.parsers import (
+    get_descriptor_record, get_descriptor_records, get_supplementary_record, get_supplementary_records,
+)
+from bio2bel_mesh.parsers.cache import is_records_cache_valid, iter_records_cache, iter_write_records_cache
+from tests.constants import TEST_DESCRIPTORS_PATH, TEST_SUPPLEMENT_PATH
+
+
+class TestParsers(unittest.TestCase):
+    """Tests for the parsers."""
+
+    def test_stream_descriptors(self):
+        """Test that streaming the descriptors gives the same records as parsing the whole tree."""
+        records = get_descriptor_records(path=TEST_DESCRIPTORS_PATH)
+        streamed = get_descriptor_records(path=TEST_DESCRIPTORS_PATH, stream=True)
+        self.assertNotIsInstance(streamed, list)
+        self.assertEqual(records, list(streamed))
+
+    def test_stream_supplement(self):
+        """Test that streaming the supplementary records gives the same records as parsing the whole tree."""
+        records = get_supplementary_records(path=TEST_SUPPLEMENT_PATH)
+        streamed = get_supplementary_records(path=TEST_SUPPLEMENT_PATH, stream=True)
+        self.assertEqual(records, list(streamed))
+
+    def test_parallel_descriptors(self):
+        """Test that converting descriptors across processes keeps their order and parents."""
+        records = get_descriptor_records(path=TEST_DESCRIPTORS_PATH)
+        parallel = get_descriptor_records(path=TEST_DESCRIPTORS_PATH, workers=2)
+        self.assertEqual(records, parallel)
+        for record in records:
+            self.assertEqual(sorted(record['tree_numbers']), record['tree_numbers'])
+
+    def test_parallel_supplement(self):
+        """Test that converting supplementary records across processes keeps their order."""
+        records = get_supplementary_records(path=TEST_SUPPLEMENT_PATH)
+        parallel = get_supplementary_records(path=TEST_SUPPLEMENT_PATH, workers=2)
+        self.assertEqual(records, parallel)
+
+
+class TestRecordsCache(unittest.TestCase):
+    """Tests for the binary records cache."""
+
+    def setUp(self):
+        """Make a temporary directory with a copy of the test descriptors."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.source_path = os.path.join(self.directory.name, 'desc.gz')
+        shutil.copyfile(TEST_DESCRIPTORS_PATH, self.source_path)
+        self.cache_path = os.path.join(self.directory.name, 'desc.records')
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        """Test that records are cached and streamed back unchanged."""
+        records = get_descriptor_records(path=self.source_path)
+        self.assertFalse(is_records_cache_valid(self.cache_path, self.source_path))
+
+        self.assertEqual(records, list(iter_write_records_cache(self.cache_path, records, self.source_path)))
+        self.assertTrue(is_records_cache_valid(self.cache_path, self.source_path))
+        self.assertEqual(records, list(iter_records_cache(self.cache_path)))
+
+        # touching the source doesn't invalidate the cache since its contents are the same
+        os.utime(self.source_path, ns=(0, 0))
+        self.assertTrue(is_records_cache_valid(self.cache_path, self.source_path))
+
+        shutil.copyfile(TEST_SUPPLEMENT_PATH, self.source_path)
+        self.assertFalse(is_records_cache_valid(self.cache_path, self.source_path))
+
+
+class TestRecordIndex(unittest.TestCase):
+    """Tests for getting single records through the random-access index."""
+
+    def setUp(self):
+        """Make a temporary directory with copies of the test data, in which the indexes get built."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.descriptors_path = os.path.join(self.directory.name, 'desc.gz')
+        shutil.copyfile(TEST_DESCRIPTORS_PATH, self.descriptors_path)
+        self.supplement_path = os.path.join(self.directory.name, 'supp.gz')
+        shutil.copyfile(TEST_SUPPLEMENT_PATH, self.supplement_path)
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.directory.cleanup()
+
+    def test_descriptor(self):
+        """Test getting single descriptors."""
+        for record in get_descriptor_records(path=self.descriptors_path):
+            indexed = get_descriptor_record(record['descriptor_ui'], path=self.descriptors_path)
+            self.assertEqual({k: v for k, v in record.items() if k != 'parents'}, indexed)
+
+        self.assertIsNone(get_descriptor_record('D999999', path=self.descriptors_path))
+        self.assertIsNone(get_descriptor_record('A', path=self.descriptors_path))
+
+    def test_supplement(self):
+        """Test getting single supplementary records."""
+        for record in get_supplementary_records(path=self.supplement_path):
+            self.assertEqual(record, get_supplementary_record(record['descriptor_ui'], path=self.supplement_path))
+
+        self.assertIsNone(get_supplementary_record('Z', path=self.supplement_path))
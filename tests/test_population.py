@@ -2,7 +2,30 @@
 
 """Tests for Bio2BEL MeSH."""
 
+import io
+import os
+import tempfile
+import unittest
+from collections import Counter
+from unittest import mock
+
+from sqlalchemy import create_engine, event, inspect
+
+from bio2bel.manager.namespace_manager import BELNamespaceManagerMixin
+from bio2bel_mesh import Manager
+from bio2bel_mesh.bulk import BulkLoader, prefetch_records, sqlite_fast_load
+from bio2bel_mesh.categories import get_bel_encoding, get_categories, get_category_mask, get_mask
+from bio2bel_mesh.fuzzy import TrigramIndex, get_trigrams
+from bio2bel_mesh.lookup import LookupCache, MISSING
+from bio2bel_mesh.models import CONCEPT_TABLE_NAME, DESCRIPTOR_TABLE_NAME, Descriptor, Term, Tree
+from bio2bel_mesh.search import has_search_index, search_terms
+from bio2bel_mesh.tagger import Mention, Tagger
+from bio2bel_mesh.utils import normalize_name
+from pybel import BELGraph, from_json_path, from_pickle, to_json_path, to_pickle
+from pybel.dsl import abundance
+from pybel.manager.models import Edge, NamespaceEntry, Node, edge_annotation
 from tests.cases import TemporaryCacheClass
+from tests.constants import TEST_DESCRIPTORS_PATH, TEST_SUPPLEMENT_PATH
 
 
 class TestPopulation(TemporaryCacheClass):
@@ -11,3 +34,640 @@ class TestPopulation(TemporaryCacheClass):
     def test_counts(self):
         """Test the right number of things are added."""
         self.assertEqual(11, self.manager.count_descriptors())
+        self.assertEqual(15, self.manager.count_concepts())
+        self.assertEqual(34, self.manager.count_terms())
+        self.assertEqual(11, self.manager.session.query(Tree).count())
+
+    def test_reset_sequences(self):
+        """Test that sequences are moved past the assigned primary keys on PostgreSQL."""
+        session = self.manager.session
+        loader = BulkLoader(session, ui_descriptor_id={}, ui_concept_id={}, term_uis=set())
+        with mock.patch.object(session.get_bind().dialect, 'name', 'postgresql'), \
+                mock.patch.object(session, 'execute') as execute:
+            loader.load([])
+
+        statements = [str(call[0][0]) for call in execute.call_args_list]
+        self.assertEqual(2, len(statements))
+        for table_name, statement in zip((DESCRIPTOR_TABLE_NAME, CONCEPT_TABLE_NAME), statements):
+            self.assertIn(f"pg_get_serial_sequence('{table_name}', 'id')", statement)
+            self.assertIn(f'MAX(id) FROM {table_name}', statement)
+
+        with mock.patch.object(session, 'execute') as execute:
+            loader.load([])
+        execute.assert_not_called()
+
+
+class TestBatchedPopulation(TemporaryCacheClass):
+    """Tests for population of the database with batches smaller than the number of records."""
+
+    @classmethod
+    def populate(cls):
+        """Populate the database with test data, committing every two records."""
+        cls.manager.populate(
+            descriptors_path=TEST_DESCRIPTORS_PATH,
+            supplement_path=TEST_SUPPLEMENT_PATH,
+            batch_size=2,
+        )
+
+    def test_counts(self):
+        """Test the right number of things are added."""
+        self.assertEqual(11, self.manager.count_descriptors())
+        self.assertEqual(15, self.manager.count_concepts())
+        self.assertEqual(34, self.manager.count_terms())
+
+    def test_relationships(self):
+        """Test that foreign keys are resolved to the right descriptors."""
+        term = self.manager.get_term_by_name('A-23187')
+        self.assertIsNotNone(term)
+        self.assertEqual('D000001', term.concept.descriptor.descriptor_ui)
+
+
+class TestRepopulation(TemporaryCacheClass):
+    """Tests for populating records that are already in the database."""
+
+    def test_deduplicate(self):
+        """Test that loading the same records again doesn't add anything."""
+        self.manager._populate_descriptors(path=TEST_DESCRIPTORS_PATH)
+        self.manager._populate_supplement(path=TEST_SUPPLEMENT_PATH)
+        self.assertEqual(11, self.manager.count_descriptors())
+        self.assertEqual(15, self.manager.count_concepts())
+        self.assertEqual(34, self.manager.count_terms())
+
+
+class TestFastPopulation(TemporaryCacheClass):
+    """Tests for population of the database in the SQLite fast-load mode."""
+
+    @classmethod
+    def populate(cls):
+        """Populate the database with test data while deferring indexes."""
+        cls.manager.populate(
+            descriptors_path=TEST_DESCRIPTORS_PATH,
+            supplement_path=TEST_SUPPLEMENT_PATH,
+            fast=True,
+        )
+
+    def test_counts(self):
+        """Test the right number of things are added."""
+        self.assertEqual(11, self.manager.count_descriptors())
+        self.assertEqual(15, self.manager.count_concepts())
+        self.assertEqual(34, self.manager.count_terms())
+
+    def _assert_indexes(self):
+        index_names = {
+            name
+            for name, in self.manager.session.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+        }
+        for table in self.manager._metadata.sorted_tables:
+            for index in table.indexes:
+                self.assertIn(index.name, index_names)
+
+    def test_indexes(self):
+        """Test that the indexes are rebuilt after loading."""
+        self._assert_indexes()
+
+    def test_failed_load(self):
+        """Test that a failed load is rolled back and the indexes and pragmas are restored."""
+        session = self.manager.session
+        synchronous = session.execute('PRAGMA synchronous').scalar()
+
+        with self.assertRaises(ValueError):
+            with sqlite_fast_load(session, self.manager._metadata.sorted_tables):
+                session.execute(Descriptor.__table__.delete())
+                raise ValueError
+
+        self.assertEqual(11, self.manager.count_descriptors())
+        self.assertEqual(synchronous, session.execute('PRAGMA synchronous').scalar())
+        self._assert_indexes()
+
+
+class TestPipelinedPopulation(TemporaryCacheClass):
+    """Tests for population of the database while parsing in the background."""
+
+    @classmethod
+    def populate(cls):
+        """Populate the database with test data through bounded queues."""
+        cls.manager.populate(
+            descriptors_path=TEST_DESCRIPTORS_PATH,
+            supplement_path=TEST_SUPPLEMENT_PATH,
+            stream=True,
+            batch_size=2,
+            pipeline=True,
+        )
+
+    def test_counts(self):
+        """Test the right number of things are added."""
+        self.assertEqual(11, self.manager.count_descriptors())
+        self.assertEqual(15, self.manager.count_concepts())
+        self.assertEqual(34, self.manager.count_terms())
+
+    def test_close(self):
+        """Test that closing a prefetcher whose records weren't consumed stops its thread."""
+        prefetcher = prefetch_records(lambda: ({'i': i} for i in range(100)), batch_size=1, maxsize=1)
+        prefetcher.close()
+        prefetcher.thread.join(timeout=5)
+        self.assertFalse(prefetcher.thread.is_alive())
+
+
+class TestLookup(TemporaryCacheClass):
+    """Tests for looking up models."""
+
+    def test_get_descriptor(self):
+        """Test looking up descriptors one at a time and in batches."""
+        descriptor = self.manager.get_descriptor_by_ui('D000001')
+        self.assertIsNotNone(descriptor)
+        self.assertEqual('Calcimycin', descriptor.name)
+        self.assertEqual(descriptor, self.manager.get_descriptor_by_name('Calcimycin'))
+        self.assertIsNone(self.manager.get_descriptor_by_ui('D999999'))
+
+        descriptors = self.manager.get_descriptors_by_uis(['D000001', 'D000002', 'D999999'])
+        self.assertEqual({'D000001', 'D000002'}, set(descriptors))
+        self.assertEqual(descriptor, descriptors['D000001'])
+
+        descriptors = self.manager.get_descriptors_by_names(['Calcimycin', 'Abdomen', 'nope'])
+        self.assertEqual({'Calcimycin', 'Abdomen'}, set(descriptors))
+
+    def test_get_concepts(self):
+        """Test looking up concepts in batches."""
+        concepts = self.manager.get_concepts_by_uis(['M0000001', 'M0353609', 'M9999999'])
+        self.assertEqual({'M0000001', 'M0353609'}, set(concepts))
+        self.assertEqual(concepts['M0000001'], self.manager.get_concept_by_ui('M0000001'))
+
+    def test_get_terms(self):
+        """Test looking up terms in batches."""
+        terms = self.manager.get_terms_by_names(['A-23187', 'Calcimycin', 'nope'])
+        self.assertEqual({'A-23187', 'Calcimycin'}, set(terms))
+        self.assertEqual('D000001', terms['A-23187'].concept.descriptor.descriptor_ui)
+
+        terms = self.manager.get_terms_by_uis(['T000001', 'T999999'])
+        self.assertEqual({'T000001'}, set(terms))
+        self.assertEqual(terms['T000001'], self.manager.get_term_by_ui('T000001'))
+
+    def test_get_term_by_duplicated_name(self):
+        """Test that the first term loaded is used when several have the same name."""
+        term = self.manager.get_term_by_name('A-23187')
+        duplicate = Term(term_ui='T999999', name='A-23187', concept_id=term.concept_id)
+        self.manager.session.add(duplicate)
+        self.manager.session.commit()
+        try:
+            self.assertEqual(term, self.manager.get_term_by_name('A-23187'))
+            self.assertEqual(term, self.manager.get_terms_by_names(['A-23187'])['A-23187'])
+        finally:
+            self.manager.session.delete(duplicate)
+            self.manager.session.commit()
+
+    def test_get_by_normalized_name(self):
+        """Test looking up descriptors and terms ignoring case and punctuation."""
+        self.assertEqual('a 23187', normalize_name('A-23187'))
+        self.assertEqual('alzheimer disease', normalize_name("Alzheimer's  Disease"))
+
+        term = self.manager.get_term_by_normalized_name('a 23187')
+        self.assertIsNotNone(term)
+        self.assertEqual('A-23187', term.name)
+        self.assertIsNone(self.manager.get_term_by_normalized_name('nope'))
+
+        descriptor = self.manager.get_descriptor_by_normalized_name(' CALCIMYCIN ')
+        self.assertIsNotNone(descriptor)
+        self.assertEqual('D000001', descriptor.descriptor_ui)
+
+        terms = self.manager.get_terms_by_normalized_names(['a_23187', 'A 23187', 'nope'])
+        self.assertEqual({'a_23187', 'A 23187'}, set(terms))
+        self.assertEqual(term, terms['a_23187'])
+
+        descriptors = self.manager.get_descriptors_by_normalized_names(['calcimycin', 'nope'])
+        self.assertEqual({'calcimycin': descriptor}, descriptors)
+
+
+class TestLookupCache(TemporaryCacheClass):
+    """Tests for caching node look-ups."""
+
+    def test_look_up_node(self):
+        """Test that hits and misses are cached and that populating clears the cache."""
+        self.manager.clear_lookup_cache()
+        cache = self.manager.lookup_cache
+        hits, misses = cache.hits, cache.misses
+
+        node = abundance(namespace='MESH', name='Calcimycin')
+        missing_node = abundance(namespace='MESH', name='nope')
+
+        for _ in range(2):
+            self.assertEqual('D000001', self.manager.look_up_node(node).descriptor_ui)
+            self.assertIsNone(self.manager.look_up_node(missing_node))
+
+        self.assertIsNone(self.manager.look_up_node(abundance(namespace='CHEBI', name='nope')))
+        self.assertEqual(2, len(cache))
+        self.assertEqual(2, cache.hits - hits)
+        self.assertEqual(2, cache.misses - misses)
+
+        self.manager.populate(descriptors_path=TEST_DESCRIPTORS_PATH, supplement_path=TEST_SUPPLEMENT_PATH)
+        self.assertEqual(0, len(cache))
+
+    def test_commit(self):
+        """Test that cached look-ups don't query the database again after a commit."""
+        self.manager.clear_lookup_cache()
+        nodes = [abundance(namespace='MESH', name='Calcimycin'), abundance(namespace='MESH', identifier='D000005')]
+        statements = []
+
+        def count(*_):
+            statements.append(1)
+
+        self.assertEqual(
+            {'D000001', 'D000005'},
+            {descriptor_ui for descriptor_ui, _ in self.manager.look_up_node_names(nodes).values()},
+        )
+        self.manager.session.commit()
+
+        event.listen(self.manager.engine, 'before_cursor_execute', count)
+        try:
+            node_ui_name = self.manager.look_up_node_names(nodes)
+        finally:
+            event.remove(self.manager.engine, 'before_cursor_execute', count)
+
+        self.assertEqual([], statements)
+        self.assertEqual(('D000001', 'Calcimycin'), node_ui_name[nodes[0]])
+
+    def test_eviction(self):
+        """Test that the least recently used entries are evicted."""
+        cache = LookupCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', None)
+        self.assertEqual(1, cache.get('a'))
+        cache.set('c', 3)
+        self.assertIs(MISSING, cache.get('b'))
+        self.assertEqual(3, cache.get('c'))
+        self.assertEqual(1, cache.evictions)
+        self.assertEqual(2, len(cache))
+
+
+class TestSearch(TemporaryCacheClass):
+    """Tests for searching terms."""
+
+    def test_full_text(self):
+        """Test that the full-text index is built while populating and supports prefixes."""
+        self.assertTrue(has_search_index(self.manager.session))
+
+        terms = self.manager.search_terms('calcimy')
+        self.assertEqual(['Calcimycin'], [term.name for term in terms][:1])
+
+        terms = self.manager.search_terms('23187 a')
+        self.assertIn('A-23187', [term.name for term in terms])
+
+        self.assertEqual([], self.manager.search_terms('nope'))
+        self.assertEqual([], self.manager.search_terms(' - '))
+        self.assertEqual(1, len(self.manager.search_terms('a', limit=1)))
+
+    def test_prefix(self):
+        """Test the fallback for backends without full-text search."""
+        terms = search_terms(self.manager.session, 'A-231', full_text=False)
+        self.assertEqual({'A-23187', 'A 23187'}, {term.name for term in terms})
+        self.assertEqual([], search_terms(self.manager.session, '23187', full_text=False))
+
+    def test_descriptors_loaded(self):
+        """Test that the concepts and descriptors of the terms found are loaded with them."""
+        for full_text in (True, False):
+            self.manager.session.expire_all()
+            terms = search_terms(self.manager.session, 'a', full_text=full_text)
+            self.assertLess(0, len(terms))
+            for term in terms:
+                self.assertNotIn('concept', inspect(term).unloaded)
+                self.assertNotIn('descriptor', inspect(term.concept).unloaded)
+
+    def test_drop(self):
+        """Test that the full-text index is dropped with the tables and rebuilt when populating again."""
+        self.manager.drop_all()
+        self.manager.create_all()
+        self.assertFalse(has_search_index(self.manager.session))
+
+        manager = Manager(connection=self.manager.connection)
+        self.assertEqual([], manager.search_terms('calc'))
+        manager.session.close()
+
+        self.populate()
+        self.assertEqual(['Calcimycin'], [term.name for term in self.manager.search_terms('calcimy')][:1])
+
+    def test_deleted_term(self):
+        """Test that terms deleted after the full-text index was built are skipped."""
+        term_ids = {term.id for term in self.manager.search_terms('a 23187')}
+        self.assertLess(1, len(term_ids))
+        deleted_id = min(term_ids)
+        self.manager.session.execute(Term.__table__.delete().where(Term.id == deleted_id))
+        try:
+            self.assertEqual(term_ids - {deleted_id}, {term.id for term in self.manager.search_terms('a 23187')})
+        finally:
+            self.manager.session.rollback()
+
+
+class TestFuzzy(TemporaryCacheClass):
+    """Tests for fuzzy matching of names."""
+
+    def test_fuzzy_match(self):
+        """Test that misspelled names find their descriptors."""
+        matches = self.manager.fuzzy_match('Calcimicin')
+        self.assertLessEqual(1, len(matches))
+        descriptor, score = matches[0]
+        self.assertEqual('D000001', descriptor.descriptor_ui)
+        self.assertLess(0.3, score)
+        self.assertGreater(1.0, score)
+
+        descriptor, score = self.manager.fuzzy_match('calcimycin')[0]
+        self.assertEqual(1.0, score)
+
+        self.assertEqual([], self.manager.fuzzy_match('xyzzy'))
+
+    def test_fuzzy_match_nodes(self):
+        """Test that only the nodes that can't be looked up are fuzzy matched."""
+        graph = _make_graph()
+        misspelled = abundance(namespace='MESH', name='Calcimicin')
+        graph.add_node_from_data(misspelled)
+
+        node_matches = self.manager.fuzzy_match_nodes(graph)
+        self.assertEqual({misspelled, abundance(namespace='MESH', name='nope')}, set(node_matches))
+        self.assertEqual('D000001', node_matches[misspelled][0][0].descriptor_ui)
+
+    def test_index(self):
+        """Test that the prefix filter finds the same matches as comparing to every name."""
+        pairs = [(name, f'D{i}') for i, name in enumerate(['aspirin', 'asprin', 'aspartame', 'insulin', 'inulin'])]
+        index = TrigramIndex(pairs)
+        for query in ('aspirin', 'insulin', 'aspartam', 'spin'):
+            for threshold in (0.1, 0.3, 0.6):
+                expected = []
+                for name, descriptor_ui in pairs:
+                    a, b = get_trigrams(query), get_trigrams(name)
+                    score = len(a & b) / len(a | b)
+                    if threshold <= score:
+                        expected.append((descriptor_ui, score))
+                expected.sort(key=lambda item: (-item[1], item[0]))
+                self.assertEqual(expected, index.search(query, k=10, threshold=threshold))
+
+
+class TestTagger(unittest.TestCase):
+    """Tests for tagging MeSH terms in text."""
+
+    def test_tag(self):
+        """Test that the longest non-overlapping mentions are found."""
+        tagger = Tagger([
+            ('Alzheimer Disease', 'D1'),
+            ('Alzheimer Disease, Early Onset', 'D2'),
+            ('Disease', 'D3'),
+            ('Onset', 'D4'),
+        ])
+        text = "Early onset ALZHEIMER'S disease, early-onset. Alzheimer disease onset"
+        self.assertEqual(
+            [
+                Mention(start=6, end=11, text='onset', descriptor_ui='D4'),
+                Mention(start=12, end=44, text="ALZHEIMER'S disease, early-onset", descriptor_ui='D2'),
+                Mention(start=46, end=63, text='Alzheimer disease', descriptor_ui='D1'),
+                Mention(start=64, end=69, text='onset', descriptor_ui='D4'),
+            ],
+            tagger.tag(text),
+        )
+
+        # mentions don't span sentences
+        self.assertEqual(['D1', 'D4'], [mention.descriptor_ui for mention in tagger.tag('Alzheimer disease early. Onset')])
+
+
+class TestTagDocuments(TemporaryCacheClass):
+    """Tests for tagging documents with the terms in the database."""
+
+    def test_tag_documents(self):
+        """Test tagging with the terms in the database across worker processes."""
+        texts = ['Calcimycin is also known as A-23187.', 'Nothing here', 'temefos'] * 3
+        expected = [[mention.descriptor_ui for mention in self.manager.get_tagger().tag(text)] for text in texts]
+        self.assertEqual(['D000001', 'D000001'], expected[0])
+        self.assertEqual([], expected[1])
+
+        for workers in (1, 2):
+            mentions = list(self.manager.tag_documents(texts, workers=workers, batch_size=2))
+            self.assertEqual(expected, [[mention.descriptor_ui for mention in row] for row in mentions])
+
+
+def _make_graph() -> BELGraph:
+    graph = BELGraph()
+    graph.add_increases(
+        abundance(namespace='MESH', name='A-23187'),
+        abundance(namespace='MESH', name='Abdomen', identifier='D000005'),
+        citation='1234',
+        evidence='',
+    )
+    graph.add_node_from_data(abundance(namespace='MESH', name='nope'))
+    graph.add_node_from_data(abundance(namespace='CHEBI', name='nope'))
+    return graph
+
+
+class TestNormalization(TemporaryCacheClass):
+    """Tests for normalizing the MeSH nodes in BEL graphs."""
+
+    def test_normalize_terms(self):
+        """Test that nodes are resolved by name or identifier in bulk and relabeled."""
+        graph = _make_graph()
+
+        node_descriptor = self.manager.look_up_nodes(graph)
+        self.assertEqual(
+            {'D000001', 'D000005'},
+            {descriptor.descriptor_ui for descriptor in node_descriptor.values()},
+        )
+
+        counter = self.manager.normalize_terms(graph)
+        self.assertEqual(2, counter['MESH'])
+        self.assertIn(abundance(namespace='mesh', name='Calcimycin', identifier='D000001'), graph)
+        self.assertIn(abundance(namespace='MESH', name='nope'), graph)
+
+    def test_normalize_graphs(self):
+        """Test that normalizing in worker processes gives the same result as normalizing with the database."""
+        expected = _make_graph()
+        expected_counter = self.manager.normalize_terms(expected)
+
+        (graph, counter), = self.manager.normalize_graphs([_make_graph()], workers=1)
+        self.assertEqual(expected_counter, counter)
+        self.assertEqual(set(expected), set(graph))
+        self.assertEqual(expected.namespace_url, graph.namespace_url)
+
+    def test_normalize_graph_paths(self):
+        """Test normalizing graph files in worker processes."""
+        expected = _make_graph()
+        self.manager.normalize_terms(expected)
+
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, 'graph.json'), os.path.join(directory, 'graph.pickle')]
+            to_json_path(_make_graph(), paths[0])
+            to_pickle(_make_graph(), paths[1])
+
+            output_directory = os.path.join(directory, 'output')
+            counters = self.manager.normalize_graph_paths(paths, output_directory, workers=2)
+            self.assertEqual({path: Counter(MESH=2) for path in paths}, counters)
+
+            self.assertEqual(set(expected), set(from_json_path(os.path.join(output_directory, 'graph.json'))))
+            self.assertEqual(set(expected), set(from_pickle(os.path.join(output_directory, 'graph.pickle'))))
+
+    def test_normalize_graph_paths_collision(self):
+        """Test that graph files that would overwrite each other are rejected before any are written."""
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, 'a', 'graph.json'), os.path.join(directory, 'b', 'graph.json')]
+            for path in paths:
+                os.makedirs(os.path.dirname(path))
+                to_json_path(_make_graph(), path)
+
+            output_directory = os.path.join(directory, 'output')
+            with self.assertRaises(ValueError):
+                self.manager.normalize_graph_paths(paths, output_directory, workers=2)
+            self.assertFalse(os.path.exists(output_directory))
+
+
+class TestCategoryRules(unittest.TestCase):
+    """Tests for classifying tree numbers into categories."""
+
+    def test_rules(self):
+        """Test that the longest prefix wins for each tree number and that vetoes apply to the whole descriptor."""
+        for tree_names, categories, encoding in [
+            ([], [], 'ABCGMOPR'),
+            (['A01.047'], ['anatomy'], 'A'),
+            (['C23', 'F01'], ['pathology'], 'O'),
+            (['D05.100'], ['chemical'], 'A'),
+            (['D05.500.100'], ['complex'], 'C'),
+            (['D12.776.157', 'D03.383'], ['chemical', 'protein'], 'AGPR'),
+            (['E01'], ['measurement'], 'O'),
+            (['G03.495'], ['process'], 'B'),
+            (['G03.495', 'G01.100'], [], 'ABCGMOPR'),
+        ]:
+            with self.subTest(tree_names=tree_names):
+                mask = get_category_mask(tree_names)
+                self.assertEqual(categories, get_categories(mask))
+                self.assertEqual(encoding, get_bel_encoding(mask))
+
+        with self.assertRaises(ValueError):
+            get_mask(['nope'])
+
+
+class TestCategories(TemporaryCacheClass):
+    """Tests for classifying descriptors by their tree numbers."""
+
+    def test_columns(self):
+        """Test the category bitmask and encoding stored for each descriptor."""
+        for descriptor in self.manager.list_descriptors():
+            tree_names = [tree.name for tree in descriptor.trees]
+            self.assertEqual(get_category_mask(tree_names), descriptor.category_mask)
+            self.assertEqual(get_bel_encoding(descriptor.category_mask), descriptor.bel_encoding)
+            self.assertEqual(descriptor.is_chemical, 'chemical' in descriptor.categories)
+
+    def test_queries(self):
+        """Test getting descriptors by category."""
+        descriptors = self.manager.list_descriptors()
+        for categories, match_all in [(['chemical'], False), (['chemical', 'pathology'], False),
+                                      (['chemical', 'pathology'], True), (['complex'], False)]:
+            with self.subTest(categories=categories, match_all=match_all):
+                expected = sorted(
+                    descriptor.name
+                    for descriptor in descriptors
+                    if (all if match_all else any)(descriptor.has_category(category) for category in categories)
+                )
+                self.assertEqual(expected, [
+                    descriptor.name
+                    for descriptor in self.manager.get_descriptors_by_categories(categories, match_all=match_all)
+                ])
+                self.assertEqual(
+                    len(expected),
+                    self.manager.count_descriptors_by_categories(categories, match_all=match_all),
+                )
+
+        self.assertEqual(
+            sorted(descriptor.descriptor_ui for descriptor in descriptors if descriptor.is_chemical),
+            sorted(ui for ui, in self.manager.session.query(Descriptor.descriptor_ui).filter(Descriptor.is_chemical)),
+        )
+
+
+def _get_values(text: str):
+    return text.split('[Values]\n', 1)[1].strip().split('\n')
+
+
+class TestNamespace(TemporaryCacheClass):
+    """Tests for the bulk namespace and annotation export."""
+
+    def test_upload(self):
+        """Test that the namespace is made and updated in bulk like one model at a time."""
+        namespace = self.manager.upload_bel_namespace()
+        entries = {(entry.identifier, entry.name, entry.encoding) for entry in namespace.entries}
+        expected = {
+            (descriptor.descriptor_ui, descriptor.name, descriptor.bel_encoding)
+            for descriptor in self.manager.list_descriptors()
+        }
+        self.assertEqual(expected, entries)
+
+        first_entry = min(namespace.entries, key=lambda entry: entry.identifier)
+        self.manager.session.delete(first_entry)
+        self.manager.session.commit()
+        namespace = self.manager.upload_bel_namespace(update=True)
+        self.assertEqual(expected, {(entry.identifier, entry.name, entry.encoding) for entry in namespace.entries})
+
+        self.manager.drop_bel_namespace()
+        self.assertIsNone(self.manager._get_default_namespace())
+        self.assertEqual(0, self.manager.session.query(NamespaceEntry).count())
+
+    def test_drop_references(self):
+        """Test that dropping the namespace removes the references to its entries from PyBEL's tables."""
+        session = self.manager.session
+        namespace = self.manager.upload_bel_namespace()
+        entry = namespace.entries.first()
+
+        node = Node(type='Pathology', bel=f'path(MESH:"{entry.name}")', data='{}', namespace_entry=entry)
+        edge = Edge(bel='', relation='isA', source=node, target=node, data='{}')
+        edge.annotations.append(entry)
+        session.add(edge)
+        session.commit()
+        node_id, edge_id = node.id, edge.id
+
+        self.manager.drop_bel_namespace()
+        session.expire_all()
+        self.assertIsNone(session.query(Node).get(node_id).namespace_entry_id)
+        self.assertEqual(0, session.query(edge_annotation).filter(edge_annotation.c.edge_id == edge_id).count())
+        self.assertEqual([], session.execute('PRAGMA foreign_key_check').fetchall())
+
+        session.delete(session.query(Edge).get(edge_id))
+        session.delete(session.query(Node).get(node_id))
+        session.commit()
+
+    def test_write(self):
+        """Test that the streamed namespace has the same values as writing one model at a time."""
+        for use_names in (False, True):
+            expected, streamed = io.StringIO(), io.StringIO()
+            BELNamespaceManagerMixin.write_bel_namespace(self.manager, expected, use_names=use_names)
+            self.manager.write_bel_namespace(streamed, use_names=use_names)
+            self.assertEqual(_get_values(expected.getvalue()), _get_values(streamed.getvalue()))
+
+        file = io.StringIO()
+        self.manager.write_bel_annotation(file)
+        self.assertEqual(
+            [
+                f'{name}|{descriptor_ui}'
+                for name, descriptor_ui in sorted(
+                    (descriptor.name, descriptor.descriptor_ui)
+                    for descriptor in self.manager.list_descriptors()
+                )
+            ],
+            _get_values(file.getvalue()),
+        )
+
+
+class TestSchema(unittest.TestCase):
+    """Tests for finding databases made by older versions."""
+
+    def test_outdated(self):
+        """Test that tables missing columns are reported and block population until the database is dropped."""
+        with tempfile.TemporaryDirectory() as directory:
+            connection = f'sqlite:///{os.path.join(directory, "test.db")}'
+            create_engine(connection).execute(
+                f'CREATE TABLE {DESCRIPTOR_TABLE_NAME} '
+                f'(id INTEGER PRIMARY KEY, descriptor_ui VARCHAR(255), name VARCHAR(255), is_anatomy BOOLEAN)'
+            )
+
+            with self.assertLogs('bio2bel_mesh.manager', level='WARNING'):
+                manager = Manager(connection=connection)
+            self.assertEqual([DESCRIPTOR_TABLE_NAME], manager.get_outdated_tables())
+            self.assertRaises(ValueError, manager.update)
+            with mock.patch.object(manager, '_populate') as populate:
+                manager.populate()
+            populate.assert_not_called()
+
+            manager.drop_all()
+            manager.create_all()
+            self.assertEqual([], manager.get_outdated_tables())
+            manager.session.close()
+            manager.engine.dispose()
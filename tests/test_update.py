@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for updating Bio2BEL MeSH to a new release."""
+
+import gzip
+import os
+import re
+import tempfile
+
+from bio2bel_mesh.models import Descriptor
+from pybel.dsl import abundance
+from pybel.manager.models import NamespaceEntry
+from tests.cases import TemporaryCacheClass
+from tests.constants import TEST_DESCRIPTORS_PATH, TEST_SUPPLEMENT_PATH
+
+
+def _make_new_release(path: str) -> None:
+    """Write a copy of the test descriptors with one renamed, one retreed, and one deleted."""
+    with gzip.open(TEST_DESCRIPTORS_PATH, 'rt') as file:
+        xml = file.read()
+
+    records = re.split(r'(?=<DescriptorRecord )', xml)
+    records[2] = records[2].replace('<String>Temefos</String>', '<String>Temephos</String>', 1)
+    records[3] = records[3].replace('J03.540.020', 'J03.540.021')
+    del records[4]
+
+    with gzip.open(path, 'wt') as file:
+        file.write(''.join(records))
+
+
+class TestUpdate(TemporaryCacheClass):
+    """Tests for updating the database."""
+
+    def _get_descriptor(self, descriptor_ui: str) -> Descriptor:
+        return self.manager.session.query(Descriptor).filter(Descriptor.descriptor_ui == descriptor_ui).one()
+
+    def _assert_namespace(self):
+        """Assert that the namespace has exactly one entry per descriptor, with its current name and encoding."""
+        namespace = self.manager._get_default_namespace()
+        entries = self.manager.session.query(
+            NamespaceEntry.identifier, NamespaceEntry.name, NamespaceEntry.encoding,
+        ).filter(NamespaceEntry.namespace_id == namespace.id).all()
+        descriptors = self.manager.session.query(
+            Descriptor.descriptor_ui, Descriptor.name, Descriptor.bel_encoding,
+        ).all()
+        self.assertEqual(len(descriptors), len(entries))
+        self.assertEqual(set(descriptors), set(entries))
+
+    def _get_entry_id(self, descriptor_ui: str) -> int:
+        return self.manager.session.query(NamespaceEntry.id).filter(NamespaceEntry.identifier == descriptor_ui).scalar()
+
+    def test_update(self):
+        """Test that only the changed descriptors are touched."""
+        temefos = self._get_descriptor('D000002')
+        temefos_id = temefos.id
+
+        self.manager.upload_bel_namespace()
+        self._assert_namespace()
+        temefos_entry_id = self._get_entry_id('D000002')
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'desc.gz')
+            _make_new_release(path)
+            counts = self.manager.update(descriptors_path=path, supplement_path=TEST_SUPPLEMENT_PATH)
+
+        self.assertEqual(dict(inserted=0, updated=2, deleted=1, unchanged=8), counts)
+        self.assertEqual(10, self.manager.count_descriptors())
+
+        self.manager.session.expire_all()
+        temefos = self._get_descriptor('D000002')
+        self.assertEqual('Temephos', temefos.name)
+        self.assertEqual(temefos_id, temefos.id, msg='identifiers should be kept for updated descriptors')
+        self.assertEqual(3, len(temefos.trees))
+
+        self._assert_namespace()
+        self.assertEqual(temefos_entry_id, self._get_entry_id('D000002'), msg='renamed entries should be kept')
+        self.assertIsNotNone(self.manager.look_up_node(abundance(namespace='MESH', identifier='D000002')))
+
+        counts = self.manager.update(descriptors_path=TEST_DESCRIPTORS_PATH, supplement_path=TEST_SUPPLEMENT_PATH)
+        self.assertEqual(dict(inserted=1, updated=2, deleted=0, unchanged=8), counts)
+        self.assertEqual(11, self.manager.count_descriptors())
+        self.assertEqual(15, self.manager.count_concepts())
+        self.assertEqual(34, self.manager.count_terms())
+        self._assert_namespace()